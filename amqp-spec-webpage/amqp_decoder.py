@@ -0,0 +1,670 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# AMQP 1.0 decoder generated by spec_codegen.py from the spec xml.
+# Do not edit, regenerate it.
+#
+#    value, pos = decode_value(data, pos)
+#    frame = decode_frame(data, pos)
+#
+# data is anything struct.unpack_from accepts: bytes, bytearray, mmap.
+# Each decode function takes the position after the format code and
+# returns (value, position after the value). DECODERS[code] is the
+# decode function for format code 'code', or None if the code is not
+# in the spec. Described values decode to Described objects whose
+# name is looked up in DESCRIPTORS.
+
+from collections import namedtuple
+from struct import Struct, error as StructError
+from uuid import UUID
+
+try:
+    _unichr = unichr
+except NameError:
+    _unichr = chr
+
+try:
+    _view = buffer  # python 2: slices of a buffer are str
+except NameError:
+    def _view(data, offset, size):
+        return memoryview(data)[offset:offset + size]
+
+class DecodeError(Exception):
+    pass
+
+def _truncated(name, pos, end, data):
+    return DecodeError("truncated %s at %d: needs %d bytes, %d left" % (name, pos, end - pos, len(data) - pos))
+
+
+_unpack_B = Struct(">B").unpack_from
+_unpack_BB = Struct(">BB").unpack_from
+_unpack_H = Struct(">H").unpack_from
+_unpack_I = Struct(">I").unpack_from
+_unpack_II = Struct(">II").unpack_from
+_unpack_Q = Struct(">Q").unpack_from
+_unpack_b = Struct(">b").unpack_from
+_unpack_d = Struct(">d").unpack_from
+_unpack_f = Struct(">f").unpack_from
+_unpack_h = Struct(">h").unpack_from
+_unpack_i = Struct(">i").unpack_from
+_unpack_q = Struct(">q").unpack_from
+
+#
+# Compound values
+def decode_items(data, pos, count):
+    items = []
+    for i in range(count):
+        value, pos = decode_value(data, pos)
+        items.append(value)
+    return items
+
+def _map(items):
+    pairs = list(zip(items[0::2], items[1::2]))
+    try:
+        return dict(pairs)
+    except TypeError:
+        # unhashable keys
+        return pairs
+
+def decode_array_items(data, pos, count):
+    code = _unpack_B(data, pos)[0]
+    pos += 1
+    descriptor = None
+    if code == 0:
+        descriptor, pos = decode_value(data, pos)
+        code = _unpack_B(data, pos)[0]
+        pos += 1
+    decode = DECODERS[code]
+    if decode is None:
+        raise DecodeError("unknown array element format code 0x%02x at %d" % (code, pos - 1))
+    items = []
+    for i in range(count):
+        value, pos = decode(data, pos)
+        items.append(value)
+    if descriptor is not None:
+        items = [described(descriptor, value) for value in items]
+    return items
+
+#
+# Described values
+class Described(object):
+    __slots__ = ("descriptor", "name", "value")
+
+    def __init__(self, descriptor, name, value):
+        self.descriptor = descriptor  # the descriptor code, or the symbol if not in the spec
+        self.name = name              # type name, None if not in the spec
+        self.value = value
+
+    def fields(self):
+        ''' A list value as a dict of field name to value. Fields past the end of the list are absent.'''
+        return dict(zip(FIELDS.get(self.name, ()), self.value or []))
+
+    def __eq__(self, other):
+        return isinstance(other, Described) and \
+            (self.descriptor, self.value) == (other.descriptor, other.value)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.descriptor)
+
+    def __repr__(self):
+        if self.name is None:
+            return "Described(%r, %r)" % (self.descriptor, self.value)
+        if isinstance(self.value, list) and self.name in FIELDS:
+            return "%s(%s)" % (self.name, ", ".join(["%s=%r" % (n, v) for n, v in
+                                                     zip(FIELDS[self.name], self.value)]))
+        return "%s(%r)" % (self.name, self.value)
+
+def described(descriptor, value):
+    code = SYMBOLS.get(descriptor, descriptor)
+    return Described(code, DESCRIPTORS.get(code), value)
+
+#
+# Values
+def decode_value(data, pos=0):
+    ''' Decode the value at data[pos]. Return (value, position after the value).'''
+    try:
+        code = _unpack_B(data, pos)[0]
+        if code == 0:
+            descriptor, end = decode_value(data, pos + 1)
+            value, end = decode_value(data, end)
+            return described(descriptor, value), end
+        decode = DECODERS[code]
+        if decode is None:
+            raise DecodeError("unknown format code 0x%02x at %d" % (code, pos))
+        return decode(data, pos + 1)
+    except StructError as e:
+        raise DecodeError("truncated value at %d: %s" % (pos, e))
+
+#
+# Frames
+Frame = namedtuple("Frame", "size doff type channel body payload end")
+_unpack_frame = Struct(">IBBH").unpack_from
+FRAME_TYPES = {0: "amqp", 1: "sasl"}
+
+def decode_frame(data, pos=0):
+    ''' Decode the frame at data[pos]. body is the performative or sasl
+        frame body, None for an empty frame. The payload runs from
+        payload to end. A frame that runs past the end of data is a
+        DecodeError, as is a body that runs past the end of the frame.'''
+    if pos + 8 > len(data):
+        raise _truncated("frame header", pos, pos + 8, data)
+    size, doff, type, channel = _unpack_frame(data, pos)
+    if size < 8 or doff < 2 or doff * 4 > size:
+        raise DecodeError("bad frame header at %d: size %d doff %d" % (pos, size, doff))
+    end = pos + size
+    if end > len(data):
+        raise _truncated("frame", pos, end, data)
+    payload = pos + doff * 4
+    body = None
+    if payload < end:
+        # positions in the view are positions in data
+        body, payload = decode_value(data if end == len(data) else _view(data, 0, end), payload)
+    return Frame(size, doff, type, channel, body, payload, end)
+
+def decode_sections(data, pos, end):
+    ''' Decode the message sections in a transfer payload'''
+    sections = []
+    while pos < end:
+        section, pos = decode_value(data, pos)
+        sections.append(section)
+    return sections
+
+def iter_frames(data, pos=0, end=None):
+    ''' Decode consecutive frames starting at data[pos]'''
+    if end is None:
+        end = len(data)
+    elif end < len(data):
+        data = _view(data, 0, end)  # so no frame runs past end
+    while pos + 8 <= end:
+        frame = decode_frame(data, pos)
+        yield frame
+        pos = frame.end
+
+#
+# Primitive encodings
+def decode_null(data, pos):
+    return None, pos
+
+def decode_boolean(data, pos):
+    if pos + 1 > len(data):
+        raise _truncated('boolean', pos, pos + 1, data)
+    return _unpack_B(data, pos)[0] != 0, pos + 1
+
+def decode_boolean_true(data, pos):
+    return True, pos
+
+def decode_boolean_false(data, pos):
+    return False, pos
+
+def decode_ubyte(data, pos):
+    if pos + 1 > len(data):
+        raise _truncated('ubyte', pos, pos + 1, data)
+    return _unpack_B(data, pos)[0], pos + 1
+
+def decode_ushort(data, pos):
+    if pos + 2 > len(data):
+        raise _truncated('ushort', pos, pos + 2, data)
+    return _unpack_H(data, pos)[0], pos + 2
+
+def decode_uint(data, pos):
+    if pos + 4 > len(data):
+        raise _truncated('uint', pos, pos + 4, data)
+    return _unpack_I(data, pos)[0], pos + 4
+
+def decode_uint_smalluint(data, pos):
+    if pos + 1 > len(data):
+        raise _truncated('uint:smalluint', pos, pos + 1, data)
+    return _unpack_B(data, pos)[0], pos + 1
+
+def decode_uint_uint0(data, pos):
+    return 0, pos
+
+def decode_ulong(data, pos):
+    if pos + 8 > len(data):
+        raise _truncated('ulong', pos, pos + 8, data)
+    return _unpack_Q(data, pos)[0], pos + 8
+
+def decode_ulong_smallulong(data, pos):
+    if pos + 1 > len(data):
+        raise _truncated('ulong:smallulong', pos, pos + 1, data)
+    return _unpack_B(data, pos)[0], pos + 1
+
+def decode_ulong_ulong0(data, pos):
+    return 0, pos
+
+def decode_byte(data, pos):
+    if pos + 1 > len(data):
+        raise _truncated('byte', pos, pos + 1, data)
+    return _unpack_b(data, pos)[0], pos + 1
+
+def decode_short(data, pos):
+    if pos + 2 > len(data):
+        raise _truncated('short', pos, pos + 2, data)
+    return _unpack_h(data, pos)[0], pos + 2
+
+def decode_int(data, pos):
+    if pos + 4 > len(data):
+        raise _truncated('int', pos, pos + 4, data)
+    return _unpack_i(data, pos)[0], pos + 4
+
+def decode_int_smallint(data, pos):
+    if pos + 1 > len(data):
+        raise _truncated('int:smallint', pos, pos + 1, data)
+    return _unpack_b(data, pos)[0], pos + 1
+
+def decode_long(data, pos):
+    if pos + 8 > len(data):
+        raise _truncated('long', pos, pos + 8, data)
+    return _unpack_q(data, pos)[0], pos + 8
+
+def decode_long_smalllong(data, pos):
+    if pos + 1 > len(data):
+        raise _truncated('long:smalllong', pos, pos + 1, data)
+    return _unpack_b(data, pos)[0], pos + 1
+
+def decode_float_ieee_754(data, pos):
+    if pos + 4 > len(data):
+        raise _truncated('float:ieee-754', pos, pos + 4, data)
+    return _unpack_f(data, pos)[0], pos + 4
+
+def decode_double_ieee_754(data, pos):
+    if pos + 8 > len(data):
+        raise _truncated('double:ieee-754', pos, pos + 8, data)
+    return _unpack_d(data, pos)[0], pos + 8
+
+def decode_decimal32_ieee_754(data, pos):
+    if pos + 4 > len(data):
+        raise _truncated('decimal32:ieee-754', pos, pos + 4, data)
+    return bytes(data[pos:pos + 4]), pos + 4
+
+def decode_decimal64_ieee_754(data, pos):
+    if pos + 8 > len(data):
+        raise _truncated('decimal64:ieee-754', pos, pos + 8, data)
+    return bytes(data[pos:pos + 8]), pos + 8
+
+def decode_decimal128_ieee_754(data, pos):
+    if pos + 16 > len(data):
+        raise _truncated('decimal128:ieee-754', pos, pos + 16, data)
+    return bytes(data[pos:pos + 16]), pos + 16
+
+def decode_char_utf32(data, pos):
+    if pos + 4 > len(data):
+        raise _truncated('char:utf32', pos, pos + 4, data)
+    return _unichr(_unpack_I(data, pos)[0]), pos + 4
+
+def decode_timestamp_ms64(data, pos):
+    if pos + 8 > len(data):
+        raise _truncated('timestamp:ms64', pos, pos + 8, data)
+    return _unpack_q(data, pos)[0], pos + 8
+
+def decode_uuid(data, pos):
+    if pos + 16 > len(data):
+        raise _truncated('uuid', pos, pos + 16, data)
+    return UUID(bytes=bytes(data[pos:pos + 16])), pos + 16
+
+def decode_binary_vbin8(data, pos):
+    if pos + 1 > len(data):
+        raise _truncated('binary:vbin8', pos, pos + 1, data)
+    end = pos + 1 + _unpack_B(data, pos)[0]
+    if end > len(data):
+        raise _truncated('binary:vbin8', pos, end, data)
+    return bytes(data[pos + 1:end]), end
+
+def decode_binary_vbin32(data, pos):
+    if pos + 4 > len(data):
+        raise _truncated('binary:vbin32', pos, pos + 4, data)
+    end = pos + 4 + _unpack_I(data, pos)[0]
+    if end > len(data):
+        raise _truncated('binary:vbin32', pos, end, data)
+    return bytes(data[pos + 4:end]), end
+
+def decode_string_str8_utf8(data, pos):
+    if pos + 1 > len(data):
+        raise _truncated('string:str8-utf8', pos, pos + 1, data)
+    end = pos + 1 + _unpack_B(data, pos)[0]
+    if end > len(data):
+        raise _truncated('string:str8-utf8', pos, end, data)
+    return bytes(data[pos + 1:end]).decode("utf-8"), end
+
+def decode_string_str32_utf8(data, pos):
+    if pos + 4 > len(data):
+        raise _truncated('string:str32-utf8', pos, pos + 4, data)
+    end = pos + 4 + _unpack_I(data, pos)[0]
+    if end > len(data):
+        raise _truncated('string:str32-utf8', pos, end, data)
+    return bytes(data[pos + 4:end]).decode("utf-8"), end
+
+def decode_symbol_sym8(data, pos):
+    if pos + 1 > len(data):
+        raise _truncated('symbol:sym8', pos, pos + 1, data)
+    end = pos + 1 + _unpack_B(data, pos)[0]
+    if end > len(data):
+        raise _truncated('symbol:sym8', pos, end, data)
+    return bytes(data[pos + 1:end]).decode("ascii"), end
+
+def decode_symbol_sym32(data, pos):
+    if pos + 4 > len(data):
+        raise _truncated('symbol:sym32', pos, pos + 4, data)
+    end = pos + 4 + _unpack_I(data, pos)[0]
+    if end > len(data):
+        raise _truncated('symbol:sym32', pos, end, data)
+    return bytes(data[pos + 4:end]).decode("ascii"), end
+
+def decode_list_list0(data, pos):
+    return [], pos
+
+def decode_list_list8(data, pos):
+    if pos + 1 > len(data):
+        raise _truncated('list:list8', pos, pos + 1, data)
+    if pos + 2 > len(data):
+        raise _truncated('list:list8', pos, pos + 2, data)
+    size, count = _unpack_BB(data, pos)
+    if pos + 1 + size > len(data):
+        raise _truncated('list:list8', pos, pos + 1 + size, data)
+    return decode_items(data, pos + 2, count), pos + 1 + size
+
+def decode_list_list32(data, pos):
+    if pos + 4 > len(data):
+        raise _truncated('list:list32', pos, pos + 4, data)
+    if pos + 8 > len(data):
+        raise _truncated('list:list32', pos, pos + 8, data)
+    size, count = _unpack_II(data, pos)
+    if pos + 4 + size > len(data):
+        raise _truncated('list:list32', pos, pos + 4 + size, data)
+    return decode_items(data, pos + 8, count), pos + 4 + size
+
+def decode_map_map8(data, pos):
+    if pos + 1 > len(data):
+        raise _truncated('map:map8', pos, pos + 1, data)
+    if pos + 2 > len(data):
+        raise _truncated('map:map8', pos, pos + 2, data)
+    size, count = _unpack_BB(data, pos)
+    if pos + 1 + size > len(data):
+        raise _truncated('map:map8', pos, pos + 1 + size, data)
+    return _map(decode_items(data, pos + 2, count)), pos + 1 + size
+
+def decode_map_map32(data, pos):
+    if pos + 4 > len(data):
+        raise _truncated('map:map32', pos, pos + 4, data)
+    if pos + 8 > len(data):
+        raise _truncated('map:map32', pos, pos + 8, data)
+    size, count = _unpack_II(data, pos)
+    if pos + 4 + size > len(data):
+        raise _truncated('map:map32', pos, pos + 4 + size, data)
+    return _map(decode_items(data, pos + 8, count)), pos + 4 + size
+
+def decode_array_array8(data, pos):
+    if pos + 1 > len(data):
+        raise _truncated('array:array8', pos, pos + 1, data)
+    if pos + 2 > len(data):
+        raise _truncated('array:array8', pos, pos + 2, data)
+    size, count = _unpack_BB(data, pos)
+    if pos + 1 + size > len(data):
+        raise _truncated('array:array8', pos, pos + 1 + size, data)
+    return decode_array_items(data, pos + 2, count), pos + 1 + size
+
+def decode_array_array32(data, pos):
+    if pos + 4 > len(data):
+        raise _truncated('array:array32', pos, pos + 4, data)
+    if pos + 8 > len(data):
+        raise _truncated('array:array32', pos, pos + 8, data)
+    size, count = _unpack_II(data, pos)
+    if pos + 4 + size > len(data):
+        raise _truncated('array:array32', pos, pos + 4 + size, data)
+    return decode_array_items(data, pos + 8, count), pos + 4 + size
+
+DECODERS = [None] * 256
+DECODERS[0x40] = decode_null
+DECODERS[0x56] = decode_boolean
+DECODERS[0x41] = decode_boolean_true
+DECODERS[0x42] = decode_boolean_false
+DECODERS[0x50] = decode_ubyte
+DECODERS[0x60] = decode_ushort
+DECODERS[0x70] = decode_uint
+DECODERS[0x52] = decode_uint_smalluint
+DECODERS[0x43] = decode_uint_uint0
+DECODERS[0x80] = decode_ulong
+DECODERS[0x53] = decode_ulong_smallulong
+DECODERS[0x44] = decode_ulong_ulong0
+DECODERS[0x51] = decode_byte
+DECODERS[0x61] = decode_short
+DECODERS[0x71] = decode_int
+DECODERS[0x54] = decode_int_smallint
+DECODERS[0x81] = decode_long
+DECODERS[0x55] = decode_long_smalllong
+DECODERS[0x72] = decode_float_ieee_754
+DECODERS[0x82] = decode_double_ieee_754
+DECODERS[0x74] = decode_decimal32_ieee_754
+DECODERS[0x84] = decode_decimal64_ieee_754
+DECODERS[0x94] = decode_decimal128_ieee_754
+DECODERS[0x73] = decode_char_utf32
+DECODERS[0x83] = decode_timestamp_ms64
+DECODERS[0x98] = decode_uuid
+DECODERS[0xa0] = decode_binary_vbin8
+DECODERS[0xb0] = decode_binary_vbin32
+DECODERS[0xa1] = decode_string_str8_utf8
+DECODERS[0xb1] = decode_string_str32_utf8
+DECODERS[0xa3] = decode_symbol_sym8
+DECODERS[0xb3] = decode_symbol_sym32
+DECODERS[0x45] = decode_list_list0
+DECODERS[0xc0] = decode_list_list8
+DECODERS[0xd0] = decode_list_list32
+DECODERS[0xc1] = decode_map_map8
+DECODERS[0xd1] = decode_map_map32
+DECODERS[0xe0] = decode_array_array8
+DECODERS[0xf0] = decode_array_array32
+
+#
+# Described types
+DESCRIPTORS = {  # descriptor code -> type name
+    0x0000000000000010: 'open',
+    0x0000000000000011: 'begin',
+    0x0000000000000012: 'attach',
+    0x0000000000000013: 'flow',
+    0x0000000000000014: 'transfer',
+    0x0000000000000015: 'disposition',
+    0x0000000000000016: 'detach',
+    0x0000000000000017: 'end',
+    0x0000000000000018: 'close',
+    0x000000000000001d: 'error',
+    0x0000000000000023: 'received',
+    0x0000000000000024: 'accepted',
+    0x0000000000000025: 'rejected',
+    0x0000000000000026: 'released',
+    0x0000000000000027: 'modified',
+    0x0000000000000028: 'source',
+    0x0000000000000029: 'target',
+    0x000000000000002b: 'delete-on-close',
+    0x000000000000002c: 'delete-on-no-links',
+    0x000000000000002d: 'delete-on-no-messages',
+    0x000000000000002e: 'delete-on-no-links-or-messages',
+    0x0000000000000030: 'coordinator',
+    0x0000000000000031: 'declare',
+    0x0000000000000032: 'discharge',
+    0x0000000000000033: 'declared',
+    0x0000000000000034: 'transactional-state',
+    0x0000000000000040: 'sasl-mechanisms',
+    0x0000000000000041: 'sasl-init',
+    0x0000000000000042: 'sasl-challenge',
+    0x0000000000000043: 'sasl-response',
+    0x0000000000000044: 'sasl-outcome',
+    0x0000000000000070: 'header',
+    0x0000000000000071: 'delivery-annotations',
+    0x0000000000000072: 'message-annotations',
+    0x0000000000000073: 'properties',
+    0x0000000000000074: 'application-properties',
+    0x0000000000000075: 'data',
+    0x0000000000000076: 'amqp-sequence',
+    0x0000000000000077: 'amqp-value',
+    0x0000000000000078: 'footer',
+}
+
+SYMBOLS = {  # descriptor symbol -> descriptor code
+    'amqp:open:list': 0x0000000000000010,
+    'amqp:begin:list': 0x0000000000000011,
+    'amqp:attach:list': 0x0000000000000012,
+    'amqp:flow:list': 0x0000000000000013,
+    'amqp:transfer:list': 0x0000000000000014,
+    'amqp:disposition:list': 0x0000000000000015,
+    'amqp:detach:list': 0x0000000000000016,
+    'amqp:end:list': 0x0000000000000017,
+    'amqp:close:list': 0x0000000000000018,
+    'amqp:error:list': 0x000000000000001d,
+    'amqp:received:list': 0x0000000000000023,
+    'amqp:accepted:list': 0x0000000000000024,
+    'amqp:rejected:list': 0x0000000000000025,
+    'amqp:released:list': 0x0000000000000026,
+    'amqp:modified:list': 0x0000000000000027,
+    'amqp:source:list': 0x0000000000000028,
+    'amqp:target:list': 0x0000000000000029,
+    'amqp:delete-on-close:list': 0x000000000000002b,
+    'amqp:delete-on-no-links:list': 0x000000000000002c,
+    'amqp:delete-on-no-messages:list': 0x000000000000002d,
+    'amqp:delete-on-no-links-or-messages:list': 0x000000000000002e,
+    'amqp:coordinator:list': 0x0000000000000030,
+    'amqp:declare:list': 0x0000000000000031,
+    'amqp:discharge:list': 0x0000000000000032,
+    'amqp:declared:list': 0x0000000000000033,
+    'amqp:transactional-state:list': 0x0000000000000034,
+    'amqp:sasl-mechanisms:list': 0x0000000000000040,
+    'amqp:sasl-init:list': 0x0000000000000041,
+    'amqp:sasl-challenge:list': 0x0000000000000042,
+    'amqp:sasl-response:list': 0x0000000000000043,
+    'amqp:sasl-outcome:list': 0x0000000000000044,
+    'amqp:header:list': 0x0000000000000070,
+    'amqp:delivery-annotations:map': 0x0000000000000071,
+    'amqp:message-annotations:map': 0x0000000000000072,
+    'amqp:properties:list': 0x0000000000000073,
+    'amqp:application-properties:map': 0x0000000000000074,
+    'amqp:data:binary': 0x0000000000000075,
+    'amqp:amqp-sequence:list': 0x0000000000000076,
+    'amqp:amqp-value:*': 0x0000000000000077,
+    'amqp:footer:map': 0x0000000000000078,
+}
+
+SECTIONS = {  # type name -> spec section
+    'open': 'transport:performatives',
+    'begin': 'transport:performatives',
+    'attach': 'transport:performatives',
+    'flow': 'transport:performatives',
+    'transfer': 'transport:performatives',
+    'disposition': 'transport:performatives',
+    'detach': 'transport:performatives',
+    'end': 'transport:performatives',
+    'close': 'transport:performatives',
+    'error': 'transport:definitions',
+    'received': 'messaging:delivery-state',
+    'accepted': 'messaging:delivery-state',
+    'rejected': 'messaging:delivery-state',
+    'released': 'messaging:delivery-state',
+    'modified': 'messaging:delivery-state',
+    'source': 'messaging:addressing',
+    'target': 'messaging:addressing',
+    'delete-on-close': 'messaging:addressing',
+    'delete-on-no-links': 'messaging:addressing',
+    'delete-on-no-messages': 'messaging:addressing',
+    'delete-on-no-links-or-messages': 'messaging:addressing',
+    'coordinator': 'transactions:coordination',
+    'declare': 'transactions:coordination',
+    'discharge': 'transactions:coordination',
+    'declared': 'transactions:coordination',
+    'transactional-state': 'transactions:coordination',
+    'sasl-mechanisms': 'security:sasl',
+    'sasl-init': 'security:sasl',
+    'sasl-challenge': 'security:sasl',
+    'sasl-response': 'security:sasl',
+    'sasl-outcome': 'security:sasl',
+    'header': 'messaging:message-format',
+    'delivery-annotations': 'messaging:message-format',
+    'message-annotations': 'messaging:message-format',
+    'properties': 'messaging:message-format',
+    'application-properties': 'messaging:message-format',
+    'data': 'messaging:message-format',
+    'amqp-sequence': 'messaging:message-format',
+    'amqp-value': 'messaging:message-format',
+    'footer': 'messaging:message-format',
+}
+
+FIELDS = {  # type name -> field names in list order
+    'open': ('container-id', 'hostname', 'max-frame-size', 'channel-max', 'idle-time-out', 'outgoing-locales', 'incoming-locales', 'offered-capabilities', 'desired-capabilities', 'properties'),
+    'begin': ('remote-channel', 'next-outgoing-id', 'incoming-window', 'outgoing-window', 'handle-max', 'offered-capabilities', 'desired-capabilities', 'properties'),
+    'attach': ('name', 'handle', 'role', 'snd-settle-mode', 'rcv-settle-mode', 'source', 'target', 'unsettled', 'incomplete-unsettled', 'initial-delivery-count', 'max-message-size', 'offered-capabilities', 'desired-capabilities', 'properties'),
+    'flow': ('next-incoming-id', 'incoming-window', 'next-outgoing-id', 'outgoing-window', 'handle', 'delivery-count', 'link-credit', 'available', 'drain', 'echo', 'properties'),
+    'transfer': ('handle', 'delivery-id', 'delivery-tag', 'message-format', 'settled', 'more', 'rcv-settle-mode', 'state', 'resume', 'aborted', 'batchable'),
+    'disposition': ('role', 'first', 'last', 'settled', 'state', 'batchable'),
+    'detach': ('handle', 'closed', 'error'),
+    'end': ('error',),
+    'close': ('error',),
+    'error': ('condition', 'description', 'info'),
+    'received': ('section-number', 'section-offset'),
+    'rejected': ('error',),
+    'modified': ('delivery-failed', 'undeliverable-here', 'message-annotations'),
+    'source': ('address', 'durable', 'expiry-policy', 'timeout', 'dynamic', 'dynamic-node-properties', 'distribution-mode', 'filter', 'default-outcome', 'outcomes', 'capabilities'),
+    'target': ('address', 'durable', 'expiry-policy', 'timeout', 'dynamic', 'dynamic-node-properties', 'capabilities'),
+    'coordinator': ('capabilities',),
+    'declare': ('global-id',),
+    'discharge': ('txn-id', 'fail'),
+    'declared': ('txn-id',),
+    'transactional-state': ('txn-id', 'outcome'),
+    'sasl-mechanisms': ('sasl-server-mechanisms',),
+    'sasl-init': ('mechanism', 'initial-response', 'hostname'),
+    'sasl-challenge': ('challenge',),
+    'sasl-response': ('response',),
+    'sasl-outcome': ('code', 'additional-data'),
+    'header': ('durable', 'priority', 'ttl', 'first-acquirer', 'delivery-count'),
+    'properties': ('message-id', 'user-id', 'to', 'subject', 'reply-to', 'correlation-id', 'content-type', 'content-encoding', 'absolute-expiry-time', 'creation-time', 'group-id', 'group-sequence', 'reply-to-group-id'),
+}
+
+PERFORMATIVES = {  # descriptor code -> frame body type name
+    0x0000000000000010: 'open',
+    0x0000000000000011: 'begin',
+    0x0000000000000012: 'attach',
+    0x0000000000000013: 'flow',
+    0x0000000000000014: 'transfer',
+    0x0000000000000015: 'disposition',
+    0x0000000000000016: 'detach',
+    0x0000000000000017: 'end',
+    0x0000000000000018: 'close',
+    0x0000000000000040: 'sasl-mechanisms',
+    0x0000000000000041: 'sasl-init',
+    0x0000000000000042: 'sasl-challenge',
+    0x0000000000000043: 'sasl-response',
+    0x0000000000000044: 'sasl-outcome',
+}
+
+#
+# Constants
+CONSTANTS = {
+    'PORT': 5672,
+    'SECURE-PORT': 5671,
+    'MAJOR': 1,
+    'MINOR': 0,
+    'REVISION': 0,
+    'MIN-MAX-FRAME-SIZE': 512,
+    'MESSAGE-FORMAT': 0,
+    'TLS-MAJOR': 1,
+    'TLS-MINOR': 0,
+    'TLS-REVISION': 0,
+    'SASL-MAJOR': 1,
+    'SASL-MINOR': 0,
+    'SASL-REVISION': 0,
+}
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Benchmark webpage.py over synthetic specs 1x, 10x and 100x the size
+# of the stock one:
+#
+#    bench_webpage.py                      table of phase times by scale
+#    bench_webpage.py --json curve.json    also save the scaling curve
+#
+# A spec at scale N holds N copies of every section of the stock spec
+# xml. Each copy after the first renames its sections, non-primitive
+# types, constants, descriptors and provided type names with a "-cK"
+# suffix. References to renamed names are renamed with them.
+# Descriptor codes are offset by 0x100 per copy. The primitive types
+# are not copied, so the encodings stay the same.
+#
+# Each size runs the full pipeline, xml to page, in a fresh
+# webpage.py process with --no-cache --profile. The best wall and cpu
+# time of each phase over --repeat runs is reported, with the peak
+# resident size. The "growth" column is the slope of log(time) over
+# log(scale) from the smallest to the largest scale: about 1 for
+# linear phases, 2 for quadratic ones.
+#
+
+from __future__ import print_function
+import sys, os
+import copy, json, math, shutil, subprocess, tempfile
+
+import webpage
+
+# attributes that hold type names, some as comma separated lists
+REFERENCE_ATTRIBUTES = ["source", "type", "requires", "provides"]
+
+def local_name(tag):
+    return tag[tag.find("}")+1:]
+
+def stock_names(roots):
+    ''' Names that copies rename: non-primitive types and provided type names'''
+    names = set()
+    for root in roots:
+        for elem in root.iter():
+            if local_name(elem.tag) == "type" and elem.get("class") != "primitive":
+                names.add(elem.get("name"))
+            for provided in (elem.get("provides") or "").split(","):
+                if provided.strip():
+                    names.add(provided.strip())
+    return names
+
+def rename_section(section, suffix, names, codeOffset):
+    ''' Rename one copied section in place. Primitive types are dropped.'''
+    section.set("name", section.get("name") + suffix)
+    for parent in list(section.iter()):
+        for child in list(parent):
+            if local_name(child.tag) == "type" and child.get("class") == "primitive":
+                parent.remove(child)
+    for elem in section.iter():
+        tag = local_name(elem.tag)
+        if tag in ["type", "definition"]:
+            elem.set("name", elem.get("name") + suffix)
+        elif tag == "descriptor":
+            domain, code = elem.get("code").split(":")
+            elem.set("code", "%s:0x%08x" % (domain, int(code, 16) + codeOffset))
+            elem.set("name", elem.get("name") + suffix)
+        for attribute in REFERENCE_ATTRIBUTES:
+            value = elem.get(attribute)
+            if value is not None:
+                refs = [ref.strip() for ref in value.split(",")]
+                elem.set(attribute, ",".join([ref + suffix if ref in names else ref for ref in refs]))
+
+def write_spec(specdir, scale, outdir):
+    ''' Write the stock spec in specdir at scale copies into outdir'''
+    import xml.etree.ElementTree as ET
+    trees = [ET.parse(os.path.join(specdir, f)) for f in webpage.SPEC_FILES]
+    roots = [tree.getroot() for tree in trees]
+    ET.register_namespace("", roots[0].tag[1:roots[0].tag.find("}")])
+    names = stock_names(roots)
+    for root in roots:
+        sections = [s for s in root if local_name(s.tag) == "section"]
+        for k in range(1, scale):
+            for section in sections:
+                section = copy.deepcopy(section)
+                rename_section(section, "-c%d" % k, names, k * 0x100)
+                root.append(section)
+    if not os.path.isdir(outdir):
+        os.makedirs(outdir)
+    size = 0
+    for filename, tree in zip(webpage.SPEC_FILES, trees):
+        path = os.path.join(outdir, filename)
+        tree.write(path, encoding="utf-8")
+        size += os.path.getsize(path)
+    return size
+
+def run_pipeline(specdir, workdir, jobs, traceMemory):
+    ''' Run webpage.py on specdir in a new process and return its profile'''
+    profile = os.path.join(workdir, "profile.json")
+    cmd = [sys.executable, os.path.join(webpage.SPEC_DIR, "webpage.py"), "--spec-dir", specdir,
+           "--no-cache", "-j", str(jobs), "-o", os.path.join(workdir, "page.html"), "--profile", profile]
+    if traceMemory:
+        cmd.append("--trace-memory")
+    subprocess.check_call(cmd)
+    with open(profile) as f:
+        return json.load(f)
+
+def best_phases(profiles):
+    ''' Best time of each phase over several runs, in first run order'''
+    phases = []
+    for i, phase in enumerate(profiles[0]["phases"]):
+        runs = [p["phases"][i] for p in profiles]
+        best = {"name": phase["name"],
+                "wall": min([r["wall"] for r in runs]),
+                "cpu": min([r["cpu"] for r in runs]),
+                "max_rss_kb": max([r["max_rss_kb"] or 0 for r in runs]) or None}
+        peaks = [r["alloc_peak_kb"] for r in runs if r["alloc_peak_kb"] is not None]
+        best["alloc_peak_kb"] = max(peaks) if peaks else None
+        phases.append(best)
+    return phases
+
+def growth(scales, times):
+    if times[0] <= 0 or times[-1] <= 0 or scales[0] == scales[-1]:
+        return None
+    return math.log(times[-1] / times[0]) / math.log(float(scales[-1]) / scales[0])
+
+def format_report(curve):
+    scales = [point["scale"] for point in curve]
+    out = []
+    out.append("%-60s %s  growth" % ("phase wall ms", " ".join(["%9s" % ("%dx" % s) for s in scales])))
+    for i, phase in enumerate(curve[0]["phases"]):
+        times = [point["phases"][i]["wall"] for point in curve]
+        slope = growth(scales, times)
+        out.append("%-60s %s  %s" % (phase["name"], " ".join(["%9.1f" % (t * 1000) for t in times]),
+                                     "%.2f" % slope if slope is not None else "-"))
+    out.append("%-60s %s" % ("spec xml KB", " ".join(["%9d" % (p["specBytes"] // 1024) for p in curve])))
+    out.append("%-60s %s" % ("described types", " ".join(["%9d" % p["counts"]["nDescribedTypes"] for p in curve])))
+    out.append("%-60s %s" % ("grand index rows", " ".join(["%9d" % p["counts"]["nIndexedGrand"] for p in curve])))
+    out.append("%-60s %s" % ("peak rss KB", " ".join(["%9d" % max([ph["max_rss_kb"] or 0 for ph in p["phases"]])
+                                                       for p in curve])))
+    return "\n".join(out)
+
+#
+#
+def main_except(argv):
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark webpage.py on synthetic specs of growing size.")
+    parser.add_argument("--scales", default="1,10,100",
+                        help="comma separated spec sizes, in copies of the stock spec [%(default)s]")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs per size, the best time is kept [%(default)s]")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="webpage.py --jobs [%(default)s]")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="record each phase's python allocations too. Slows every phase.")
+    parser.add_argument("--json", metavar="FILE", default=None,
+                        help="write the scaling curve as json to FILE")
+    parser.add_argument("--keep", metavar="DIR", default=None,
+                        help="keep the generated specs and pages in DIR")
+    parser.add_argument("--spec-dir", default=webpage.SPEC_DIR,
+                        help="directory holding the stock spec xml files [%(default)s]")
+    args = parser.parse_args(argv[1:])
+    scales = [int(s) for s in args.scales.split(",")]
+
+    workroot = args.keep if args.keep is not None else tempfile.mkdtemp(prefix="bench-webpage-")
+    curve = []
+    try:
+        for scale in scales:
+            workdir = os.path.join(workroot, "x%d" % scale)
+            specBytes = write_spec(args.spec_dir, scale, workdir)
+            profiles = [run_pipeline(workdir, workdir, args.jobs, args.trace_memory) for i in range(args.repeat)]
+            curve.append({"scale": scale, "specBytes": specBytes, "counts": profiles[0]["counts"],
+                          "phases": best_phases(profiles)})
+            webpage.log("scale %dx: %.3f s" % (scale, sum([p["wall"] for p in curve[-1]["phases"]
+                                                           if "/" not in p["name"]])))
+    finally:
+        if args.keep is None:
+            shutil.rmtree(workroot, ignore_errors=True)
+
+    print(format_report(curve))
+    if args.json is not None:
+        with open(args.json, "w") as f:
+            json.dump({"python": profiles[0]["python"], "repeat": args.repeat, "jobs": args.jobs,
+                       "curve": curve}, f, indent=1, sort_keys=True)
+            f.write("\n")
+
+def main(argv):
+    try:
+        main_except(argv)
+        return 0
+    except webpage.ExitStatus as e:
+        return e.status
+    except Exception as e:
+        print("%s: %s"%(type(e).__name__, e))
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
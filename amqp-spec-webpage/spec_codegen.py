@@ -0,0 +1,493 @@
+#!/usr/bin/env python
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Generate a table driven AMQP 1.0 decoder module from the spec model:
+#
+#    spec_codegen.py -o amqp_decoder.py
+#    spec_codegen.py --check             feed the generated decoder truncated input
+#
+# The generated module has one decode function per primitive encoding
+# in a 256 entry table indexed by format code, and tables of the
+# described types by descriptor code with their ordered field names.
+# It needs no xml and nothing from this directory at run time.
+#
+# The spec gives each encoding's code, category and width. How the
+# bytes of a fixed width type convert to a value is in the prose of the
+# spec and is kept here in FIXED_FORMATS and FIXED_CONVERSIONS.
+#
+
+from __future__ import print_function
+import sys, os
+import struct
+
+import webpage
+
+# struct format of the signed and unsigned fixed width integers, by width
+SIGNED_FORMATS = {1: "b", 2: "h", 4: "i", 8: "q"}
+UNSIGNED_FORMATS = {1: "B", 2: "H", 4: "I", 8: "Q"}
+SIGNED_TYPES = ["byte", "short", "int", "long", "timestamp"]
+
+# fixed width types that are not plain integers
+FIXED_FORMATS = {"float": "f", "double": "d", "char": "I", "boolean": "B"}
+FIXED_CONVERSIONS = {
+    "char":    "_unichr(%s)",
+    "boolean": "%s != 0",
+}
+RAW_TYPES = ["decimal32", "decimal64", "decimal128", "uuid"]
+
+# width 0 encodings are their value
+CONSTANT_VALUES = {"null": "None", "boolean:true": "True", "boolean:false": "False", "list:list0": "[]"}
+
+VARIABLE_CONVERSIONS = {
+    "binary": "%s",
+    "string": "%s.decode(\"utf-8\")",
+    "symbol": "%s.decode(\"ascii\")",
+}
+
+HEADER = '''#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# AMQP 1.0 decoder generated by spec_codegen.py from the spec xml.
+# Do not edit, regenerate it.
+#
+#    value, pos = decode_value(data, pos)
+#    frame = decode_frame(data, pos)
+#
+# data is anything struct.unpack_from accepts: bytes, bytearray, mmap.
+# Each decode function takes the position after the format code and
+# returns (value, position after the value). DECODERS[code] is the
+# decode function for format code 'code', or None if the code is not
+# in the spec. Described values decode to Described objects whose
+# name is looked up in DESCRIPTORS.
+
+from collections import namedtuple
+from struct import Struct, error as StructError
+from uuid import UUID
+
+try:
+    _unichr = unichr
+except NameError:
+    _unichr = chr
+
+try:
+    _view = buffer  # python 2: slices of a buffer are str
+except NameError:
+    def _view(data, offset, size):
+        return memoryview(data)[offset:offset + size]
+
+class DecodeError(Exception):
+    pass
+
+def _truncated(name, pos, end, data):
+    return DecodeError("truncated %s at %d: needs %d bytes, %d left" % (name, pos, end - pos, len(data) - pos))
+
+'''
+
+RUNTIME = '''
+#
+# Compound values
+def decode_items(data, pos, count):
+    items = []
+    for i in range(count):
+        value, pos = decode_value(data, pos)
+        items.append(value)
+    return items
+
+def _map(items):
+    pairs = list(zip(items[0::2], items[1::2]))
+    try:
+        return dict(pairs)
+    except TypeError:
+        # unhashable keys
+        return pairs
+
+def decode_array_items(data, pos, count):
+    code = _unpack_B(data, pos)[0]
+    pos += 1
+    descriptor = None
+    if code == 0:
+        descriptor, pos = decode_value(data, pos)
+        code = _unpack_B(data, pos)[0]
+        pos += 1
+    decode = DECODERS[code]
+    if decode is None:
+        raise DecodeError("unknown array element format code 0x%02x at %d" % (code, pos - 1))
+    items = []
+    for i in range(count):
+        value, pos = decode(data, pos)
+        items.append(value)
+    if descriptor is not None:
+        items = [described(descriptor, value) for value in items]
+    return items
+
+#
+# Described values
+class Described(object):
+    __slots__ = ("descriptor", "name", "value")
+
+    def __init__(self, descriptor, name, value):
+        self.descriptor = descriptor  # the descriptor code, or the symbol if not in the spec
+        self.name = name              # type name, None if not in the spec
+        self.value = value
+
+    def fields(self):
+        \'\'\' A list value as a dict of field name to value. Fields past the end of the list are absent.\'\'\'
+        return dict(zip(FIELDS.get(self.name, ()), self.value or []))
+
+    def __eq__(self, other):
+        return isinstance(other, Described) and \\
+            (self.descriptor, self.value) == (other.descriptor, other.value)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.descriptor)
+
+    def __repr__(self):
+        if self.name is None:
+            return "Described(%r, %r)" % (self.descriptor, self.value)
+        if isinstance(self.value, list) and self.name in FIELDS:
+            return "%s(%s)" % (self.name, ", ".join(["%s=%r" % (n, v) for n, v in
+                                                     zip(FIELDS[self.name], self.value)]))
+        return "%s(%r)" % (self.name, self.value)
+
+def described(descriptor, value):
+    code = SYMBOLS.get(descriptor, descriptor)
+    return Described(code, DESCRIPTORS.get(code), value)
+
+#
+# Values
+def decode_value(data, pos=0):
+    \'\'\' Decode the value at data[pos]. Return (value, position after the value).\'\'\'
+    try:
+        code = _unpack_B(data, pos)[0]
+        if code == 0:
+            descriptor, end = decode_value(data, pos + 1)
+            value, end = decode_value(data, end)
+            return described(descriptor, value), end
+        decode = DECODERS[code]
+        if decode is None:
+            raise DecodeError("unknown format code 0x%02x at %d" % (code, pos))
+        return decode(data, pos + 1)
+    except StructError as e:
+        raise DecodeError("truncated value at %d: %s" % (pos, e))
+
+#
+# Frames
+Frame = namedtuple("Frame", "size doff type channel body payload end")
+_unpack_frame = Struct(">IBBH").unpack_from
+FRAME_TYPES = {0: "amqp", 1: "sasl"}
+
+def decode_frame(data, pos=0):
+    \'\'\' Decode the frame at data[pos]. body is the performative or sasl
+        frame body, None for an empty frame. The payload runs from
+        payload to end. A frame that runs past the end of data is a
+        DecodeError, as is a body that runs past the end of the frame.\'\'\'
+    if pos + 8 > len(data):
+        raise _truncated("frame header", pos, pos + 8, data)
+    size, doff, type, channel = _unpack_frame(data, pos)
+    if size < 8 or doff < 2 or doff * 4 > size:
+        raise DecodeError("bad frame header at %d: size %d doff %d" % (pos, size, doff))
+    end = pos + size
+    if end > len(data):
+        raise _truncated("frame", pos, end, data)
+    payload = pos + doff * 4
+    body = None
+    if payload < end:
+        # positions in the view are positions in data
+        body, payload = decode_value(data if end == len(data) else _view(data, 0, end), payload)
+    return Frame(size, doff, type, channel, body, payload, end)
+
+def decode_sections(data, pos, end):
+    \'\'\' Decode the message sections in a transfer payload\'\'\'
+    sections = []
+    while pos < end:
+        section, pos = decode_value(data, pos)
+        sections.append(section)
+    return sections
+
+def iter_frames(data, pos=0, end=None):
+    \'\'\' Decode consecutive frames starting at data[pos]\'\'\'
+    if end is None:
+        end = len(data)
+    elif end < len(data):
+        data = _view(data, 0, end)  # so no frame runs past end
+    while pos + 8 <= end:
+        frame = decode_frame(data, pos)
+        yield frame
+        pos = frame.end
+'''
+
+def function_name(enc):
+    return "decode_" + enc.fullName.replace(":", "_").replace("-", "_")
+
+def fixed_format(typename, width):
+    if typename in FIXED_FORMATS:
+        return FIXED_FORMATS[typename]
+    if typename in SIGNED_TYPES:
+        return SIGNED_FORMATS[width]
+    return UNSIGNED_FORMATS[width]
+
+def decode_function(type, enc):
+    ''' Return the source lines of the decode function for one encoding'''
+    typename = type.name
+    category = enc.category
+    width = int(enc.width)
+    lines = ["def %s(data, pos):" % function_name(enc)]
+    if width > 0:
+        lines.append("    if pos + %d > len(data):" % width)
+        lines.append("        raise _truncated(%r, pos, pos + %d, data)" % (str(enc.fullName), width))
+    if category == "fixed" and width == 0:
+        lines.append("    return %s, pos" % CONSTANT_VALUES.get(enc.fullName, "0"))
+    elif category == "fixed" and typename == "uuid":
+        lines.append("    return UUID(bytes=bytes(data[pos:pos + %d])), pos + %d" % (width, width))
+    elif category == "fixed" and typename in RAW_TYPES:
+        lines.append("    return bytes(data[pos:pos + %d]), pos + %d" % (width, width))
+    elif category == "fixed":
+        value = "_unpack_%s(data, pos)[0]" % fixed_format(typename, width)
+        value = FIXED_CONVERSIONS.get(typename, "%s") % value
+        lines.append("    return %s, pos + %d" % (value, width))
+    elif category == "variable":
+        value = VARIABLE_CONVERSIONS[typename] % "bytes(data[pos + %d:end])" % width
+        lines.append("    end = pos + %d + _unpack_%s(data, pos)[0]" % (width, UNSIGNED_FORMATS[width]))
+        lines.append("    if end > len(data):")
+        lines.append("        raise _truncated(%r, pos, end, data)" % str(enc.fullName))
+        lines.append("    return %s, end" % value)
+    elif category in ["compound", "array"]:
+        items = "decode_items" if category == "compound" else "decode_array_items"
+        value = "%s(data, pos + %d, count)" % (items, width * 2)
+        if typename == "map":
+            value = "_map(%s)" % value
+        lines.append("    if pos + %d > len(data):" % (width * 2))
+        lines.append("        raise _truncated(%r, pos, pos + %d, data)" % (str(enc.fullName), width * 2))
+        lines.append("    size, count = _unpack_%s(data, pos)" % (UNSIGNED_FORMATS[width] * 2))
+        lines.append("    if pos + %d + size > len(data):" % width)
+        lines.append("        raise _truncated(%r, pos, pos + %d + size, data)" % (str(enc.fullName), width))
+        lines.append("    return %s, pos + %d + size" % (value, width))
+    else:
+        raise ValueError("no decoder for %s category %s width %d" % (enc.fullName, category, width))
+    return lines
+
+def constant_value(text):
+    try:
+        return int(text, 0)
+    except ValueError:
+        return text
+
+def generate(model):
+    ''' Return the source of the decoder module for a webpage.SpecModel'''
+    out = [HEADER]
+
+    out.append("_unpack_B = Struct(\">B\").unpack_from")
+    formats = set()
+    for type in model.typesPrimitive:
+        for enc in type.encodings:
+            width = int(enc.width)
+            if enc.category == "fixed" and width > 0 and type.name not in RAW_TYPES:
+                formats.add(fixed_format(type.name, width))
+            elif enc.category == "variable":
+                formats.add(UNSIGNED_FORMATS[width])
+            elif enc.category in ["compound", "array"]:
+                formats.add(UNSIGNED_FORMATS[width] * 2)
+    formats.discard("B")
+    for fmt in sorted(formats):
+        out.append("_unpack_%s = Struct(\">%s\").unpack_from" % (fmt, fmt))
+
+    out.append(RUNTIME)
+    out.append("#")
+    out.append("# Primitive encodings")
+    table = []
+    for type in model.typesPrimitive:
+        for enc in type.encodings:
+            out += decode_function(type, enc)
+            out.append("")
+            table.append("DECODERS[%s] = %s" % (enc.code, function_name(enc)))
+    out.append("DECODERS = [None] * 256")
+    out += table
+    out.append("")
+
+    out.append("#")
+    out.append("# Described types")
+    out.append("DESCRIPTORS = {  # descriptor code -> type name")
+    for code in model.descr_codes:
+        type = model.descr_typemap[model.descr_mapcode[code]]
+        out.append("    0x%016x: %r," % (webpage.code_value(type.descriptorCode), str(type.name)))
+    out.append("}")
+    out.append("")
+    out.append("SYMBOLS = {  # descriptor symbol -> descriptor code")
+    for code in model.descr_codes:
+        type = model.descr_typemap[model.descr_mapcode[code]]
+        out.append("    %r: 0x%016x," % (str(type.descriptorName), webpage.code_value(type.descriptorCode)))
+    out.append("}")
+    out.append("")
+    out.append("SECTIONS = {  # type name -> spec section")
+    for code in model.descr_codes:
+        section, name = model.descr_mapcode[code].split()
+        out.append("    %r: %r," % (str(name), str(section)))
+    out.append("}")
+    out.append("")
+    out.append("FIELDS = {  # type name -> field names in list order")
+    for code in model.descr_codes:
+        type = model.descr_typemap[model.descr_mapcode[code]]
+        names = tuple([str(field.name) for field in type.fields])
+        if names:
+            out.append("    %r: %r," % (str(type.name), names))
+    out.append("}")
+    out.append("")
+    out.append("PERFORMATIVES = {  # descriptor code -> frame body type name")
+    for code in model.descr_codes:
+        type = model.descr_typemap[model.descr_mapcode[code]]
+        if type.provides in ["frame", "sasl-frame"]:
+            out.append("    0x%016x: %r," % (webpage.code_value(type.descriptorCode), str(type.name)))
+    out.append("}")
+    out.append("")
+
+    out.append("#")
+    out.append("# Constants")
+    out.append("CONSTANTS = {")
+    for definition in model.definitionsAll:
+        out.append("    %r: %r," % (str(definition.name), constant_value(definition.value)))
+    out.append("}")
+    return "\n".join(out) + "\n"
+
+#
+# Truncated input through the generated decoder
+def encoding_samples(model):
+    ''' Yield (name, bytes) of a short complete value for each primitive
+        encoding that has a width'''
+    for type in model.typesPrimitive:
+        for enc in type.encodings:
+            width = int(enc.width)
+            if width == 0:
+                continue
+            code = bytearray([int(enc.code, 0)])
+            if enc.category == "fixed":
+                yield str(enc.fullName), bytes(code + b"\0" * width)
+                continue
+            length = struct.Struct(">" + UNSIGNED_FORMATS[width]).pack
+            if enc.category == "variable":
+                body = length(3) + b"abc"
+            elif enc.category == "compound":
+                # two nulls, a map of one pair
+                body = length(width + 2) + length(2) + b"\x40\x40"
+            else:
+                # one null: the constructor and no element bytes
+                body = length(width + 1) + length(1) + b"\x40"
+            yield str(enc.fullName), bytes(code + body)
+
+def check(model):
+    ''' Generate the decoder and feed it each encoding cut short at every
+        length, and frames that are cut short or whose body runs past the
+        frame. Each must raise DecodeError. Returns the problems found.'''
+    decoder = {}
+    exec(compile(generate(model), "amqp_decoder.py", "exec"), decoder)
+    DecodeError = decoder["DecodeError"]
+    problems = []
+
+    def expectError(name, call, *args):
+        try:
+            result = call(*args)
+            problems.append("%s: returned %r instead of raising DecodeError" % (name, result))
+        except DecodeError:
+            pass
+        except Exception as e:
+            problems.append("%s: raised %s: %s instead of DecodeError" % (name, type(e).__name__, e))
+
+    for name, sample in encoding_samples(model):
+        for data in [sample, bytearray(sample)]:
+            try:
+                value, pos = decoder["decode_value"](data)
+                if pos != len(data):
+                    problems.append("%s: decoding %d bytes ended at %d" % (name, len(data), pos))
+            except Exception as e:
+                problems.append("%s: raised %s: %s" % (name, type(e).__name__, e))
+            for cut in range(1, len(data)):
+                expectError("%s cut to %d bytes" % (name, cut), decoder["decode_value"], data[:cut])
+
+    header = struct.Struct(">IBBH").pack
+    empty = header(8, 2, 0, 0)
+    nullBody = header(9, 2, 0, 0) + b"\x40"
+    for data in [b"", empty[:4], header(0xff, 2, 0, 0) + b"\x40" * 4, nullBody[:8]]:
+        expectError("frame %r" % data, decoder["decode_frame"], data)
+    # a string body that runs on into the next frame
+    expectError("frame body past its end", decoder["decode_frame"], header(10, 2, 0, 0) + b"\xa1\x05ab" + empty)
+    expectError("iter_frames past end", lambda data: list(decoder["iter_frames"](data, 0, 16)), empty + nullBody)
+    return problems
+
+#
+#
+def main_except(argv):
+    import argparse
+    parser = argparse.ArgumentParser(description="Generate a Python AMQP 1.0 decoder module from the spec xml.")
+    parser.add_argument("-o", "--output", default=None,
+                        help="write the module to this file instead of stdout")
+    parser.add_argument("--check", action="store_true",
+                        help="check that the generated module rejects truncated input and exit")
+    parser.add_argument("--spec-dir", default=webpage.SPEC_DIR,
+                        help="directory holding the spec xml files [%(default)s]")
+    parser.add_argument("--cache-dir", default=webpage.CACHE_DIR,
+                        help="directory for the cached spec model [%(default)s]")
+    args = parser.parse_args(argv[1:])
+
+    model = webpage.load_model(args.spec_dir, args.cache_dir)
+    if args.check:
+        problems = check(model)
+        for problem in problems:
+            print(problem)
+        print("%d problems" % len(problems))
+        if problems:
+            raise webpage.ExitStatus(2)
+        return
+    text = generate(model)
+    if args.output is None or args.output == "-":
+        sys.stdout.write(text)
+    else:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+def main(argv):
+    try:
+        main_except(argv)
+        return 0
+    except webpage.ExitStatus as e:
+        return e.status
+    except Exception as e:
+        print("%s: %s"%(type(e).__name__, e))
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Report the structural differences between two copies of the AMQP 1.0
+# spec xml:
+#
+#    spec_diff.py OLD_DIR NEW_DIR                    text report
+#    spec_diff.py OLD_DIR NEW_DIR --json diff.json   json report
+#    spec_diff.py OLD_DIR NEW_DIR --html diff.html   html report
+#
+# Each directory holds the five spec xml files. Both are loaded into
+# the webpage.py model, through the model cache, and flattened with
+# spec_export. Types and constants are matched by name, fields and
+# choices by name within their type and encodings by their full name,
+# so the diff takes time linear in the size of the specs. Reported:
+#
+#   added, removed  types and constants in only one of the specs
+#   changed         types and constants in both with different
+#                   attributes (kind, section, source, provides, label,
+#                   descriptor name and code, encoded size bounds) or
+#                   with fields, encodings or choices added, removed,
+#                   changed or reordered
+#
+# The json report:
+#
+#   old, new    {dir, digest}
+#   summary     {added, removed, changed: counts}
+#   added       [{name, kind, section}]
+#   removed     [{name, kind, section}]
+#   changed     [{name, kind, section, attributes: {name: [old, new]},
+#                 fields|encodings|choices: {added: [names], removed: [names],
+#                     changed: {name: {attribute: [old, new]}}, order: [old names, new names]}}]
+#
+
+from __future__ import print_function
+import sys, os
+
+import webpage
+import spec_export
+
+# The child lists of each kind of entry and the key of their members
+CHILDREN = [("fields", "name"), ("encodings", "name"), ("choices", "name")]
+
+#
+# Flatten an export into map[name] = entry. An entry is a dictionary of
+# attributes plus, for each child list, an ordered list of child names
+# and map[child name] = child attributes.
+def flatten(data):
+    entries = {}
+    order = []
+    def add(name, kind, item):
+        entry = {"kind": kind}
+        for key, value in item.items():
+            if key == "descriptor":
+                entry["descriptor name"] = value["name"]
+                entry["descriptor code"] = value["code"]
+            elif key == "size":
+                entry["min size"] = value["min"]
+                entry["max size"] = value["max"]
+            elif key not in [c for c, k in CHILDREN]:
+                entry[key] = value
+        for childList, childKey in CHILDREN:
+            if childList in item:
+                names = [child[childKey] for child in item[childList]]
+                entry[childList] = (names, dict(zip(names, item[childList])))
+        entries[name] = entry
+        order.append(name)
+    for item in data["constants"]:
+        add(item["name"], "constant", item)
+    for kind, key in [("primitive", "primitives"), ("described", "described"),
+                      ("enumerated", "enumerated"), ("restricted", "restricted")]:
+        for item in data[key]:
+            add(item["name"], kind, item)
+    return entries, order
+
+def diff_children(oldChildren, newChildren):
+    ''' Differences between two (names, map) child lists, or None'''
+    oldNames, oldMap = oldChildren
+    newNames, newMap = newChildren
+    diff = {}
+    added = [name for name in newNames if name not in oldMap]
+    removed = [name for name in oldNames if name not in newMap]
+    changed = {}
+    for name in oldNames:
+        if name in newMap:
+            attributes = diff_attributes(oldMap[name], newMap[name])
+            if attributes:
+                changed[name] = attributes
+    oldCommon = [name for name in oldNames if name in newMap]
+    newCommon = [name for name in newNames if name in oldMap]
+    if added:
+        diff["added"] = added
+    if removed:
+        diff["removed"] = removed
+    if changed:
+        diff["changed"] = changed
+    if oldCommon != newCommon:
+        diff["order"] = [oldNames, newNames]
+    return diff or None
+
+def diff_attributes(old, new):
+    ''' map[attribute] = [old value, new value] for the plain attributes that differ'''
+    attributes = {}
+    for key in sorted(set(old) | set(new)):
+        if key in [c for c, k in CHILDREN]:
+            continue
+        if old.get(key) != new.get(key):
+            attributes[key] = [old.get(key), new.get(key)]
+    return attributes
+
+def diff(oldData, newData):
+    ''' Return the diff report of two spec_export exports'''
+    oldEntries, oldOrder = flatten(oldData)
+    newEntries, newOrder = flatten(newData)
+    def brief(name, entry):
+        return {"name": name, "kind": entry["kind"], "section": entry.get("section")}
+    report = {"added": [brief(name, newEntries[name]) for name in newOrder if name not in oldEntries],
+              "removed": [brief(name, oldEntries[name]) for name in oldOrder if name not in newEntries],
+              "changed": []}
+    for name in newOrder:
+        if name not in oldEntries:
+            continue
+        old = oldEntries[name]
+        new = newEntries[name]
+        change = brief(name, new)
+        attributes = diff_attributes(old, new)
+        if attributes:
+            change["attributes"] = attributes
+        for childList, childKey in CHILDREN:
+            children = diff_children(old.get(childList, ([], {})), new.get(childList, ([], {})))
+            if children:
+                change[childList] = children
+        if len(change) > 3:
+            report["changed"].append(change)
+    report["summary"] = dict([(key, len(report[key])) for key in ["added", "removed", "changed"]])
+    return report
+
+def load_export(specdir, cachedir):
+    for filename in webpage.SPEC_FILES:
+        if not os.path.exists(os.path.join(specdir, filename)):
+            raise ValueError("%s has no %s" % (specdir, filename))
+    return spec_export.export(webpage.load_model(specdir, cachedir), spec_export.xml_digest(specdir))
+
+#
+# Report rows: (what, name, detail, old, new), shared by the text and
+# html reports.
+def value_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return ", ".join([str(v) for v in value])
+    return " ".join(str(value).split())
+
+def report_rows(report):
+    rows = []
+    for item in report["added"]:
+        rows.append(("added", "%s %s" % (item["kind"], item["name"]), "", "", value_text(item["section"])))
+    for item in report["removed"]:
+        rows.append(("removed", "%s %s" % (item["kind"], item["name"]), "", value_text(item["section"]), ""))
+    for change in report["changed"]:
+        name = "%s %s" % (change["kind"], change["name"])
+        for attribute, values in sorted(change.get("attributes", {}).items()):
+            rows.append(("changed", name, attribute, value_text(values[0]), value_text(values[1])))
+        for childList, childKey in CHILDREN:
+            children = change.get(childList)
+            if children is None:
+                continue
+            what = childList[:-1]
+            for child in children.get("added", []):
+                rows.append(("changed", name, "%s %s added" % (what, child), "", ""))
+            for child in children.get("removed", []):
+                rows.append(("changed", name, "%s %s removed" % (what, child), "", ""))
+            for child, attributes in sorted(children.get("changed", {}).items()):
+                for attribute, values in sorted(attributes.items()):
+                    rows.append(("changed", name, "%s %s %s" % (what, child, attribute),
+                                 value_text(values[0]), value_text(values[1])))
+            if "order" in children:
+                rows.append(("changed", name, "%s order" % what,
+                             value_text(children["order"][0]), value_text(children["order"][1])))
+    return rows
+
+def format_text(report):
+    out = []
+    for what, name, detail, old, new in report_rows(report):
+        text = "%s %s" % (what, name)
+        if detail:
+            text += ": %s" % detail
+        if old or new:
+            text += ": %s -> %s" % (old or "-", new or "-")
+        out.append(text)
+    out.append("%(added)d added, %(removed)d removed, %(changed)d changed" % report["summary"])
+    return "\n".join(out) + "\n"
+
+def format_html(report):
+    esc = webpage.html_escape
+    out = []
+    out.append("<!DOCTYPE html>")
+    out.append("<html><head><meta charset=\"utf-8\"><title>AMQP 1.0 spec diff</title>")
+    out.append("<style>body { font-family: sans-serif; } table { border-collapse: collapse; } "
+               "td, th { border: 1px solid #ccc; padding: 2px 6px; text-align: left; vertical-align: top; } "
+               ".added { background: #e6ffe6; } .removed { background: #ffe6e6; }</style>")
+    out.append("</head><body>")
+    out.append("<h1>AMQP 1.0 spec diff</h1>")
+    out.append("<p>old: %s (%s)<br>new: %s (%s)</p>" % (esc(report["old"]["dir"]), esc(report["old"]["digest"]),
+                                                       esc(report["new"]["dir"]), esc(report["new"]["digest"])))
+    out.append("<p>%(added)d added, %(removed)d removed, %(changed)d changed</p>" % report["summary"])
+    out.append("<table>")
+    out.append("<tr><th></th><th>type</th><th>what</th><th>old</th><th>new</th></tr>")
+    for what, name, detail, old, new in report_rows(report):
+        out.append("<tr class=\"%s\"><td>%s</td><td>%s</td><td>%s</td><td>%s</td><td>%s</td></tr>" %
+                   (what, what, esc(name), esc(detail), esc(old), esc(new)))
+    out.append("</table>")
+    out.append("</body></html>")
+    return "\n".join(out) + "\n"
+
+def write_text(text, filename):
+    if filename == "-":
+        sys.stdout.write(text)
+    else:
+        with open(filename, "w") as f:
+            f.write(text)
+
+#
+#
+def main_except(argv):
+    import argparse
+    import json
+    parser = argparse.ArgumentParser(description="Report the differences between two copies of the AMQP 1.0 spec xml.")
+    parser.add_argument("old", help="directory holding the old spec xml files")
+    parser.add_argument("new", help="directory holding the new spec xml files")
+    parser.add_argument("--json", metavar="FILE", default=None,
+                        help="write the report as json to FILE, - for stdout")
+    parser.add_argument("--html", metavar="FILE", default=None,
+                        help="write the report as html to FILE, - for stdout")
+    parser.add_argument("--cache-dir", default=webpage.CACHE_DIR,
+                        help="directory for the cached spec models [%(default)s]")
+    parser.add_argument("--exit-code", action="store_true",
+                        help="exit with status 2 if the specs differ")
+    args = parser.parse_args(argv[1:])
+
+    oldData = load_export(args.old, args.cache_dir)
+    newData = load_export(args.new, args.cache_dir)
+    report = diff(oldData, newData)
+    report["old"] = {"dir": args.old, "digest": oldData["digest"]}
+    report["new"] = {"dir": args.new, "digest": newData["digest"]}
+
+    if args.json is not None:
+        write_text(json.dumps(report, indent=1, sort_keys=True, separators=(",", ": ")) + "\n", args.json)
+    if args.html is not None:
+        write_text(format_html(report), args.html)
+    if args.json is None and args.html is None:
+        write_text(format_text(report), "-")
+    if args.exit_code and (report["added"] or report["removed"] or report["changed"]):
+        raise webpage.ExitStatus(2)
+
+def main(argv):
+    try:
+        main_except(argv)
+        return 0
+    except webpage.ExitStatus as e:
+        return e.status
+    except Exception as e:
+        print("%s: %s"%(type(e).__name__, e))
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Export the AMQP 1.0 spec model for other tools:
+#
+#    spec_export.py --json amqp-spec.json --pickle amqp-spec.pickle
+#
+# Both files hold the same plain data: lists, dictionaries, strings,
+# numbers and booleans, described by SCHEMA_VERSION below. load() reads
+# either one back. The pickle loads in well under a millisecond.
+#
+# Schema, version 2. Lists are in spec document order.
+#
+#   schema      SCHEMA_VERSION
+#   digest      sha1 of the spec xml files the export was made from
+#   constants   [{name, value, label, section}]
+#   primitives  [{name, label, section,
+#                 encodings: [{name, encoding, code, category, width, label}]}]
+#   described   [{name, class, source, provides, label, section,
+#                 descriptor: {name, code, value},
+#                 fields: [{name, type, requires, default, mandatory, multiple, label}],
+#                 size: {min, max, variable, variableFields}}]
+#   enumerated  [{name, source, provides, label, section, choices: [{name, value}]}]
+#   restricted  [{name, source, provides, label, section}]
+#   provides    {provided type name: [names of the types that provide it]}
+#   xref        {type name: [{referrer, category, section}]}
+#
+# code is the spec's text ("0xa1", "0x00000000:0x00000010"), value the
+# code as an integer. provides and requires are lists of names. Absent
+# attributes are None, or empty lists for provides and requires.
+# size is the encoded size in bytes, see webpage.EncodedSize: max is
+# with the variableFields' values empty.
+#
+
+from __future__ import print_function
+import sys, os
+
+import webpage
+
+# Bump SCHEMA_VERSION whenever the exported data changes shape.
+SCHEMA_VERSION = 2
+
+def label(node):
+    text = node.label
+    if text is None:
+        return None
+    return " ".join(text.split())
+
+def name_list(text):
+    if not text:
+        return []
+    return [name.strip() for name in text.split(",")]
+
+def type_info(type):
+    return {"name": type.name, "source": type.source,
+            "provides": name_list(type.provides), "label": label(type), "section": type.section}
+
+def xml_digest(specdir=webpage.SPEC_DIR):
+    import hashlib
+    h = hashlib.sha1()
+    for filename in webpage.SPEC_FILES:
+        with open(os.path.join(specdir, filename), "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+def export(model, digest=None):
+    ''' Return the plain data export of a webpage.SpecModel'''
+    data = {"schema": SCHEMA_VERSION, "digest": digest}
+
+    data["constants"] = [{"name": d.name, "value": d.value, "label": label(d), "section": d.section}
+                         for d in model.definitionsAll]
+
+    data["primitives"] = []
+    for type in model.typesPrimitive:
+        encodings = []
+        for enc in type.encodings:
+            encodings.append({"name": enc.fullName, "encoding": enc.name, "code": enc.code,
+                              "category": enc.category, "width": int(enc.width),
+                              "label": label(enc)})
+        data["primitives"].append({"name": type.name, "label": label(type), "section": type.section,
+                                   "encodings": encodings})
+
+    data["described"] = []
+    for type in model.typesDescribed:
+        info = type_info(type)
+        info["class"] = type.cls
+        info["descriptor"] = {"name": type.descriptorName, "code": type.descriptorCode,
+                              "value": webpage.code_value(type.descriptorCode)}
+        info["fields"] = []
+        for field in type.fields:
+            info["fields"].append({"name": field.name, "type": field.type,
+                                   "requires": name_list(field.requires), "default": field.default,
+                                   "mandatory": field.mandatory == "true",
+                                   "multiple": field.multiple == "true", "label": label(field)})
+        size = model.encodedSizes[type.name]
+        info["size"] = {"min": size.min, "max": size.max, "variable": size.variable,
+                        "variableFields": size.variableFields}
+        data["described"].append(info)
+
+    data["enumerated"] = []
+    for type in model.typesEnumerated:
+        info = type_info(type)
+        info["choices"] = [{"name": c.name, "value": c.value} for c in type.choices]
+        data["enumerated"].append(info)
+
+    data["restricted"] = [type_info(type) for type in model.typesRestricted]
+
+    data["provides"] = dict([(ptype, [type.name for type in model.provided[ptype]])
+                             for ptype in model.providedtypenames])
+
+    data["xref"] = dict([(name, [{"referrer": ref["referrer"], "category": ref["category"],
+                                  "section": ref["section"]} for ref in refs])
+                         for name, refs in model.xref.items()])
+    return data
+
+def write_json(data, filename):
+    import json
+    text = json.dumps(data, indent=1, sort_keys=True, separators=(",", ": "))
+    if filename == "-":
+        sys.stdout.write(text + "\n")
+    else:
+        with open(filename, "w") as f:
+            f.write(text + "\n")
+
+def write_pickle(data, filename):
+    try:
+        import cPickle as pickle
+    except ImportError:
+        import pickle
+    with open(filename, "wb") as f:
+        # protocol 2 so that python 2 and 3 can both read it
+        pickle.dump(data, f, 2)
+
+def load(filename):
+    ''' Load an export written by this script, json or pickle by the file name'''
+    if filename.endswith(".json"):
+        import json
+        with open(filename) as f:
+            data = json.load(f)
+    else:
+        try:
+            import cPickle as pickle
+        except ImportError:
+            import pickle
+        with open(filename, "rb") as f:
+            data = pickle.load(f)
+    if data.get("schema") != SCHEMA_VERSION:
+        raise ValueError("%s has schema %s, expected %s" % (filename, data.get("schema"), SCHEMA_VERSION))
+    return data
+
+#
+#
+def main_except(argv):
+    import argparse
+    parser = argparse.ArgumentParser(description="Export the AMQP 1.0 spec model as json and pickle.")
+    parser.add_argument("--json", metavar="FILE", default=None,
+                        help="write the json export to FILE, - for stdout")
+    parser.add_argument("--pickle", metavar="FILE", default=None,
+                        help="write the pickle export to FILE")
+    parser.add_argument("--spec-dir", default=webpage.SPEC_DIR,
+                        help="directory holding the spec xml files [%(default)s]")
+    parser.add_argument("--cache-dir", default=webpage.CACHE_DIR,
+                        help="directory for the cached spec model [%(default)s]")
+    args = parser.parse_args(argv[1:])
+    if args.json is None and args.pickle is None:
+        args.json = "-"
+
+    data = export(webpage.load_model(args.spec_dir, args.cache_dir), xml_digest(args.spec_dir))
+    if args.json is not None:
+        write_json(data, args.json)
+    if args.pickle is not None:
+        write_pickle(data, args.pickle)
+
+def main(argv):
+    try:
+        main_except(argv)
+        return 0
+    except webpage.ExitStatus as e:
+        return e.status
+    except Exception as e:
+        print("%s: %s"%(type(e).__name__, e))
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
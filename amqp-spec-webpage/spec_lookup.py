@@ -0,0 +1,336 @@
+#!/usr/bin/env python
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Answer quick questions about the AMQP 1.0 spec without generating
+# the web page:
+#
+#    spec_lookup.py 0x00000000:0x00000014      descriptor code -> type
+#    spec_lookup.py format 0xa1                format code -> encoding
+#    spec_lookup.py fields transfer            type -> fields
+#    spec_lookup.py field handle               field name -> types holding it
+#    spec_lookup.py referrers sequence-no      type -> what is defined in terms of it
+#    spec_lookup.py dependents sequence-no     type -> everything that depends on it, transitively
+#    spec_lookup.py dependents delivery-state  provided type -> its providers and all that depend on them
+#    spec_lookup.py --check                    check the dependents of every provided type
+#    spec_lookup.py < queries.txt              one query per line
+#
+# The lookup tables are built from the webpage.py spec model and saved
+# next to the model cache as plain dictionaries, keyed by the same hash
+# of the spec xml. A warm lookup loads one small pickle and does
+# dictionary lookups.
+#
+
+from __future__ import print_function
+import sys, os
+
+import webpage
+
+# Bump LOOKUP_VERSION whenever the lookup tables change shape.
+LOOKUP_VERSION = 3
+
+KINDS = ["code", "descriptor", "format", "type", "fields", "field", "referrers", "dependencies", "dependents"]
+
+#
+#
+class SpecLookup():
+    def __init__(self):
+        self.descriptors = {}  # map[int descriptor code] = described type name
+        self.formats = {}      # map[int format code] = encoding info
+        self.types = {}        # map[type name] = type info
+        self.fieldOwners = {}  # map[field name] = [list of (type name, field type)]
+        self.referrers = {}    # map[type name] = [list of (referrer, category, section)]
+        self.dependencies = {} # map[type name] = [type names it depends on, transitively]
+        self.dependents = {}   # map[type name] = [type names depending on it, transitively]
+
+    def build(self, model):
+        ''' Fill the tables from a webpage.SpecModel'''
+        for definition in model.definitionsAll:
+            self.types[definition.name] = {
+                "what": "type", "name": definition.name, "kind": "constant", "section": definition.section,
+                "value": definition.value, "label": definition.label}
+        for type in model.typesPrimitive:
+            encodings = []
+            for enc in type.encodings:
+                info = {"what": "encoding", "name": enc.fullName, "code": enc.code, "category": enc.category,
+                        "width": enc.width, "label": enc.label, "type": type.name}
+                encodings.append(info)
+                self.formats[webpage.code_value(enc.code)] = info
+            self.types[type.name] = {
+                "what": "type", "name": type.name, "kind": "primitive", "section": type.section,
+                "label": type.label, "encodings": encodings}
+        for type in model.typesRestricted:
+            self.types[type.name] = self.typeInfo(type, "restricted")
+        for lname in model.enum_longnames:
+            type = model.enum_typemap[lname]
+            info = self.typeInfo(type, "enumerated")
+            info["choices"] = [{"what": "choice", "name": c.name, "value": c.value}
+                               for c in type.choices]
+            self.types[type.name] = info
+        for code in model.descr_codes:
+            type = model.descr_typemap[model.descr_mapcode[code]]
+            name = type.name
+            info = self.typeInfo(type, "described")
+            info["descriptor"] = type.descriptorCode
+            info["descriptorName"] = type.descriptorName
+            info["fields"] = []
+            for field in type.fields:
+                finfo = dict([(a, getattr(field, a)) for a in
+                              ("name", "type", "requires", "default", "mandatory", "multiple", "label")])
+                finfo["what"] = "field"
+                info["fields"].append(finfo)
+                self.fieldOwners.setdefault(field.name, []).append( (name, field.type) )
+            self.types[name] = info
+            self.descriptors[webpage.code_value(type.descriptorCode)] = name
+        for name, refs in model.xref.items():
+            self.referrers[name] = [(ref["referrer"], ref["category"], ref["section"]) for ref in refs]
+        self.dependencies = model.typeGraph.allDepends
+        self.dependents = model.typeGraph.allDependedOn
+        return self
+
+    def typeInfo(self, type, kind):
+        return {"what": "type", "name": type.name, "kind": kind, "section": type.section,
+                "source": type.source, "provides": type.provides,
+                "label": type.label}
+
+    #
+    # Queries. Each returns a list of result dictionaries, empty if nothing matches.
+    def lookupDescriptor(self, code):
+        name = self.descriptors.get(webpage.code_value(code))
+        if name is None:
+            return []
+        return [self.types[name]]
+
+    def lookupFormat(self, code):
+        info = self.formats.get(webpage.code_value(code))
+        if info is None:
+            return []
+        return [info]
+
+    def lookupCode(self, code):
+        ''' A code with a ':' is a descriptor. A short code may be either.'''
+        if ":" in code:
+            return self.lookupDescriptor(code)
+        return self.lookupFormat(code) + self.lookupDescriptor(code)
+
+    def lookupType(self, name):
+        info = self.types.get(name)
+        if info is None:
+            return []
+        return [info]
+
+    def lookupFields(self, name):
+        info = self.types.get(name)
+        if info is None:
+            return []
+        return info.get("fields", info.get("choices", info.get("encodings", [])))
+
+    def lookupField(self, name):
+        return [{"what": "owner", "type": owner, "field": name, "fieldType": ftype}
+                for owner, ftype in self.fieldOwners.get(name, [])]
+
+    def lookupReferrers(self, name):
+        return [{"what": "referrer", "referrer": r, "category": c, "section": s}
+                for r, c, s in self.referrers.get(name, [])]
+
+    def graphNames(self, name):
+        ''' The dependency graph nodes for name: the type and the provided type of that name'''
+        return [n for n in (name, name + ",PROVIDED") if n in self.dependencies]
+
+    def lookupDependencies(self, name):
+        return [{"what": "dependency", "type": node, "relation": "depends on", "name": n}
+                for node in self.graphNames(name) for n in self.dependencies[node]]
+
+    def lookupDependents(self, name):
+        return [{"what": "dependency", "type": node, "relation": "is depended on by", "name": n}
+                for node in self.graphNames(name) for n in self.dependents[node]]
+
+    def check(self):
+        ''' Check that the dependents of each provided type list the types
+            providing it and the types with a field requiring it, and that
+            the dependents of each provider list those types too. Returns
+            the problems found.'''
+        providers = {}
+        requirers = {}
+        for info in self.types.values():
+            for name in webpage.noNoneString(info.get("provides")).split(","):
+                if name.strip():
+                    providers.setdefault(name.strip(), set()).add(info["name"])
+            for field in info.get("fields", []):
+                for name in webpage.noNoneString(field["requires"]).split(","):
+                    if name.strip():
+                        requirers.setdefault(name.strip(), set()).add(info["name"])
+        problems = []
+        for name in sorted(providers):
+            needed = providers[name] | requirers.get(name, set())
+            found = set([r["name"] for r in self.lookupDependents(name)])
+            for missing in sorted(needed - found):
+                problems.append("dependents %s lacks %s" % (name, missing))
+            for provider in sorted(providers[name]):
+                found = set([r["name"] for r in self.lookupDependents(provider)])
+                for missing in sorted(requirers.get(name, set()) - found - set([provider])):
+                    problems.append("dependents %s lacks %s, which requires %s" % (provider, missing, name))
+        return problems
+
+    def query(self, kind, key):
+        if kind not in KINDS:
+            raise ValueError("unknown lookup kind '%s'. Use one of %s" % (kind, ", ".join(KINDS)))
+        try:
+            return getattr(self, "lookup" + kind.capitalize())(key)
+        except ValueError:
+            # not a code
+            return []
+
+#
+# Load the lookup tables for the spec in specdir, building and saving
+# them if the cache does not have them.
+def load_lookup(specdir=webpage.SPEC_DIR, cachedir=webpage.CACHE_DIR):
+    try:
+        import cPickle as pickle
+    except ImportError:
+        import pickle
+    if cachedir is None:
+        return SpecLookup().build(webpage.load_model(specdir, None))
+    cachefile = os.path.join(cachedir, "spec-lookup-%s-%s.pickle" %
+                             (LOOKUP_VERSION, webpage.spec_digest(specdir)))
+    if os.path.exists(cachefile):
+        try:
+            with open(cachefile, "rb") as f:
+                lookup = SpecLookup()
+                lookup.__dict__.update(pickle.load(f))
+                return lookup
+        except Exception as e:
+            webpage.log("Ignoring unreadable lookup cache %s: %s" % (cachefile, e))
+    lookup = SpecLookup().build(webpage.load_model(specdir, cachedir))
+    try:
+        tmpfile = "%s.%d" % (cachefile, os.getpid())
+        with open(tmpfile, "wb") as f:
+            # plain dictionaries only, so loading needs no model classes
+            pickle.dump(lookup.__dict__, f, pickle.HIGHEST_PROTOCOL)
+        os.rename(tmpfile, cachefile)
+    except (IOError, OSError) as e:
+        webpage.log("Can't write lookup cache %s: %s" % (cachefile, e))
+    return lookup
+
+def parse_query(words):
+    ''' Return (kind, key) for a query given as a list of words'''
+    if len(words) == 2:
+        return words[0], words[1]
+    if len(words) == 1:
+        if words[0].lower().startswith("0x"):
+            return "code", words[0]
+        return "type", words[0]
+    raise ValueError("query should be '[kind] key', not '%s'" % " ".join(words))
+
+def format_result(kind, key, result):
+    what = result["what"]
+    if what == "type":
+        text = "%s %s: %s" % (result["kind"], result["name"], result["section"])
+        if "descriptor" in result:
+            text += " descriptor %s (%s)" % (result["descriptor"], result["descriptorName"])
+        if result.get("source"):
+            text += " source %s" % result["source"]
+        if result.get("value"):
+            text += " value %s" % result["value"]
+    elif what == "encoding":
+        text = "encoding %s: code %s %s width %s" % (result["name"], result["code"], result["category"], result["width"])
+    elif what == "field":
+        text = "field %s: %s" % (result["name"], result["type"])
+        for a in ("mandatory", "multiple", "default", "requires"):
+            if result.get(a):
+                text += " %s=%s" % (a, result[a])
+    elif what == "choice":
+        text = "choice %s: %s" % (result["name"], result["value"])
+    elif what == "dependency":
+        text = "%s %s %s" % (result["type"], result["relation"], result["name"])
+    elif what == "owner":
+        text = "field %s.%s: %s" % (result["type"], result["field"], result["fieldType"])
+    else:
+        text = "%s %s: %s" % (result["category"], result["referrer"], result["section"])
+    if result.get("label"):
+        text += " - %s" % " ".join(result["label"].split())
+    return "%s %s -> %s" % (kind, key, text)
+
+#
+#
+def main_except(argv):
+    import argparse
+    import json
+    parser = argparse.ArgumentParser(description="Look up AMQP 1.0 codes, types and fields.",
+                                     epilog="kinds: %s. With no query, queries are read from stdin, one per line." %
+                                            ", ".join(KINDS))
+    parser.add_argument("query", nargs="*", help="[kind] key")
+    parser.add_argument("--json", action="store_true", help="print the results as json, one line per query")
+    parser.add_argument("--check", action="store_true",
+                        help="check the dependents of every provided type and exit")
+    parser.add_argument("--spec-dir", default=webpage.SPEC_DIR,
+                        help="directory holding the spec xml files [%(default)s]")
+    parser.add_argument("--cache-dir", default=webpage.CACHE_DIR,
+                        help="directory for the cached lookup tables [%(default)s]")
+    args = parser.parse_args(argv[1:])
+
+    lookup = load_lookup(args.spec_dir, args.cache_dir)
+    if args.check:
+        problems = lookup.check()
+        for problem in problems:
+            print(problem)
+        print("%d problems" % len(problems))
+        if problems:
+            raise webpage.ExitStatus(2)
+        return
+    if args.query:
+        queries = [args.query]
+    else:
+        queries = [line.split() for line in sys.stdin if line.strip()]
+
+    out = []
+    missed = 0
+    for words in queries:
+        try:
+            kind, key = parse_query(words)
+            results = lookup.query(kind, key)
+        except ValueError as e:
+            missed += 1
+            out.append("%s: %s" % (" ".join(words), e))
+            continue
+        if not results:
+            missed += 1
+        if args.json:
+            out.append(json.dumps({"kind": kind, "key": key, "results": results}, sort_keys=True))
+        elif not results:
+            out.append("%s %s -> not found" % (kind, key))
+        else:
+            for result in results:
+                out.append(format_result(kind, key, result))
+    sys.stdout.write("\n".join(out) + "\n")
+    if missed:
+        raise webpage.ExitStatus(2)
+
+def main(argv):
+    try:
+        main_except(argv)
+        return 0
+    except webpage.ExitStatus as e:
+        return e.status
+    except Exception as e:
+        print("%s: %s"%(type(e).__name__, e))
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
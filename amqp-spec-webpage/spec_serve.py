@@ -0,0 +1,365 @@
+#!/usr/bin/env python
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Serve the AMQP 1.0 type reference page over http:
+#
+#    spec_serve.py                         http://localhost:8000/
+#    spec_serve.py --port 8080 --bind ''   the same for the whole team
+#
+# /  and /index.html   the split page, as webpage.py --split writes it.
+#                      Each section loads when its toggle is opened.
+# /<section>.html      one section of the split page
+# /page.html           the whole page in one file
+#
+# Pages are rendered from the cached spec model when first asked for
+# and kept in an LRU. Each entry holds the page text plus its gzip and,
+# when the brotli module is installed, brotli variants, compressed once
+# when the entry is made. A request gets the smallest variant its
+# Accept-Encoding allows. Every variant has an ETag and a request whose
+# If-None-Match holds it is answered 304 Not Modified.
+#
+# The spec files are checked for changes at most once per --interval
+# seconds. A change reloads the model and empties the LRU. A spec file
+# that doesn't parse, say one saved half edited, is logged and the last
+# good model is served until the file is fixed.
+#
+# The lock is held only to look up and insert LRU entries and to swap
+# in a new model, so pages already rendered are served while another
+# request renders or the model reloads.
+#
+
+from __future__ import print_function
+import sys, os
+import hashlib, threading, time, zlib
+from collections import OrderedDict
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+import webpage
+
+# Content codings in order of preference
+ENCODINGS = ["br", "gzip", "identity"]
+
+def gzip_bytes(body):
+    ''' gzip body. The header carries no time stamp so equal bodies compress equally.'''
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(body) + compressor.flush()
+
+#
+# One rendered page and its compressed variants
+class Resource():
+    def __init__(self, text, contentType="text/html; charset=utf-8"):
+        if not isinstance(text, bytes):
+            text = text.encode("utf-8")
+        self.contentType = contentType
+        self.variants = {}  # map[content coding] = (body, etag)
+        self.addVariant("identity", text)
+        self.addVariant("gzip", gzip_bytes(text))
+        if brotli is not None:
+            self.addVariant("br", brotli.compress(text))
+
+    def addVariant(self, coding, body):
+        etag = '"%s%s"' % (hashlib.sha1(body).hexdigest()[:20], "" if coding == "identity" else "-" + coding)
+        self.variants[coding] = (body, etag)
+
+    def variant(self, acceptEncoding):
+        ''' Return (content coding, body, etag) of the smallest acceptable variant'''
+        accepted = accepted_codings(acceptEncoding)
+        best = None
+        for coding in ENCODINGS:
+            if coding in self.variants and coding in accepted:
+                if best is None or len(self.variants[coding][0]) < len(self.variants[best][0]):
+                    best = coding
+        if best is None:
+            best = "identity"
+        body, etag = self.variants[best]
+        return best, body, etag
+
+def accepted_codings(header):
+    ''' The content codings an Accept-Encoding header allows. identity is
+        allowed unless it is refused by name.'''
+    accepted = set(["identity"])
+    for item in (header or "").split(","):
+        parts = [p.strip() for p in item.split(";")]
+        coding = parts[0].lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in parts[1:]:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        codings = ENCODINGS if coding == "*" else [coding]
+        for c in codings:
+            if q > 0:
+                accepted.add(c)
+            else:
+                accepted.discard(c)
+    return accepted
+
+def etag_matches(header, etag):
+    ''' True if an If-None-Match header holds etag'''
+    if header is None:
+        return False
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == "*" or tag == etag:
+            return True
+    return False
+
+#
+# A least recently used map with a fixed number of entries
+class LruCache():
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.entries.pop(key, None)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries[key] = value  # now the most recent
+        return value
+
+    def put(self, key, value):
+        self.entries.pop(key, None)
+        self.entries[key] = value
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+#
+# The pages served and the model they are rendered from
+class SpecSite():
+    def __init__(self, specdir=webpage.SPEC_DIR, cachedir=webpage.CACHE_DIR, search=True, classToggles=False,
+                 capacity=64, interval=1.0):
+        self.specdir = specdir
+        self.cachedir = cachedir
+        self.search = search
+        self.classToggles = classToggles
+        self.interval = interval
+        self.cache = LruCache(capacity)
+        self.lock = threading.Lock()
+        self.checkLock = threading.Lock()  # one thread checks and reloads at a time
+        self.paths = ["/index.html", "/page.html"] + ["/%s.html" % name for name, anchors, caption in webpage.SPLIT_SECTIONS]
+        self.states = None
+        self.checked = 0
+        self.model = None
+        self.generation = 0  # counts the models loaded, so a render of an old one isn't cached
+        # The phase timings would pile up for as long as the server runs
+        webpage.stats.enabled = False
+        self.check()
+
+    def check(self):
+        ''' Reload the model if the spec files changed since it was loaded.
+            While one thread reloads the others serve the model they have.'''
+        now = time.time()
+        with self.lock:
+            if self.model is not None and now - self.checked < self.interval:
+                return
+            self.checked = now
+        if not self.checkLock.acquire(False):
+            return
+        try:
+            states = webpage.spec_file_states(self.specdir)
+            if states == self.states:
+                return
+            if self.model is not None:
+                webpage.log("Spec files changed, reloading the model")
+            try:
+                model = webpage.load_model(self.specdir, self.cachedir)
+            except Exception as e:
+                if self.model is None:
+                    raise
+                # states stay as they were so the next check tries again
+                webpage.log("Keeping the last good model: %s: %s" % (type(e).__name__, e))
+                return
+            with self.lock:
+                self.model = model
+                self.states = states
+                self.generation += 1
+                self.cache.clear()
+        finally:
+            self.checkLock.release()
+
+    def render(self, model, path):
+        ''' Return the text served at path or None if there is none'''
+        if path == "/page.html":
+            return webpage.render_page(model, self.search, self.classToggles).getvalue()
+        if path == "/index.html":
+            split = [name for name, anchors, caption in webpage.SPLIT_SECTIONS]
+            only = [name for name, phase, renderer in webpage.PAGE_SECTIONS if name not in split]
+            page = webpage.render_page(model, self.search, self.classToggles, only)
+            placeholders, loader = webpage.split_parts()
+            return page.getShell(placeholders, loader)
+        name = path[1:-len(".html")]
+        if path in self.paths:
+            return webpage.render_page(model, self.search, self.classToggles, [name]).getvalue()
+        return None
+
+    def resource(self, path):
+        ''' Return the Resource served at path or None'''
+        if path == "/":
+            path = "/index.html"
+        self.check()
+        with self.lock:
+            resource = self.cache.get(path)
+            model = self.model
+            generation = self.generation
+        if resource is not None:
+            return resource
+        text = self.render(model, path)
+        if text is None:
+            return None
+        resource = Resource(text)
+        with self.lock:
+            if generation == self.generation:
+                self.cache.put(path, resource)
+        return resource
+
+    def warm(self):
+        ''' Render and compress every page ahead of the first request'''
+        for path in self.paths:
+            self.resource(path)
+
+#
+#
+class SpecRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.respond(True)
+
+    def do_HEAD(self):
+        self.respond(False)
+
+    def respond(self, withBody):
+        path = self.path.split("?", 1)[0].split("#", 1)[0]
+        resource = self.server.site.resource(path)
+        if resource is None:
+            self.send_error(404, "No such page")
+            return
+        coding, body, etag = resource.variant(self.headers.get("Accept-Encoding"))
+        if etag_matches(self.headers.get("If-None-Match"), etag):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Vary", "Accept-Encoding")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", resource.contentType)
+        self.send_header("Content-Length", str(len(body)))
+        if coding != "identity":
+            self.send_header("Content-Encoding", coding)
+        self.send_header("ETag", etag)
+        self.send_header("Vary", "Accept-Encoding")
+        # always revalidate, a 304 costs next to nothing
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        if withBody:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+class SpecServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, site, quiet=False):
+        HTTPServer.__init__(self, address, SpecRequestHandler)
+        self.site = site
+        self.quiet = quiet
+
+#
+#
+def main_except(argv):
+    import argparse
+    parser = argparse.ArgumentParser(description="Serve the AMQP 1.0 type reference page over http.")
+    parser.add_argument("--port", type=int, default=8000,
+                        help="port to listen on [%(default)s]")
+    parser.add_argument("--bind", default="localhost",
+                        help="address to listen on, '' for all [%(default)s]")
+    parser.add_argument("--class-toggles", action="store_true",
+                        help="serve the page that needs no dojo download, see webpage.py")
+    parser.add_argument("--no-search", action="store_true",
+                        help="leave the search box and its index out of the page")
+    parser.add_argument("--lru", type=int, default=64,
+                        help="rendered pages to keep [%(default)s]")
+    parser.add_argument("--interval", type=float, default=1.0,
+                        help="seconds between checks of the spec files for changes [%(default)s]")
+    parser.add_argument("--no-warm", action="store_true",
+                        help="render each page on its first request instead of at startup")
+    parser.add_argument("--quiet", action="store_true",
+                        help="do not log each request")
+    parser.add_argument("--spec-dir", default=webpage.SPEC_DIR,
+                        help="directory holding the spec xml files [%(default)s]")
+    parser.add_argument("--cache-dir", default=webpage.CACHE_DIR,
+                        help="directory for the cached spec model [%(default)s]")
+    args = parser.parse_args(argv[1:])
+
+    site = SpecSite(args.spec_dir, args.cache_dir, not args.no_search, args.class_toggles,
+                    args.lru, args.interval)
+    if not args.no_warm:
+        site.warm()
+    server = SpecServer((args.bind, args.port), site, args.quiet)
+    webpage.log("Serving http://%s:%d/%s" % (args.bind or "localhost", server.server_address[1],
+                                             "" if brotli is not None else " (no brotli module, gzip only)"))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def main(argv):
+    try:
+        main_except(argv)
+        return 0
+    except webpage.ExitStatus as e:
+        return e.status
+    except Exception as e:
+        print("%s: %s"%(type(e).__name__, e))
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -33,14 +33,20 @@
 # The page layout generally follows the layout of the AMQP 1.0 spec.
 #
 # TODO: scavenge the ascii art from <doc> sections
-# TODO: this code generates index data while printing table data.
-#       clean this up.
+#
+# The spec xml is first built into a SpecModel holding the categorized
+# types and all of the computed tables and indices. The model is cached
+# on disk keyed by a hash of the xml inputs so that later runs skip the
+# xml parsing entirely. The print_* renderers only read the model.
+# --watch keeps the parsed XmlStore of each spec file and re-parses
+# only the files that change.
+#
+# Importing this file as a library parses nothing. See AmqpSpec for
+# loading the model on demand and looking up types and codes.
 #
 
 from __future__ import print_function
-import sys, os
-import cgi
-import xml.etree.ElementTree as ET
+import sys, os, time
 
 #
 #
@@ -49,44 +55,208 @@ def log(text):
 
 
 #
-# construct data stores
-typesPrimitive = []  # class == primitive
-typesEnumerated = [] # no descriptor, choice count > 0
-typesRestricted = [] # no descriptor, choice count == 0
-typesDescribed = []  # contains descriptor
+# The spec files, in page order, and where to find them
+SPEC_FILES = ["types.xml", "transport.xml", "messaging.xml", "transactions.xml", "security.xml"]
+SPEC_DIR = os.path.dirname(os.path.abspath(__file__))
 
-typesAll = {}    # table[typename] = typenode for clean types
+#
+# Bump MODEL_VERSION whenever SpecModel changes shape so that stale
+# cached models are not loaded.
+MODEL_VERSION = 8
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")),
+                         "amqp-spec-webpage")
 
 #
-# indices computed while generating page
-typeNameIndex = []
-typeIndex = {}     # key='name', value = [list of types]
+# Name index: a hash table of name -> [list of entries].
+# Membership tests and inserts are dictionary operations. The names are
+# sorted once, when the index is emitted.
+class NameIndex():
+    def __init__(self):
+        self.entries = {}
+
+    def add(self, name, entry):
+        ''' Append entry to the list for name, creating the name as needed'''
+        entries = self.entries.get(name)
+        if entries is None:
+            entries = []
+            self.entries[name] = entries
+        entries.append(entry)
+
+    def addName(self, name):
+        ''' Create name with an empty entry list if it is not present'''
+        if name not in self.entries:
+            self.entries[name] = []
 
-fieldNameIndex = []
-fieldIndex = {}
+    def names(self):
+        return self.entries.keys()
 
-enumNameIndex = [] # names of enum values (not types)
-enumIndex = {}
+    def sortedNames(self):
+        return sorted(self.entries)
 
-grandNameIndex = []
-grandIndex = {}
+    def __contains__(self, name):
+        return name in self.entries
 
-xrefNameIndex = []
-xrefIndex = {}
+    def __getitem__(self, name):
+        return self.entries[name]
+
+    def __len__(self):
+        return len(self.entries)
 
 #
-# provided types indexed by name of provided type, value is list of provider types
-providedtypenames = []
-provided = {} # {'name' : [type, type] with provides=name
+# Type dependency graph. Type X depends on type Y when X is defined in
+# terms of Y: Y is the source of X, the type of a field of X, a type a
+# field of X requires or a type X provides. Provided types are named
+# "name,PROVIDED" as in the xref index. A type with a field requiring
+# P also depends on each type that provides P, as the field may hold
+# any of them. The transitive closures in both
+# directions are computed once, with the model, so that asking for
+# everything that depends on a type is a dictionary lookup.
+class TypeGraph():
+    def __init__(self):
+        self.depends = {}         # map[name] = [names name depends on directly]
+        self.dependedOn = {}      # map[name] = [names that depend on name directly]
+        self.allDepends = {}      # map[name] = [names name depends on transitively]
+        self.allDependedOn = {}   # map[name] = [names that depend on name transitively]
+
+    def addNode(self, name):
+        if name not in self.depends:
+            self.depends[name] = set()
+            self.dependedOn[name] = set()
+
+    def addEdge(self, name, target):
+        ''' name depends on target'''
+        if name is None or target is None or name == target:
+            return
+        self.addNode(name)
+        self.addNode(target)
+        self.depends[name].add(target)
+        self.dependedOn[target].add(name)
+
+    def close(self):
+        ''' Compute the transitive closures. No edges may be added after.'''
+        self.allDepends = self.closure(self.depends)
+        self.allDependedOn = self.closure(self.dependedOn)
+        for edges in (self.depends, self.dependedOn):
+            for name in edges:
+                edges[name] = sorted(edges[name])
+
+    def closure(self, edges):
+        result = {}
+        for name in edges:
+            seen = set()
+            stack = list(edges[name])
+            while stack:
+                target = stack.pop()
+                if target not in seen and target != name:
+                    seen.add(target)
+                    stack.extend(edges[target])
+            result[name] = sorted(seen)
+        return result
+
+    def names(self):
+        return sorted(self.depends)
+
+    def dependencies(self, name, direct=False):
+        ''' Names that name depends on'''
+        return (self.depends if direct else self.allDepends).get(name, [])
+
+    def dependents(self, name, direct=False):
+        ''' Names that depend on name'''
+        return (self.dependedOn if direct else self.allDependedOn).get(name, [])
 
 #
-# definition objects are constants
-definitionsAll = []
+# The elements the renderers use and the attributes kept for each.
+# Everything else is dropped while the spec file is parsed.
+KEEP_ATTRIBUTES = {
+    "amqp"       : ("name",),
+    "section"    : ("name", "title"),
+    "type"       : ("name", "class", "source", "provides", "label"),
+    "encoding"   : ("name", "code", "category", "width", "label"),
+    "descriptor" : ("name", "code"),
+    "field"      : ("name", "type", "requires", "default", "mandatory", "multiple", "label"),
+    "choice"     : ("name", "value"),
+    "definition" : ("name", "value", "label"),
+    "doc"        : ("title",),
+    "picture"    : ("title",),
+}
+
+def parse_spec_file(path):
+    ''' Stream parse a spec file and return the root 'amqp' element.
+        As each element ends the "{amqp namespace}" ahead of its tag is
+        stripped and its attributes are trimmed to those in KEEP_ATTRIBUTES.
+        Child elements whose tags are not listed are dropped with their
+        subtrees. Only section level <doc> elements are kept, and only for
+        the <picture> diagrams they hold. The rest of the <doc> prose is
+        never displayed.'''
+    import xml.etree.ElementTree as ET
+    elem = None
+    for event, elem in ET.iterparse(path):
+        tag = elem.tag[elem.tag.find("}")+1:]
+        elem.tag = tag
+        keep = KEEP_ATTRIBUTES.get(tag)
+        if keep is None:
+            continue  # the parent drops it
+        for child in list(elem):
+            if child.tag not in KEEP_ATTRIBUTES or (child.tag == "doc" and not tag == "section"):
+                elem.remove(child)
+        if [a for a in elem.attrib if a not in keep]:
+            elem.attrib = dict([(a, v) for a, v in elem.attrib.items() if a in keep])
+        if not tag == "picture":
+            elem.text = None
+        elem.tail = None
+    return elem  # the root ends last
 
 #
 # stats
+#
+# Timers for the profile. CPU time is the process' user plus system time.
+wall_clock = getattr(time, "perf_counter", time.time)
+try:
+    cpu_clock = time.process_time
+except AttributeError:
+    cpu_clock = time.clock
+
+def max_rss_kb():
+    ''' Peak resident set size of the process so far, None if unknown'''
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        rss //= 1024  # bytes, not KB
+    return rss
+
+#
+# One timed phase of the run. Phases nest: a phase started inside
+# another is named "outer/inner".
+class Phase():
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.timed = self.stats.enabled
+        if self.timed:
+            self.stats.startPhase(self)
+        return self
+
+    def __exit__(self, *exc):
+        if self.timed:
+            self.stats.endPhase(self)
+
+#
+# Item counts checked against the expected values for the stock spec,
+# and the wall time, CPU time and memory of each phase.
 class Stats():
     def __init__(self):
+        self.reset()
+        self.tracing = False     # tracemalloc is measuring each phase's allocations
+        self.enabled = True      # phases are timed and kept
+
+    def reset(self):
+        self.phases = []         # [list of phase results] in start order
+        self.openPhases = []
         self.nConstants = 0
         self.nPrimitiveEncodings = 0
         self.nEnumeratedTypes = 0
@@ -98,6 +268,8 @@ class Stats():
         self.nIndexedEnumerations = 0
         self.nIndexedGrand = 0
         self.nIndexedXrefs = 0
+        self.nIndexedDependencies = 0
+        self.nEncodedSizes = 0
 
     def log(self):
         log("STAT: nConstants           = %s" % self.nConstants)
@@ -111,6 +283,79 @@ class Stats():
         log("STAT: nIndexedEnumerations = %s" % self.nIndexedEnumerations)
         log("STAT: nIndexedGrand        = %s" % self.nIndexedGrand)
         log("STAT: nIndexedXrefs        = %s" % self.nIndexedXrefs)
+        log("STAT: nIndexedDependencies = %s" % self.nIndexedDependencies)
+        log("STAT: nEncodedSizes        = %s" % self.nEncodedSizes)
+
+    def counts(self):
+        return dict([(name, value) for name, value in self.__dict__.items() if name.startswith("n") and name[1:2].isupper()])
+
+    def startTracing(self):
+        ''' Measure the peak python allocations of each phase with tracemalloc,
+            where this python has it. Tracing makes everything slower.'''
+        try:
+            import tracemalloc
+            tracemalloc.reset_peak
+        except (ImportError, AttributeError):
+            return False
+        tracemalloc.start()
+        self.tracing = True
+        return True
+
+    def phase(self, name):
+        ''' with stats.phase(name): ... times the block'''
+        return Phase(self, name)
+
+    def startPhase(self, phase):
+        if self.openPhases:
+            phase.name = self.openPhases[-1].result["name"] + "/" + phase.name
+        phase.result = {"name": phase.name, "wall": None, "cpu": None,
+                        "max_rss_kb": None, "alloc_peak_kb": None, "alloc_kb": None}
+        self.phases.append(phase.result)
+        self.openPhases.append(phase)
+        if self.tracing:
+            import tracemalloc
+            current, peak = tracemalloc.get_traced_memory()
+            for open in self.openPhases:
+                open.peak = max(getattr(open, "peak", 0), peak)
+            phase.allocStart = current
+            phase.peak = current
+            tracemalloc.reset_peak()
+        phase.wallStart = wall_clock()
+        phase.cpuStart = cpu_clock()
+
+    def endPhase(self, phase):
+        result = phase.result
+        result["wall"] = wall_clock() - phase.wallStart
+        result["cpu"] = cpu_clock() - phase.cpuStart
+        result["max_rss_kb"] = max_rss_kb()
+        self.openPhases.pop()
+        if self.tracing:
+            import tracemalloc
+            current, peak = tracemalloc.get_traced_memory()
+            phase.peak = max(phase.peak, peak)
+            for open in self.openPhases:
+                open.peak = max(open.peak, phase.peak)
+            tracemalloc.reset_peak()
+            result["alloc_peak_kb"] = (phase.peak - phase.allocStart) // 1024
+            result["alloc_kb"] = (current - phase.allocStart) // 1024
+
+    def writeProfile(self, filename):
+        ''' Write the phases and counts as json to filename, "-" for stdout.
+            Times are in seconds. max_rss_kb is the process' peak resident
+            size when the phase ended. alloc_peak_kb and alloc_kb are the
+            peak and the net python allocations during the phase, null
+            unless tracing.'''
+        import json
+        report = {"python": "%d.%d.%d" % tuple(sys.version_info[:3]),
+                  "tracing": self.tracing,
+                  "phases": self.phases,
+                  "counts": self.counts()}
+        text = json.dumps(report, indent=1, sort_keys=True, separators=(",", ": ")) + "\n"
+        if filename == "-":
+            sys.stdout.write(text)
+        else:
+            with open(filename, "w") as f:
+                f.write(text)
 
     def statCheck(self, name, expectedValue):
         currentValue = getattr(self, name)
@@ -119,50 +364,161 @@ class Stats():
 
 stats = Stats()
 
+#
+# The spec model classes. XmlStore builds them from the parsed xml and
+# keeps no reference to the xml, so the ElementTree is freed as soon as
+# each file is read. Attributes hold the xml attribute text, None when
+# the attribute is absent. section is "root:section", for example
+# "transport:performatives".
+class Definition(object):
+    __slots__ = ("name", "value", "label", "section")
+
+    def __init__(self, elem, section):
+        self.name = elem.get("name")
+        self.value = elem.get("value")
+        self.label = elem.get("label")
+        self.section = section
+
+class Encoding(object):
+    __slots__ = ("name", "fullName", "code", "category", "width", "label")
+
+    def __init__(self, elem, typename):
+        self.name = elem.get("name")
+        self.fullName = typename if self.name is None else typename + ":" + self.name  # "uint:smalluint"
+        self.code = elem.get("code")
+        self.category = elem.get("category")
+        self.width = elem.get("width")
+        self.label = elem.get("label")
+
+class Field(object):
+    __slots__ = ("name", "type", "requires", "default", "mandatory", "multiple", "label")
+
+    def __init__(self, elem):
+        self.name = elem.get("name")
+        self.type = elem.get("type")
+        self.requires = elem.get("requires")
+        self.default = elem.get("default")
+        self.mandatory = elem.get("mandatory")
+        self.multiple = elem.get("multiple")
+        self.label = elem.get("label")
+
+class Choice(object):
+    __slots__ = ("name", "value")
+
+    def __init__(self, elem):
+        self.name = elem.get("name")
+        self.value = elem.get("value")
+
+class Picture(object):
+    __slots__ = ("caption", "title", "text")
+
+    def __init__(self, elem, caption):
+        self.caption = caption
+        self.title = elem.get("title")
+        self.text = elem.text
+
+class SpecType(object):
+    __slots__ = ("name", "cls", "source", "provides", "label", "section")
+
+    def __init__(self, elem, section):
+        self.name = elem.get("name")
+        self.cls = elem.get("class")
+        self.source = elem.get("source")
+        self.provides = elem.get("provides")
+        self.label = elem.get("label")
+        self.section = section
+
+class PrimitiveType(SpecType):
+    __slots__ = ("encodings",)
+
+    def __init__(self, elem, section):
+        SpecType.__init__(self, elem, section)
+        self.encodings = [Encoding(enc, self.name) for enc in elem.findall("encoding")]
+
+class DescribedType(SpecType):
+    __slots__ = ("descriptorName", "descriptorCode", "fields")
+
+    def __init__(self, elem, section):
+        SpecType.__init__(self, elem, section)
+        descriptor = elem.find("descriptor")
+        self.descriptorName = descriptor.get("name")  # "amqp:open:list"
+        self.descriptorCode = descriptor.get("code")  # "0x00000000:0x00000010"
+        self.fields = [Field(field) for field in elem.findall("field")]
+
+class EnumeratedType(SpecType):
+    __slots__ = ("choices",)
+
+    def __init__(self, elem, section):
+        SpecType.__init__(self, elem, section)
+        self.choices = [Choice(choice) for choice in elem.findall("choice")]
+
+class RestrictedType(SpecType):
+    __slots__ = ()
+
+#
+# Encoded size bounds of a type, in bytes, constructor included.
+# min is the smallest encoding. max is the largest encoding with every
+# variable width value (binary, string, symbol and the contents of
+# lists, maps and arrays) empty, so the largest encoding of a value is
+# max plus the length of its variable width contents. variable is True
+# if there are any. variableFields names the fields of a described type
+# that hold variable width values.
+class EncodedSize(object):
+    __slots__ = ("min", "max", "variable", "variableFields")
+
+    def __init__(self, min, max, variable=False, variableFields=None):
+        self.min = min
+        self.max = max
+        self.variable = variable
+        self.variableFields = variableFields or []
+
+    def union(self, other):
+        ''' Bounds of a value that may be encoded as either'''
+        return EncodedSize(min(self.min, other.min), max(self.max, other.max), self.variable or other.variable)
+
+def make_type(elem, section):
+    ''' Categorize a type element and return its model object'''
+    if elem.get("class") == "primitive":
+        return PrimitiveType(elem, section)
+    if elem.find("descriptor") is not None:
+        return DescribedType(elem, section)
+    if elem.find("choice") is not None:
+        return EnumeratedType(elem, section)
+    return RestrictedType(elem, section)
+
 class XmlStore():
-    def __init__(self, filename):
+    def __init__(self, filename, specdir=SPEC_DIR):
         self.filename = filename
-        self.tree = ET.parse(os.path.join(os.path.dirname(__file__), filename))
-        self.root = self.tree.getroot()  # root=Element 'amqp'
-        self.trimNamespace(self.root)
-        self.rootName = self.root.get("name")
-        self.sections = self.root.findall("section")
+        root = parse_spec_file(os.path.join(specdir, filename))  # root=Element 'amqp'
+        self.rootName = root.get("name")
         self.types = []
+        self.typesPrimitive = []
+        self.typesEnumerated = []
+        self.typesRestricted = []
+        self.typesDescribed = []
+        self.provides = []     # list of (provided type name, provider type) in document order
         self.definitions = []
         self.pictures = []
-        for section in self.sections:
-            ltypes = section.findall("type")
-            for type in ltypes:
-                # decorate and categorize each type
-                typesAll[type.get("name")] = type
-                type.text = self.rootName + ":" + section.get("name")
-                if type.get("class") == "primitive":
-                    typesPrimitive.append(type)
+        for section in root.findall("section"):
+            sectionName = self.rootName + ":" + section.get("name")
+            for elem in section.findall("type"):
+                # categorize each type
+                type = make_type(elem, sectionName)
+                if isinstance(type, PrimitiveType):
+                    self.typesPrimitive.append(type)
+                elif isinstance(type, DescribedType):
+                    self.typesDescribed.append(type)
+                elif isinstance(type, EnumeratedType):
+                    self.typesEnumerated.append(type)
                 else:
-                    descr = type.find("descriptor")
-                    if descr is None:
-                        choices = type.find("choice")
-                        if choices is None:
-                            typesRestricted.append(type)
-                        else:
-                            typesEnumerated.append(type)                            
-                    else:
-                        typesDescribed.append(type)
-                provides = type.get("provides")
-                if provides is not None and not provides == "":
-                    providelist = provides.replace(' ','').split(',')
+                    self.typesRestricted.append(type)
+                if type.provides is not None and not type.provides == "":
+                    providelist = type.provides.replace(' ','').split(',')
                     for p in providelist:
-                        if not p in provided:
-                            providedtypenames.append(p)
-                            provided[p] = []
-                        provided[p].append(type)
-            self.types += section.findall("type")
-            ldefs = section.findall("definition")
-            for definition in ldefs:
-                #log("definition %s" % definition.get("name"))
-                definition.text = self.rootName + ":" + section.get("name")
-                definitionsAll.append(definition)
-            self.definitions += section.findall("definition")
+                        self.provides.append( (p, type) )
+                self.types.append(type)
+            for definition in section.findall("definition"):
+                self.definitions.append(Definition(definition, sectionName))
 
             sTitle = section.get("title")
             if sTitle is None:
@@ -172,47 +528,268 @@ class XmlStore():
                 dTitle = doc.get("title")
                 if dTitle is None:
                     dTitle = ""
-                pics = doc.findall("picture")
-                for pic in pics:
-                    pTitle = pic.get("title")
-                    #print ("%s : %s : %s : %s" % (self.rootName, sTitle, dTitle, pTitle))
-                    pic.caption = (self.rootName.capitalize() + " : " + sTitle + " : " + dTitle).strip()
-                    self.pictures.append(pic)
-
-    def trimNamespace(self, node):
-        ''' Strip out the "{amqp namespace}" ahead of each tag'''
-        pos = node.tag.find("}")
-        if pos > 0:
-            node.tag = node.tag[pos+1:]
-        for child in node:
-            self.trimNamespace(child)
-
-    def showPics(self):
+                for pic in doc.findall("picture"):
+                    caption = (self.rootName.capitalize() + " : " + sTitle + " : " + dTitle).strip()
+                    self.pictures.append(Picture(pic, caption))
+
+    def showPics(self, out):
         nodeName = self.rootName.capitalize() + "Diag"
-        print("<a name=\"%sDiagrams\"</a><br>" % self.rootName.capitalize())
-        print("<a href=\"javascript:toggle_node('%s')\"> %s </a>%s%s<br>" %
+        out.append("<a name=\"%sDiagrams\"</a><br>" % self.rootName.capitalize())
+        out.append("<a href=\"javascript:toggle_node('%s')\"> %s </a>%s%s<br>" %
               ((nodeName), lozenge(), nbsp(), self.rootName.capitalize() + " Diagrams"))
-        print("<div style=\"display:none; width=100%%; margin-bottom:2px; margin-left:10px\" id=\"%s\">" %
+        out.append("<div style=\"display:none; width=100%%; margin-bottom:2px; margin-left:10px\" id=\"%s\" class=\"toggle-section\">" %
               (nodeName))
         for i in range(len(self.pictures)):
             pic = self.pictures[i]
-            print("<a href=\"javascript:toggle_node('%s')\"> %s </a>%s<strong>%s</strong><br>" %
+            out.append("<a href=\"javascript:toggle_node('%s')\"> %s </a>%s<strong>%s</strong><br>" %
                   ((nodeName + str(i)), lozenge(), nbsp(), pic.caption))
-            print("<div style=\"display:none; width=100%%; margin-bottom:2px; margin-left:10px\" id=\"%s\">" %
+            out.append("<div style=\"display:none; width=100%%; margin-bottom:2px; margin-left:10px\" id=\"%s\">" %
                   (nodeName + str(i)))
-            print("<pre>%s</pre><br>" % cgi.escape(pic.text))
-            print("</div>")
-        print("</div>")
-        print("<br>")
+            out.append("<pre>%s</pre><br>" % html_escape(pic.text))
+            out.append("</div>")
+        out.append("</div>")
+        out.append("<br>")
+
+
+#
+# The spec model: the categorized types from every XmlStore plus
+# everything computed from them. The renderers read only the model.
+class SpecModel():
+    def __init__(self):
+        #
+        # data stores
+        self.typesPrimitive = []  # class == primitive
+        self.typesEnumerated = [] # no descriptor, choice count > 0
+        self.typesRestricted = [] # no descriptor, choice count == 0
+        self.typesDescribed = []  # contains descriptor
+
+        self.typesAll = {}    # table[typename] = typenode for clean types
+
+        #
+        # provided types indexed by name of provided type, value is list of provider types
+        self.providedtypenames = []
+        self.provided = {} # {'name' : [type, type] with provides=name
+
+        #
+        # definition objects are constants
+        self.definitionsAll = []
+
+        self.xmlStoreList = []
+
+        #
+        # primitive type encodings
+        self.encoding_typenames = []
+        self.encoding_codes = []
+        self.encoding_typemap = {}
+        self.encoding_codemap = {}
+        self.encoding_valuemap = {} # map[int format code] = encoding
+        self.encoding_sectionmap = {}
+
+        #
+        # described types
+        self.descr_longnames = []   # "transport:performatives open"
+        self.descr_codes = []       # "0x10"
+        self.descr_codemap = {}     # map[longname] = "0x10"
+        self.descr_mapcode = {}     # map[code] = longname
+        self.descr_valuemap = {}    # map[int descriptor code] = type node
+        self.descr_typemap = {}     # map[longname] = type node
+        self.descr_fieldmap = {}    # map[longname] = [list-of-field-nodes]
+        self.descr_fieldindex = []  # list of (fieldname, field's_parent_type_node)
+
+        #
+        # enumerated types
+        self.enum_longnames = []    # "messaging:message-format terminus-durability"
+        self.enum_typemap = {}      # map[longname] = type node
+        self.enum_choicemap = {}    # map[longname] = [list-of-choice-fields]
+        self.enum_choiceindex = {}  # list of (choicename, choice's_parent_type_node)
+
+        #
+        # indices
+        self.typeIndex = NameIndex()   # key='name', value = [list of sections]
+        self.fieldIndex = NameIndex()  # key='name', value = [list of [section, type]]
+        self.enumIndex = NameIndex()   # names of enum values (not types)
+        self.grandIndex = NameIndex()
+        self.xref = {}                 # map[name] = [referrer dictionaries], see compute_xref
+        self.xrefIndex = NameIndex()   # the page's xref table: key='name', value = [list of referrers]
+        self.searchIndex = {}          # grand index entries and word keys for the search box
+        self.typeGraph = TypeGraph()   # type dependencies and their transitive closures
+        self.encodedSizes = {}         # map[type name] = EncodedSize
+
+    def addStore(self, store):
+        ''' Merge one parsed spec file into the model. Stores must be added in page order.'''
+        self.xmlStoreList.append(store)
+        for type in store.types:
+            self.typesAll[type.name] = type
+        self.typesPrimitive += store.typesPrimitive
+        self.typesEnumerated += store.typesEnumerated
+        self.typesRestricted += store.typesRestricted
+        self.typesDescribed += store.typesDescribed
+        for p, type in store.provides:
+            if not p in self.provided:
+                self.providedtypenames.append(p)
+                self.provided[p] = []
+            self.provided[p].append(type)
+        self.definitionsAll += store.definitions
+
+
+#
+# Parse one spec file. Runs in a worker process when parsing in parallel.
+def parse_store(args):
+    filename, specdir = args
+    return XmlStore(filename, specdir)
+
+def parse_stores(specdir=SPEC_DIR, jobs=1):
+    ''' Return the XmlStore for each spec file, in SPEC_FILES order.
+        With jobs > 1 the files are parsed and categorized in a process pool.
+        jobs == 0 uses one process per cpu.'''
+    work = [(filename, specdir) for filename in SPEC_FILES]
+    if jobs == 1:
+        stores = []
+        for w in work:
+            with stats.phase(w[0]):
+                stores.append(parse_store(w))
+        return stores
+    import multiprocessing
+    if jobs == 0:
+        jobs = multiprocessing.cpu_count()
+    jobs = min(jobs, len(work))
+    if jobs <= 1:
+        return [parse_store(w) for w in work]
+    pool = multiprocessing.Pool(jobs)
+    try:
+        # map() returns the results in work order whatever order the workers finish in
+        return pool.map(parse_store, work)
+    finally:
+        pool.close()
+        pool.join()
+
+#
+# Build the model from the spec xml files
+def build_model(specdir=SPEC_DIR, jobs=1):
+    with stats.phase("parse_stores"):
+        stores = parse_stores(specdir, jobs)
+    return merge_stores(stores)
+
+#
+# Build the model from XmlStores already parsed, in SPEC_FILES order
+def merge_stores(stores):
+    model = SpecModel()
+    for store in stores:
+        model.addStore(store)
+    with stats.phase("compute_primitive_types"):
+        compute_primitive_types(model)
+    with stats.phase("compute_described_types"):
+        compute_described_types(model)
+    with stats.phase("compute_enumerated_types"):
+        compute_enumerated_types(model)
+    with stats.phase("compute_encoded_sizes"):
+        compute_encoded_sizes(model)
+    with stats.phase("compute_indices"):
+        compute_indices(model)
+    return model
+
+def spec_digest(specdir=SPEC_DIR):
+    ''' Hash of the spec xml inputs and of the code that builds the model from them'''
+    import hashlib
+    h = hashlib.sha1()
+    h.update(("%s %s" % (MODEL_VERSION, sys.version_info[0])).encode("ascii"))
+    for filename in [os.path.abspath(__file__).replace(".pyc", ".py")] + \
+                    [os.path.join(specdir, f) for f in SPEC_FILES]:
+        with open(filename, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+#
+# Return the spec model from the cache or, when the cache misses, build
+# the model and save it in the cache.
+def load_model(specdir=SPEC_DIR, cachedir=CACHE_DIR, jobs=1):
+    if cachedir is None:
+        with stats.phase("build_model"):
+            return build_model(specdir, jobs)
+    try:
+        import cPickle as pickle
+    except ImportError:
+        import pickle
+    cachefile = os.path.join(cachedir, "spec-model-%s.pickle" % spec_digest(specdir))
+    if os.path.exists(cachefile):
+        try:
+            with stats.phase("load_cache"):
+                with open(cachefile, "rb") as f:
+                    return pickle.load(f)
+        except Exception as e:
+            log("Ignoring unreadable model cache %s: %s" % (cachefile, e))
+    with stats.phase("build_model"):
+        model = build_model(specdir, jobs)
+    try:
+        if not os.path.isdir(cachedir):
+            os.makedirs(cachedir)
+        tmpfile = "%s.%d" % (cachefile, os.getpid())
+        with stats.phase("save_cache"):
+            with open(tmpfile, "wb") as f:
+                pickle.dump(model, f, pickle.HIGHEST_PROTOCOL)
+        os.rename(tmpfile, cachefile)
+    except (IOError, OSError) as e:
+        log("Can't write model cache %s: %s" % (cachefile, e))
+    return model
 
 
-xmlTypes        = XmlStore("types.xml")
-xmlTransport    = XmlStore("transport.xml")
-xmlMessaging    = XmlStore("messaging.xml")
-xmlTransactions = XmlStore("transactions.xml")
-xmlSecurity     = XmlStore("security.xml")
+#
+# Library API. Importing this module parses nothing. An AmqpSpec loads
+# the spec model, from the cache when it can, the first time a lookup
+# needs it.
+#
+#    import webpage
+#    open = webpage.spec.described("0x00000000:0x00000010")
+#
+def code_value(code):
+    ''' Integer value of a format or descriptor code given as an int,
+        "0xa1", "0x10" or "0x00000000:0x00000010"'''
+    if isinstance(code, int):
+        return code
+    if ":" in code:
+        hi, lo = code.split(":")
+        return (int(hi, 16) << 32) + int(lo, 16)
+    return int(code, 0)
+
+class AmqpSpec():
+    def __init__(self, specdir=SPEC_DIR, cachedir=CACHE_DIR, jobs=1):
+        self.specdir = specdir
+        self.cachedir = cachedir
+        self.jobs = jobs
+        self._model = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = load_model(self.specdir, self.cachedir, self.jobs)
+        return self._model
+
+    def type(self, name):
+        ''' The type named name, or None'''
+        return self.model.typesAll.get(name)
+
+    def encoding(self, code):
+        ''' The primitive Encoding with format code code, or None'''
+        return self.model.encoding_valuemap.get(code_value(code))
+
+    def described(self, code):
+        ''' The DescribedType with descriptor code code, or None'''
+        return self.model.descr_valuemap.get(code_value(code))
+
+    def dependencies(self, name, direct=False):
+        ''' Names of the types that type name is defined in terms of'''
+        return self.model.typeGraph.dependencies(name, direct)
+
+    def dependents(self, name, direct=False):
+        ''' Names of the types defined in terms of type name'''
+        return self.model.typeGraph.dependents(name, direct)
+
+    def encodedSize(self, name):
+        ''' The EncodedSize of type name, or None'''
+        return self.model.encodedSizes.get(name)
+
+spec = AmqpSpec()
 
-xmlStoreList = [xmlTypes, xmlTransport, xmlMessaging, xmlTransactions, xmlSecurity]
 
 #
 # Utilities
@@ -232,7 +809,15 @@ def double_lozenge():
     return lozenge() + lozenge()
 
 def extract_descr_type_code(code):
-    return "0x" + code[19:]
+    ''' "0x00000000:0x00000010" -> "0x10". Codes past 0xff keep all their digits.'''
+    return "0x%02x" % int(code[11:], 16)
+
+def html_escape(text):
+    try:
+        from html import escape  # python 3
+    except ImportError:
+        from cgi import escape
+    return escape(text, quote=False)
 
 def noNoneString(str):
     if str:
@@ -254,46 +839,103 @@ def noNoneProvideRef(str):
         return res
     return ""
 
-def addToIndex(name, section):
-    if not name in typeNameIndex:
-        typeNameIndex.append(name)
-        typeIndex[name] = []
-    typeIndex[name].append(section)
-
-def addToFieldIndex(name, parentsection, parenttype):
-    if not name in fieldNameIndex:
-        fieldNameIndex.append(name)
-        fieldIndex[name] = []
-    fieldIndex[name].append( [parentsection, parenttype] )
-
-def addToEnumIndex(name, parentsection, parenttype):
-    if not name in enumNameIndex:
-        enumNameIndex.append(name)
-        enumIndex[name] = []
-    enumIndex[name].append( [parentsection, parenttype] )
-
-def addToGrandIndex(name, decoratedname, category, psect, ptype):
-    if not name in grandNameIndex:
-        grandNameIndex.append(name)
-        grandIndex[name] = []
-    grandIndex[name].append( [decoratedname, category, psect, ptype] )
-
-def addToXrefIndex(name, decReferrerName, category, referrerSection):
-    if not name in xrefNameIndex:
-        xrefNameIndex.append(name)
-        xrefIndex[name] = []
-    xrefIndex[name].append( [decReferrerName, category, referrerSection] )
+def type_index_ref(name, section):
+    if section == "PROVIDED":
+        return noNoneProvideRef(name)
+    return noNoneTypeRef(name)
+
+def field_index_ref(name, parenttype):
+    return "<a href=\"#FIELD_%s_%s\">%s</a>" % (parenttype, name, name)
+
+#
+# Page output. Each print_* renderer appends the lines of its section
+# to a list. The finished page is joined and written with one write.
+class PageWriter():
+    def __init__(self):
+        self.sections = []  # list of (section name, [list of lines])
+
+    def section(self, name):
+        ''' Return the line list that holds the named section'''
+        lines = []
+        self.sections.append( (name, lines) )
+        return lines
+
+    def getvalue(self):
+        return "".join(["\n".join(lines) + "\n" for name, lines in self.sections if lines])
+
+    def write(self, filename=None, changedOnly=False):
+        ''' Write the page to filename or, if no filename, to stdout.
+            Return the list of files written.'''
+        text = self.getvalue()
+        if filename is None or filename == "-":
+            sys.stdout.write(text)
+            sys.stdout.flush()
+            return ["-"]
+        if write_file(filename, text, changedOnly):
+            return [filename]
+        return []
+
+    def writeSplit(self, dirname, placeholders, loader, changedOnly=False):
+        ''' Write each section named in placeholders to dirname/<name>.html.
+            Write the rest of the page to dirname/index.html with the lines
+            in placeholders[name] standing in for each of those sections
+            and the loader lines ahead of the last section.
+            Return the list of files written.'''
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        written = []
+        for name, lines in self.sections:
+            if name in placeholders:
+                filename = os.path.join(dirname, name + ".html")
+                if write_file(filename, "\n".join(lines) + "\n", changedOnly):
+                    written.append(filename)
+        filename = os.path.join(dirname, "index.html")
+        if write_file(filename, self.getShell(placeholders, loader), changedOnly):
+            written.append(filename)
+        return written
+
+    def getShell(self, placeholders, loader):
+        ''' The text of the split page's index.html'''
+        shell = []
+        for name, lines in self.sections:
+            if name in placeholders:
+                lines = placeholders[name]
+            elif name == self.sections[-1][0]:
+                shell += loader
+            shell += lines
+        return "\n".join(shell) + "\n"
+
+#
+# Write text to filename. With changedOnly a file that already holds
+# exactly text is left alone, so its modification time is kept.
+# Return True if the file was written.
+def write_file(filename, text, changedOnly=False):
+    if changedOnly and os.path.exists(filename):
+        with open(filename) as f:
+            if f.read() == text:
+                return False
+    with open(filename, "w") as f:
+        f.write(text)
+    return True
 
 #
 # Open html page header
-def print_fixed_leading():
+def print_fixed_leading(out, classToggles=False):
     # start up the web stuff
-    print ("<html>")
-    print ("<head>")
-    print ("<title>AMQP 1.0 - Interactive Protocol Spec</title>")
-    print ('''<script src="http://ajax.googleapis.com/ajax/libs/dojo/1.4/dojo/dojo.xd.js" type="text/javascript"></script>
-<!-- <script src="http://ajax.googleapis.com/ajax/libs/dojo/1.4/dojo/dojo.xd.js" type="text/javascript"></script> -->
-<!--
+    out.append("<html>")
+    out.append("<head>")
+    out.append("<title>AMQP 1.0 - Interactive Protocol Spec</title>")
+    if classToggles:
+        # Expand all and collapse all flip one class on the body
+        out.append("<style>")
+        out.append("body.tables-shown .toggle-section, body.tables-shown .toggle-detail { display: block !important; }")
+        out.append("body.tables-hidden .toggle-section { display: none !important; }")
+        out.append("body.tables-hidden .toggle-detail { display: block !important; }")
+        out.append("</style>")
+    if not classToggles:
+        out.append('''<script src="http://ajax.googleapis.com/ajax/libs/dojo/1.4/dojo/dojo.xd.js" type="text/javascript"></script>
+<!-- <script src="http://ajax.googleapis.com/ajax/libs/dojo/1.4/dojo/dojo.xd.js" type="text/javascript"></script> -->''')
+    script = '''<!--
  -
  - Licensed to the Apache Software Foundation (ASF) under one
  - or more contributor license agreements.  See the NOTICE file
@@ -314,7 +956,53 @@ def print_fixed_leading():
  -
 -->
 <script type="text/javascript">
-function node_is_visible(node)
+'''
+    if classToggles:
+        # Plain DOM, nothing to fetch before the page works. A node
+        # toggled by itself gets an !important inline display so that it
+        # beats the body class. set_tables drops those, so expanding or
+        # collapsing everything touches only the nodes toggled since the
+        # last time.
+        script += '''function node_is_visible(node)
+{
+  if(typeof node == 'string')
+    node = document.getElementById(node);
+  if(!node)
+    return false;
+  return window.getComputedStyle(node).display != "none";
+}
+var toggled_nodes = [];
+function set_node(node, str)
+{
+  if(typeof node == 'string')
+    node = document.getElementById(node);
+  if(!node) return;
+  if(node.style.getPropertyPriority('display') != 'important')
+    toggled_nodes.push(node);
+  node.style.setProperty('display', str, 'important');
+}
+function set_tables(state)
+{
+  for(var i = 0; i < toggled_nodes.length; i++)
+    toggled_nodes[i].style.removeProperty('display');
+  toggled_nodes = [];
+  document.body.classList.remove('tables-shown', 'tables-hidden');
+  document.body.classList.add(state);
+}
+function node_is_hidden(node)
+{
+  return window.getComputedStyle(node).display == 'none';
+}
+function toggle_node(node)
+{
+  if(typeof node == 'string')
+    node = document.getElementById(node);
+  if(!node) return;
+  set_node(node, (node_is_visible(node)) ? 'none' : 'block');
+}
+'''
+    else:
+        script += '''function node_is_visible(node)
 {
   if(dojo.isString(node))
     node = dojo.byId(node);
@@ -329,6 +1017,10 @@ function set_node(node, str)
   if(!node) return;
   node.style.display = str;
 }
+function node_is_hidden(node)
+{
+  return node.style.display == 'none';
+}
 function toggle_node(node)
 {
   if(dojo.isString(node))
@@ -336,7 +1028,8 @@ function toggle_node(node)
   if(!node) return;
   set_node(node, (node_is_visible(node)) ? 'none' : 'block');
 }
-function hide_node(node)
+'''
+    script += '''function hide_node(node)
 {
   set_node(node, 'none');
 }
@@ -350,742 +1043,934 @@ function go_back()
   window.history.back();
 }
 
-''')
-
-
-#
-#
-def print_start_body():
-    print("function show_all_tables()")
-    print("{")
-    print("  show_node('Constants');")
-    print("  show_node('PrimTypeName');")
-    print("  show_node('PrimTypeCode');")
-    print("  show_node('DescrTypes');")
-    print("  show_node('EnumTypes');")
-    print("  show_node('RestrTypes');")
-    print("  show_node('ProvTypes');")
-    print("  show_node('TypesDiag');")
-    print("  show_node('TransportDiag');")
-    print("  show_node('MessagingDiag');")
-    print("  show_node('TransactionsDiag');")
-    print("  show_node('SecurityDiag');")
-    print("  show_node('TypIndex');")
-    print("  show_node('FldIndex');")
-    print("  show_node('EnuIndex');")
-    print("  show_node('GndIndex');")
-    print("  show_node('XrefIndex');")
-    for type in typesDescribed:
-        print("  show_node('DT%s')" % type.get("name"))
-    for type in typesEnumerated:
-        print("  show_node('ET%s')" % type.get("name"))
-    print("}")
-    print("")
-    print("function hide_all_tables()")
-    print("{")
-    print("  hide_node('Constants');")
-    print("  hide_node('PrimTypeName');")
-    print("  hide_node('PrimTypeCode');")
-    print("  hide_node('DescrTypes');")
-    print("  hide_node('EnumTypes');")
-    print("  hide_node('RestrTypes');")
-    print("  hide_node('ProvTypes');")
-    print("  hide_node('TypesDiag');")
-    print("  hide_node('TransportDiag');")
-    print("  hide_node('MessagingDiag');")
-    print("  hide_node('TransactionsDiag');")
-    print("  hide_node('SecurityDiag');")
-    print("  hide_node('TypIndex');")
-    print("  hide_node('FldIndex');")
-    print("  hide_node('EnuIndex');")
-    print("  hide_node('GndIndex');")
-    print("  hide_node('XrefIndex');")
-    for type in typesDescribed:
-        print("  show_node('DT%s')" % type.get("name"))
-    for type in typesEnumerated:
-        print("  show_node('ET%s')" % type.get("name"))
-    print("}")
-
-    print ("</script>")
-    print ("</head>")
-    print ("<body>")
-    print ("<style>")
-    print ("    * { font-family: sans-serif; }")
-    print ("</style>")
-    print ("<style>")
-    print ("table, th, td {")
-    print ("  border: 1px solid black;")
-    print ("  border-collapse: collapse;")
-    print ("}")
-    print ("th, td {")
-    print ("  padding: 4px;")
-    print ("}")
-    print ("</style>")
-
-
-    print("<style>")
-    print("pre {")
-    print("  font-family:monospace,monospace;")
-    print("  font-size:1em;")
-    print("}")
-    print("</style>")
-
-
-#
-#
-def print_toc():
-    # Table of Contents
-    print("<a href=\"#Constants\">Constants</a><br>")
+'''
+    out.append(script)
 
-    print("<a href=\"#Types\">Types</a><br>")
-    print("%s%s<a href=\"#PrimitiveTypes\">Primitive Types</a><br>" % (nbsp(), nbsp()))
-    print("%s%s<a href=\"#EnumeratedTypes\">Enumerated Types</a><br>" % (nbsp(), nbsp()))
-    print("%s%s<a href=\"#RestrictedTypes\">Restricted Types</a><br>" % (nbsp(), nbsp()))
-    print("%s%s<a href=\"#DescribedTypes\">Described Types</a><br>" % (nbsp(), nbsp()))
-    print("%s%s<a href=\"#ProvidedTypes\">Provided Types</a><br>" % (nbsp(), nbsp()))
 
-    print("<a href=\"#Diagrams\">Diagrams</a><br>")
+#
+#
+def print_start_body(model, out, classToggles=False):
+    if classToggles:
+        # Expandable divs are classed toggle-section or toggle-detail.
+        # The script stays the same size however many types there are.
+        out.append("function show_all_tables()")
+        out.append("{")
+        out.append("  set_tables('tables-shown');")
+        out.append("}")
+        out.append("")
+        out.append("function hide_all_tables()")
+        out.append("{")
+        out.append("  set_tables('tables-hidden');")
+        out.append("}")
+    else:
+        print_show_hide_nodes(model, out)
+    print_start_styles(out)
 
-    print("<a href=\"#Indices\">Indices</a><br>")
-    print("%s%s<a href=\"#TypeIndex\">Types</a><br>" % (nbsp(), nbsp()))
-    print("%s%s<a href=\"#FieldIndex\">Fields</a><br>" % (nbsp(), nbsp()))
-    print("%s%s<a href=\"#EnumerationIndex\">Enumerations</a><br>" % (nbsp(), nbsp()))
-    print("%s%s<a href=\"#GrandIndex\">Grand Index</a><br>" % (nbsp(), nbsp()))
-    print("%s%s<a href=\"#XrefIndex3\">Type Cross Reference</a><br>" % (nbsp(), nbsp()))
+#
+# The original show/hide script, one call per expandable node
+def print_show_hide_nodes(model, out):
+    out.append("function show_all_tables()")
+    out.append("{")
+    out.append("  show_node('Constants');")
+    out.append("  show_node('PrimTypeName');")
+    out.append("  show_node('PrimTypeCode');")
+    out.append("  show_node('DescrTypes');")
+    out.append("  show_node('EnumTypes');")
+    out.append("  show_node('RestrTypes');")
+    out.append("  show_node('ProvTypes');")
+    out.append("  show_node('EncSizes');")
+    out.append("  show_node('TypesDiag');")
+    out.append("  show_node('TransportDiag');")
+    out.append("  show_node('MessagingDiag');")
+    out.append("  show_node('TransactionsDiag');")
+    out.append("  show_node('SecurityDiag');")
+    out.append("  show_node('TypIndex');")
+    out.append("  show_node('FldIndex');")
+    out.append("  show_node('EnuIndex');")
+    out.append("  show_node('GndIndex');")
+    out.append("  show_node('XrefIndex');")
+    out.append("  show_node('DepIndex');")
+    for type in model.typesDescribed:
+        out.append("  show_node('DT%s')" % type.name)
+    for type in model.typesEnumerated:
+        out.append("  show_node('ET%s')" % type.name)
+    out.append("}")
+    out.append("")
+    out.append("function hide_all_tables()")
+    out.append("{")
+    out.append("  hide_node('Constants');")
+    out.append("  hide_node('PrimTypeName');")
+    out.append("  hide_node('PrimTypeCode');")
+    out.append("  hide_node('DescrTypes');")
+    out.append("  hide_node('EnumTypes');")
+    out.append("  hide_node('RestrTypes');")
+    out.append("  hide_node('ProvTypes');")
+    out.append("  hide_node('EncSizes');")
+    out.append("  hide_node('TypesDiag');")
+    out.append("  hide_node('TransportDiag');")
+    out.append("  hide_node('MessagingDiag');")
+    out.append("  hide_node('TransactionsDiag');")
+    out.append("  hide_node('SecurityDiag');")
+    out.append("  hide_node('TypIndex');")
+    out.append("  hide_node('FldIndex');")
+    out.append("  hide_node('EnuIndex');")
+    out.append("  hide_node('GndIndex');")
+    out.append("  hide_node('XrefIndex');")
+    out.append("  hide_node('DepIndex');")
+    for type in model.typesDescribed:
+        out.append("  show_node('DT%s')" % type.name)
+    for type in model.typesEnumerated:
+        out.append("  show_node('ET%s')" % type.name)
+    out.append("}")
 
-    print("<hr>")
-    print("<strong>NOTE: Tables must be expanded or internal hyperlinks don't work.</strong><br>")
-    print("<a href=\"javascript:show_all_tables()\"> %s </a>%sTable view: expand all.<br>" % (lozenge(), nbsp()))
-    print("<a href=\"javascript:hide_all_tables()\"> %s </a>%sTable view: collapse all." % (lozenge(), nbsp()))
-    print("<hr>")
+#
+#
+def print_start_styles(out):
+    out.append("</script>")
+    out.append("</head>")
+    out.append("<body>")
+    out.append("<style>")
+    out.append("    * { font-family: sans-serif; }")
+    out.append("</style>")
+    out.append("<style>")
+    out.append("table, th, td {")
+    out.append("  border: 1px solid black;")
+    out.append("  border-collapse: collapse;")
+    out.append("}")
+    out.append("th, td {")
+    out.append("  padding: 4px;")
+    out.append("}")
+    out.append("</style>")
+
+
+    out.append("<style>")
+    out.append("pre {")
+    out.append("  font-family:monospace,monospace;")
+    out.append("  font-size:1em;")
+    out.append("}")
+    out.append("</style>")
 
 
-def print_constants():
+#
+#
+def print_toc(out):
+    # Table of Contents
+    out.append("<a href=\"#Constants\">Constants</a><br>")
+
+    out.append("<a href=\"#Types\">Types</a><br>")
+    out.append("%s%s<a href=\"#PrimitiveTypes\">Primitive Types</a><br>" % (nbsp(), nbsp()))
+    out.append("%s%s<a href=\"#EnumeratedTypes\">Enumerated Types</a><br>" % (nbsp(), nbsp()))
+    out.append("%s%s<a href=\"#RestrictedTypes\">Restricted Types</a><br>" % (nbsp(), nbsp()))
+    out.append("%s%s<a href=\"#DescribedTypes\">Described Types</a><br>" % (nbsp(), nbsp()))
+    out.append("%s%s<a href=\"#ProvidedTypes\">Provided Types</a><br>" % (nbsp(), nbsp()))
+    out.append("%s%s<a href=\"#EncodedSizes\">Encoded Sizes</a><br>" % (nbsp(), nbsp()))
+
+    out.append("<a href=\"#Diagrams\">Diagrams</a><br>")
+
+    out.append("<a href=\"#Indices\">Indices</a><br>")
+    out.append("%s%s<a href=\"#TypeIndex\">Types</a><br>" % (nbsp(), nbsp()))
+    out.append("%s%s<a href=\"#FieldIndex\">Fields</a><br>" % (nbsp(), nbsp()))
+    out.append("%s%s<a href=\"#EnumerationIndex\">Enumerations</a><br>" % (nbsp(), nbsp()))
+    out.append("%s%s<a href=\"#GrandIndex\">Grand Index</a><br>" % (nbsp(), nbsp()))
+    out.append("%s%s<a href=\"#XrefIndex3\">Type Cross Reference</a><br>" % (nbsp(), nbsp()))
+    out.append("%s%s<a href=\"#DependencyIndex\">Type Dependencies</a><br>" % (nbsp(), nbsp()))
+
+    out.append("<hr>")
+    out.append("<strong>NOTE: Tables must be expanded or internal hyperlinks don't work.</strong><br>")
+    out.append("<a href=\"javascript:show_all_tables()\"> %s </a>%sTable view: expand all.<br>" % (lozenge(), nbsp()))
+    out.append("<a href=\"javascript:hide_all_tables()\"> %s </a>%sTable view: collapse all." % (lozenge(), nbsp()))
+    out.append("<hr>")
+
+
+def print_constants(model, out):
     # print types sorted by class name
-    print("<a name=\"Constants\"></a>")
-    print("<h2>Constants</h2>")
-    print("<a href=\"javascript:toggle_node('%s')\"> %s </a>%sConstants<br>" % ("Constants", lozenge(), nbsp()))
-    print("<div width=\"100%%\" style=\"display:block\"  margin-bottom:\"2px\" id=\"Constants\">")
-    print("<table>")
-    print("<tr>")
-    print(" <th>Section</th>")
-    print(" <th>Name</th>")
-    print(" <th>Value</th>")
-    print(" <th>Label</th>")
-    print("</tr>")
-    for definition in definitionsAll:
-        print("<tr>")
-        print(" <td>%s</td>" % definition.text)
-        print(" <td><a name=\"TYPE_%s\"></a><strong>%s</strong></td>" % (definition.get("name"),definition.get("name")))
-        print(" <td>%s</td>" % definition.get("value"))
-        print(" <td>%s</td>" % definition.get("label"))
-        print("</tr>")
-        addToIndex(definition.get("name"), definition.text) # Constants
+    out.append("<a name=\"Constants\"></a>")
+    out.append("<h2>Constants</h2>")
+    out.append("<a href=\"javascript:toggle_node('%s')\"> %s </a>%sConstants<br>" % ("Constants", lozenge(), nbsp()))
+    out.append("<div width=\"100%%\" style=\"display:block\"  margin-bottom:\"2px\" id=\"Constants\" class=\"toggle-section\">")
+    out.append("<table>")
+    out.append("<tr>")
+    out.append(" <th>Section</th>")
+    out.append(" <th>Name</th>")
+    out.append(" <th>Value</th>")
+    out.append(" <th>Label</th>")
+    out.append("</tr>")
+    for definition in model.definitionsAll:
+        out.append("<tr>")
+        out.append(" <td>%s</td>" % definition.section)
+        out.append(" <td><a name=\"TYPE_%s\"></a><strong>%s</strong></td>" % (definition.name, definition.name))
+        out.append(" <td>%s</td>" % definition.value)
+        out.append(" <td>%s</td>" % definition.label)
+        out.append("</tr>")
         stats.nConstants += 1
-    print("</table>")
-    print("</div>")
-    print("<br>")
+    out.append("</table>")
+    out.append("</div>")
+    out.append("<br>")
 
 
 #
 #
-encoding_typenames = []
-encoding_codes = []
-encoding_typemap = {}
-encoding_codemap = {}
-encoding_sectionmap = {}
 
-def compute_primitive_types():
+def compute_primitive_types(model):
     # create sorted lists for display
-    for type in typesPrimitive:
-        for enc in type.findall("encoding"):
-            typename = type.get("name")
-            if enc.get("name") is not None:
-                typename += ":" + enc.get("name")
-            typecode = enc.get("code")
-            enc.text = typename
-            if not typename in encoding_typenames:
-                encoding_typenames.append(typename)
-                encoding_codes.append(typecode)
-                encoding_typemap[typename] = enc
-                encoding_codemap[typecode] = enc
-                encoding_sectionmap[typename] = type.text
+    for type in model.typesPrimitive:
+        for enc in type.encodings:
+            typename = enc.fullName
+            typecode = enc.code
+            if not typename in model.encoding_typemap:
+                model.encoding_typenames.append(typename)
+                model.encoding_codes.append(typecode)
+                model.encoding_typemap[typename] = enc
+                model.encoding_codemap[typecode] = enc
+                model.encoding_valuemap[code_value(typecode)] = enc
+                model.encoding_sectionmap[typename] = type.section
             else:
                 raise ValueError("duplicate encoding type name: '%s'" % typename)
-    encoding_typenames.sort()
-    encoding_codes.sort()
+    model.encoding_typenames.sort()
+    model.encoding_codes.sort()
 
-def print_primitive_types():
+def print_primitive_types(model, out):
     # print types sorted by class name
-    print("<a name=\"Types\"></a>")
-    print("<h2>Types</h2>")
-    print("<a name=\"PrimitiveTypes\"></a>")
-    print("<h3>Primitive Types</h3>")
-    print("<a href=\"javascript:toggle_node('%s')\"> %s </a>%sby Name<br>" % ("PrimTypeName", lozenge(), nbsp()))
-    print("<div width=\"100%%\" style=\"display:block\"  margin-bottom:\"2px\" id=\"PrimTypeName\">")
-    print("<table>")
-    print("<tr>")
-    print(" <th>Section</th>")
-    print(" <th>Name</th>")
-    print(" <th>Code</th>")
-    print(" <th>Category</th>")
-    print(" <th>Width</th>")
-    print(" <th>Label</th>")
-    print("</tr>")
-    for type in typesPrimitive:
-        print("<tr>")
-        print(" <td>%s</td>" % type.text)
-        print(" <td><a name=\"TYPE_%s\"></a><strong>%s</strong></td>" % (type.get("name"), type.get("name")))
-        print(" <td></td>")
-        print(" <td></td>")
-        print(" <td></td>")
-        print(" <td>%s</td>" % type.get("label"))
-        print("</tr>")
-        addToIndex(type.get("name"), type.text) # Primitive category
-        for enc in type.findall("encoding"):
-            print("<tr>")
-            print(" <td></td>")
-            print(" <td><a name=\"TYPE_%s\"></a><strong>%s</strong></td>" % (enc.text, enc.text))
-            print(" <td>%s</td>" % enc.get("code"))
-            print(" <td>%s</td>" % enc.get("category"))
-            print(" <td>%s</td>" % enc.get("width"))
-            print(" <td>%s</td>" % enc.get("label"))
-            print("</tr>")
-            addToIndex(enc.text, "types:encodings") # Primitive type
+    out.append("<a name=\"Types\"></a>")
+    out.append("<h2>Types</h2>")
+    out.append("<a name=\"PrimitiveTypes\"></a>")
+    out.append("<h3>Primitive Types</h3>")
+    out.append("<a href=\"javascript:toggle_node('%s')\"> %s </a>%sby Name<br>" % ("PrimTypeName", lozenge(), nbsp()))
+    out.append("<div width=\"100%%\" style=\"display:block\"  margin-bottom:\"2px\" id=\"PrimTypeName\" class=\"toggle-section\">")
+    out.append("<table>")
+    out.append("<tr>")
+    out.append(" <th>Section</th>")
+    out.append(" <th>Name</th>")
+    out.append(" <th>Code</th>")
+    out.append(" <th>Category</th>")
+    out.append(" <th>Width</th>")
+    out.append(" <th>Label</th>")
+    out.append("</tr>")
+    for type in model.typesPrimitive:
+        out.append("<tr>")
+        out.append(" <td>%s</td>" % type.section)
+        out.append(" <td><a name=\"TYPE_%s\"></a><strong>%s</strong></td>" % (type.name, type.name))
+        out.append(" <td></td>")
+        out.append(" <td></td>")
+        out.append(" <td></td>")
+        out.append(" <td>%s</td>" % type.label)
+        out.append("</tr>")
+        for enc in type.encodings:
+            out.append("<tr>")
+            out.append(" <td></td>")
+            out.append(" <td><a name=\"TYPE_%s\"></a><strong>%s</strong></td>" % (enc.fullName, enc.fullName))
+            out.append(" <td>%s</td>" % enc.code)
+            out.append(" <td>%s</td>" % enc.category)
+            out.append(" <td>%s</td>" % enc.width)
+            out.append(" <td>%s</td>" % enc.label)
+            out.append("</tr>")
             stats.nPrimitiveEncodings += 1
     # Phony primitive type "*"
-    print("<tr>")
-    print(" <td>spec:wildcard</td>")
-    print(" <td><a name=\"TYPE_*\"><strong>*</strong></a></td>")
-    print(" <td></td>")
-    print(" <td></td>")
-    print(" <td></td>")
-    print(" <td>A value of any type is permitted.</td>")
-    print("</tr>")
-    print("</table>")
-    print("</div>")
-    print("<br>")
+    out.append("<tr>")
+    out.append(" <td>spec:wildcard</td>")
+    out.append(" <td><a name=\"TYPE_*\"><strong>*</strong></a></td>")
+    out.append(" <td></td>")
+    out.append(" <td></td>")
+    out.append(" <td></td>")
+    out.append(" <td>A value of any type is permitted.</td>")
+    out.append("</tr>")
+    out.append("</table>")
+    out.append("</div>")
+    out.append("<br>")
 
     # print types sorted by class code
-    print("<a href=\"javascript:toggle_node('%s')\"> %s </a>%sby Code<br>" % ("PrimTypeCode", lozenge(), nbsp()))
-    print("<div width=\"100%%\" style=\"display:block\"  margin-bottom:\"2px\" id=\"PrimTypeCode\">")
-    print("<table>")
-    print("<tr>")
-    print(" <th>Section</th>")
-    print(" <th>Name</th>")
-    print(" <th>Code</th>")
-    print(" <th>Category</th>")
-    print(" <th>Width</th>")
-    print(" <th>Label</th>")
-    print("</tr>")
-    for code in encoding_codes:
-        enc = encoding_codemap[code]
-        print("<tr>")
-        print(" <td>%s</td>" % "types:encodings")
-        print(" <td><strong>%s</strong></td>" % enc.text)
-        print(" <td>%s</td>" % enc.get("code"))
-        print(" <td>%s</td>" % enc.get("category"))
-        print(" <td>%s</td>" % enc.get("width"))
-        print(" <td>%s</td>" % enc.get("label"))
-        print("</tr>")
-    print("</table>")
-    print("</div>")
-    print("<br>")
-
-
-#
-#
-descr_longnames = []   # "transport:performatives open"
-descr_codes = []       # "0x10"
-descr_codemap = {}     # map[longname] = "0x10"
-descr_mapcode = {}     # map[code] = longname
-descr_typemap = {}     # map[longname] = type node
-descr_fieldmap = {}    # map[longname] = [list-of-field-nodes]
-descr_fieldindex = []  # list of (fieldname, field's_parent_type_node)
+    out.append("<a href=\"javascript:toggle_node('%s')\"> %s </a>%sby Code<br>" % ("PrimTypeCode", lozenge(), nbsp()))
+    out.append("<div width=\"100%%\" style=\"display:block\"  margin-bottom:\"2px\" id=\"PrimTypeCode\" class=\"toggle-section\">")
+    out.append("<table>")
+    out.append("<tr>")
+    out.append(" <th>Section</th>")
+    out.append(" <th>Name</th>")
+    out.append(" <th>Code</th>")
+    out.append(" <th>Category</th>")
+    out.append(" <th>Width</th>")
+    out.append(" <th>Label</th>")
+    out.append("</tr>")
+    for code in model.encoding_codes:
+        enc = model.encoding_codemap[code]
+        out.append("<tr>")
+        out.append(" <td>%s</td>" % "types:encodings")
+        out.append(" <td><strong>%s</strong></td>" % enc.fullName)
+        out.append(" <td>%s</td>" % enc.code)
+        out.append(" <td>%s</td>" % enc.category)
+        out.append(" <td>%s</td>" % enc.width)
+        out.append(" <td>%s</td>" % enc.label)
+        out.append("</tr>")
+    out.append("</table>")
+    out.append("</div>")
+    out.append("<br>")
+
+
+#
+#
 # TODO: get the provides info
-def compute_described_types():
-    for type in typesDescribed:
-        descriptor = type.find("descriptor")
-        descr_name = descriptor.get("name")
-        descr_code = extract_descr_type_code(descriptor.get("code"))
-        fields = type.findall("field")
-        longname = type.text + " " + type.get("name")
-        descr_longnames.append(longname)
-        descr_codes.append(descr_code)
-        descr_codemap[longname] = descr_code
-        descr_mapcode[descr_code] = longname
-        descr_typemap[longname] = type
+def compute_described_types(model):
+    for type in model.typesDescribed:
+        descr_code = extract_descr_type_code(type.descriptorCode)
+        fields = type.fields
+        longname = type.section + " " + type.name
+        model.descr_longnames.append(longname)
+        model.descr_codes.append(descr_code)
+        model.descr_codemap[longname] = descr_code
+        model.descr_mapcode[descr_code] = longname
+        model.descr_typemap[longname] = type
+        model.descr_valuemap[code_value(type.descriptorCode)] = type
         if fields is not None:
-            descr_fieldmap[longname] = fields
+            model.descr_fieldmap[longname] = fields
             for field in fields:
-                descr_fieldindex.append( (field.get("name"), type) )
-    descr_codes.sort()
-
-
-#
-#
-def print_described_types():
-    print("<a name=\"DescribedTypes\"></a>")
-    print("<h3>Described Types</h3>")
-    print("<a href=\"javascript:toggle_node('%s')\"> %s </a>%sDescribed Types<br>" % ("DescrTypes", lozenge(), nbsp()))
-    print("<div width=\"100%%\" style=\"display:block\"  margin-bottom:\"2px\" id=\"DescrTypes\">")
-    print("<table>")
-    print("<tr>")
-    print(" <th>Section</th>")
-    print(" <th>Name</th>")
-    print(" <th>Code</th>")
-    print(" <th>Type</th>")
-    print(" <th>Provides</th>")
-    print(" <th>Label</th>")
-    print("</tr>")
-    for code in descr_codes:
-        name = descr_mapcode[code]
+                model.descr_fieldindex.append( (field.name, type) )
+    model.descr_codes.sort(key=lambda code: int(code, 16))
+
+
+#
+#
+def print_described_types(model, out):
+    out.append("<a name=\"DescribedTypes\"></a>")
+    out.append("<h3>Described Types</h3>")
+    out.append("<a href=\"javascript:toggle_node('%s')\"> %s </a>%sDescribed Types<br>" % ("DescrTypes", lozenge(), nbsp()))
+    out.append("<div width=\"100%%\" style=\"display:block\"  margin-bottom:\"2px\" id=\"DescrTypes\" class=\"toggle-section\">")
+    out.append("<table>")
+    out.append("<tr>")
+    out.append(" <th>Section</th>")
+    out.append(" <th>Name</th>")
+    out.append(" <th>Code</th>")
+    out.append(" <th>Type</th>")
+    out.append(" <th>Provides</th>")
+    out.append(" <th>Label</th>")
+    out.append("</tr>")
+    for code in model.descr_codes:
+        name = model.descr_mapcode[code]
         descr_key = name.split()
         section = descr_key[0]
         descr_typename = descr_key[1]
-        type = descr_typemap[name]
-        print("<tr id=\"TYPE_%s\">" % descr_typename)
-        print(" <td>%s</td>" % section)
-        print(" <td><a href=\"#details_%s\"><strong>%s</strong></a></td>" % (descr_typename, descr_typename))
-        print(" <td>%s</td>" % code)
-        print(" <td><a href=\"#TYPE_%s\">%s</a></td>" % (type.get("source"), type.get("source")))
-        print(" <td>%s</td>" % noNoneProvideRef(type.get("provides")))
-        print(" <td>%s</td>" % noNoneString(type.get("label")))
-        print("</tr>")
-        addToIndex(descr_typename, section) # Described
+        type = model.descr_typemap[name]
+        out.append("<tr id=\"TYPE_%s\">" % descr_typename)
+        out.append(" <td>%s</td>" % section)
+        out.append(" <td><a href=\"#details_%s\"><strong>%s</strong></a></td>" % (descr_typename, descr_typename))
+        out.append(" <td>%s</td>" % code)
+        out.append(" <td><a href=\"#TYPE_%s\">%s</a></td>" % (type.source, type.source))
+        out.append(" <td>%s</td>" % noNoneProvideRef(type.provides))
+        out.append(" <td>%s</td>" % noNoneString(type.label))
+        out.append("</tr>")
         stats.nDescribedTypes += 1
-    print("</table>")
-    print("<br>")
+    out.append("</table>")
+    out.append("<br>")
 
-    for code in descr_codes:
-        name = descr_mapcode[code]
+    for code in model.descr_codes:
+        name = model.descr_mapcode[code]
         descr_key = name.split()
         section = descr_key[0]
         descr_typename = descr_key[1]
-        type = descr_typemap[name]
-        print("<a name=\"details_%s\"></a>" % descr_typename)
-        print("%s%s<a href=\"javascript:toggle_node('%s')\"> %s </a>%s %s<strong><a href=\"#TYPE_%s\">%s</a></strong><br>" % \
+        type = model.descr_typemap[name]
+        out.append("<a name=\"details_%s\"></a>" % descr_typename)
+        out.append("%s%s<a href=\"javascript:toggle_node('%s')\"> %s </a>%s %s<strong><a href=\"#TYPE_%s\">%s</a></strong><br>" % \
               (nbsp(), nbsp(), "DT"+descr_typename, lozenge(), nbsp(), "Described type: " + section + " - ", descr_typename, descr_typename))
-        print("<div width=\"100%%\" style=\"display:block\"  margin-bottom:\"2px\" id=\"%s\">" % ("DT"+descr_typename))
-        print("<table>")
-        print("<tr>")
-        print(" <th>Tag</th>")
-        print(" <th>Name</th>")
-        print(" <th>Type</th>")
-        print(" <th>Requires</th>")
-        print(" <th>Default</th>")
-        print(" <th>Mandatory</th>")
-        print(" <th>Multiple</th>")
-        print(" <th>Label</th>")
-        print("</tr>")
-        for child in type:
-            childtag = ""
-            childtype = ""
-            printthis = True
-            if child.tag == "field":
-                childtype = child.get("type")
-                childlabel = noNoneString(child.get("label"))
-                childname ="<a id=\"FIELD_%s_%s\">%s</a>" % (descr_typename, child.get("name"), child.tag)
-                childtag = " <td>%s</td>" % (childname)
-                addToFieldIndex(child.get("name"), section, descr_typename)
-            elif child.tag == "descriptor":
-                childlabel = noNoneString(type.get("label"))
-                childtag = " <td>%s</td>" % child.tag
-            else:
-                printthis = False
-            if printthis:
-                print("<tr>")
-                print("%s" % childtag)
-                print(" <td><strong>%s</strong></td>" % child.get("name"))
-                print(" <td><a href=\"#TYPE_%s\">%s</a></td>" % (childtype, childtype))
-                print(" <td>%s</td>" % noNoneProvideRef(child.get("requires")))
-                print(" <td>%s</td>" % noNoneString(child.get("default")))
-                print(" <td>%s</td>" % noNoneString(child.get("mandatory")))
-                print(" <td>%s</td>" % noNoneString(child.get("multiple")))
-                print(" <td>%s</td>" % childlabel)
-                print("</tr>")
-        print("</table>")
-        print("<br>")
-        print("</div>")  # End one described type
+        out.append("<div width=\"100%%\" style=\"display:block\"  margin-bottom:\"2px\" id=\"%s\" class=\"toggle-detail\">" % ("DT"+descr_typename))
+        out.append("<table>")
+        out.append("<tr>")
+        out.append(" <th>Tag</th>")
+        out.append(" <th>Name</th>")
+        out.append(" <th>Type</th>")
+        out.append(" <th>Requires</th>")
+        out.append(" <th>Default</th>")
+        out.append(" <th>Mandatory</th>")
+        out.append(" <th>Multiple</th>")
+        out.append(" <th>Label</th>")
+        out.append("</tr>")
+        row = "<tr>\n%s\n <td><strong>%s</strong></td>\n <td><a href=\"#TYPE_%s\">%s</a></td>\n" \
+              " <td>%s</td>\n <td>%s</td>\n <td>%s</td>\n <td>%s</td>\n <td>%s</td>\n</tr>"
+        out.append(row % (" <td>descriptor</td>", type.descriptorName, "", "", "", "", "", "",
+                          noNoneString(type.label)))
+        for field in type.fields:
+            childname = "<a id=\"FIELD_%s_%s\">field</a>" % (descr_typename, field.name)
+            out.append(row % (" <td>%s</td>" % (childname), field.name, field.type, field.type,
+                              noNoneProvideRef(field.requires),
+                              noNoneString(field.default),
+                              noNoneString(field.mandatory),
+                              noNoneString(field.multiple),
+                              noNoneString(field.label)))
+        out.append("</table>")
+        out.append("<br>")
+        out.append("</div>")  # End one described type
    
-    print("</div>")   # End described type details
-    print("<br>")
+    out.append("</div>")   # End described type details
+    out.append("<br>")
 
 
 #
 #
-enum_longnames = []    # "messaging:message-format terminus-durability"
-enum_typemap = {}      # map[longname] = type node
-enum_choicemap = {}    # map[longname] = [list-of-choice-fields]
-enum_choiceindex = {}  # list of (choicename, choice's_parent_type_node)
 
-def compute_enumerated_types():
+def compute_enumerated_types(model):
     #log("typesEnumerated: %s" % typesEnumerated)
-    for type in typesEnumerated:
-        #log("processing enum %s" % type.get("name"))
-        longname = type.text + " " + type.get("name")
-        enum_longnames.append(longname)
-        enum_typemap[longname] = type
+    for type in model.typesEnumerated:
+        #log("processing enum %s" % type.name)
+        longname = type.section + " " + type.name
+        model.enum_longnames.append(longname)
+        model.enum_typemap[longname] = type
         #        if choices is not None:
         #            enum_choicemap[longname] = choices
         #            for choice in choices:
         #                log("processing enum choice %s" % choice.get("name"))
         #                enum_choiceindex.append( (choice.get("name"), type) )
-        choices = []
-        for child in type:
-            if child.tag == "choice":
-                choices += child
-                enum_choiceindex[child.get("name")] = type
-                addToEnumIndex(child.get("name"), type.text, type.get("name"))
-        enum_choicemap[longname] = choices
-    enum_longnames.sort()
+        for choice in type.choices:
+            model.enum_choiceindex[choice.name] = type
+            model.enumIndex.add(choice.name, [type.section, type.name])
+        model.enum_choicemap[longname] = type.choices
+    model.enum_longnames.sort()
         
-def print_enumerated_types():
-    print("<a name=\"EnumeratedTypes\"></a>")
-    print("<h3>Enumerated Types</h3>")
-    print("<a href=\"javascript:toggle_node('%s')\"> %s </a>%sEnumerated Types<br>" % ("EnumTypes", lozenge(), nbsp()))
-    print("<div width=\"100%%\" style=\"display:block\"  margin-bottom:\"2px\" id=\"EnumTypes\">")
-    print("<table>")
-    print("<tr>")
-    print(" <th>Section</th>")
-    print(" <th>Name</th>")
-    print(" <th>Type</th>")
-    print(" <th>Label</th>")
-    print(" <th>Provides</th>")
-    print("</tr>")
-    for lname in enum_longnames:
-        type = enum_typemap[lname]
-        print("<tr id=\"TYPE_%s\">" % type.get("name"))
-        print(" <td>%s</td>" % type.text)
-        print(" <td><a href=\"#details_%s\"><strong>%s</strong></a></td>" % (type.get("name"), type.get("name")))
-        print(" <td><a href=\"#TYPE_%s\">%s</a></td>" % (type.get("source"), type.get("source")))
-        print(" <td>%s</td>" % noNoneString(type.get("label")))
-        print(" <td>%s</td>" % noNoneProvideRef(type.get("provides")))
-        print("</tr>")
-        addToIndex(type.get("name"), type.text) # Enum
+def print_enumerated_types(model, out):
+    out.append("<a name=\"EnumeratedTypes\"></a>")
+    out.append("<h3>Enumerated Types</h3>")
+    out.append("<a href=\"javascript:toggle_node('%s')\"> %s </a>%sEnumerated Types<br>" % ("EnumTypes", lozenge(), nbsp()))
+    out.append("<div width=\"100%%\" style=\"display:block\"  margin-bottom:\"2px\" id=\"EnumTypes\" class=\"toggle-section\">")
+    out.append("<table>")
+    out.append("<tr>")
+    out.append(" <th>Section</th>")
+    out.append(" <th>Name</th>")
+    out.append(" <th>Type</th>")
+    out.append(" <th>Label</th>")
+    out.append(" <th>Provides</th>")
+    out.append("</tr>")
+    for lname in model.enum_longnames:
+        type = model.enum_typemap[lname]
+        out.append("<tr id=\"TYPE_%s\">" % type.name)
+        out.append(" <td>%s</td>" % type.section)
+        out.append(" <td><a href=\"#details_%s\"><strong>%s</strong></a></td>" % (type.name, type.name))
+        out.append(" <td><a href=\"#TYPE_%s\">%s</a></td>" % (type.source, type.source))
+        out.append(" <td>%s</td>" % noNoneString(type.label))
+        out.append(" <td>%s</td>" % noNoneProvideRef(type.provides))
+        out.append("</tr>")
         stats.nEnumeratedTypes += 1
-    print("</table>")
-    print("<br>")
+    out.append("</table>")
+    out.append("<br>")
 
-    for lname in enum_longnames:
-        type = enum_typemap[lname]
+    for lname in model.enum_longnames:
+        type = model.enum_typemap[lname]
         enum_key = lname.split()
         section = enum_key[0]
         enum_typename = enum_key[1]
-        print("<a name=\"details_%s\"></a>" % (enum_typename))
-        print("%s%s<a href=\"javascript:toggle_node('%s')\"> %s </a>%s %s<strong><a href=\"#TYPE_%s\">%s</a></strong><br>" % \
+        out.append("<a name=\"details_%s\"></a>" % (enum_typename))
+        out.append("%s%s<a href=\"javascript:toggle_node('%s')\"> %s </a>%s %s<strong><a href=\"#TYPE_%s\">%s</a></strong><br>" % \
               (nbsp(), nbsp(), "ET"+enum_typename, lozenge(), nbsp(), "Enumerated type: " + section + " - ", enum_typename, enum_typename))
-        print("<div width=\"100%%\" style=\"display:block\"  margin-bottom:\"2px\" id=\"%s\">" % ("ET"+enum_typename))
-        print("<table>")
-        print("<tr>")
-        print(" <th>Name</th>")
-        print(" <th>Type/Value</th>")
-        print(" <th>Label</th>")
-        print(" <th>Provides</th>")
-        print("</tr>")
-        print("<tr>")
-        print(" <td><strong>%s</strong></td>" % (type.get("name")))
-        print(" <td><a href=\"#TYPE_%s\">%s</a></td>" % (type.get("source"), type.get("source")))
-        print(" <td>%s</td>" % noNoneString(type.get("label")))
-        print(" <td>%s</td>" % noNoneProvideRef(type.get("provides")))
-        print("</tr>")
-        for child in type.findall("choice"):
-            print("<tr>")
-            print(" <td><strong>%s</strong></td>" % child.get("name"))
-            print(" <td>%s</td>" % child.get("value"))
-            print("</tr>")
-        print("</table>")
-        print("<br>")
-        print("</div>")
-    print("</div>")   # End enumerated type details
-    print("<br>")
-
-#
-#
-def print_restricted_types():
-    print("<a name=\"RestrictedTypes\"></a>")
-    print("<h3>Restricted Types</h3>")
-    print("<a href=\"javascript:toggle_node('%s')\"> %s </a>%sRestricted Types<br>" % ("RestrTypes", lozenge(), nbsp()))
-    print("<div width=\"100%%\" style=\"display:block\"  margin-bottom:\"2px\" id=\"RestrTypes\">")
-    print("<table>")
-    print("<tr>")
-    print(" <th>Section</th>")
-    print(" <th>Name</th>")
-    print(" <th>Type</th>")
-    print(" <th>Label</th>")
-    print(" <th>Provides</th>")
-    print("</tr>")
-    for type in typesRestricted:
-        print("<tr>")
-        print(" <td>%s</td>" % type.text)
-        print(" <td><strong><a name=\"TYPE_%s\">%s</a></strong></td>" % (type.get("name"), type.get("name")))
-        print(" <td><a href=\"#TYPE_%s\">%s</a></td>" % (type.get("source"),type.get("source")))
-        print(" <td>%s</td>" % noNoneString(type.get("label")))
-        print(" <td>%s</td>" % noNoneProvideRef(type.get("provides")))
-        print("</tr>")
-        addToIndex(type.get("name"), type.text) # Restricted
+        out.append("<div width=\"100%%\" style=\"display:block\"  margin-bottom:\"2px\" id=\"%s\" class=\"toggle-detail\">" % ("ET"+enum_typename))
+        out.append("<table>")
+        out.append("<tr>")
+        out.append(" <th>Name</th>")
+        out.append(" <th>Type/Value</th>")
+        out.append(" <th>Label</th>")
+        out.append(" <th>Provides</th>")
+        out.append("</tr>")
+        out.append("<tr>")
+        out.append(" <td><strong>%s</strong></td>" % (type.name))
+        out.append(" <td><a href=\"#TYPE_%s\">%s</a></td>" % (type.source, type.source))
+        out.append(" <td>%s</td>" % noNoneString(type.label))
+        out.append(" <td>%s</td>" % noNoneProvideRef(type.provides))
+        out.append("</tr>")
+        for choice in type.choices:
+            out.append("<tr>")
+            out.append(" <td><strong>%s</strong></td>" % choice.name)
+            out.append(" <td>%s</td>" % choice.value)
+            out.append("</tr>")
+        out.append("</table>")
+        out.append("<br>")
+        out.append("</div>")
+    out.append("</div>")   # End enumerated type details
+    out.append("<br>")
+
+#
+#
+def print_restricted_types(model, out):
+    out.append("<a name=\"RestrictedTypes\"></a>")
+    out.append("<h3>Restricted Types</h3>")
+    out.append("<a href=\"javascript:toggle_node('%s')\"> %s </a>%sRestricted Types<br>" % ("RestrTypes", lozenge(), nbsp()))
+    out.append("<div width=\"100%%\" style=\"display:block\"  margin-bottom:\"2px\" id=\"RestrTypes\" class=\"toggle-section\">")
+    out.append("<table>")
+    out.append("<tr>")
+    out.append(" <th>Section</th>")
+    out.append(" <th>Name</th>")
+    out.append(" <th>Type</th>")
+    out.append(" <th>Label</th>")
+    out.append(" <th>Provides</th>")
+    out.append("</tr>")
+    for type in model.typesRestricted:
+        out.append("<tr>")
+        out.append(" <td>%s</td>" % type.section)
+        out.append(" <td><strong><a name=\"TYPE_%s\">%s</a></strong></td>" % (type.name, type.name))
+        out.append(" <td><a href=\"#TYPE_%s\">%s</a></td>" % (type.source,type.source))
+        out.append(" <td>%s</td>" % noNoneString(type.label))
+        out.append(" <td>%s</td>" % noNoneProvideRef(type.provides))
+        out.append("</tr>")
         stats.nRestrictedTypes += 1
-    print("</table>")
-    print("</div>")
-    print("<br>")
-
-
-#
-#
-def print_provided_types():
-    providedtypenames.sort()
-    print("<a name=\"ProvidedTypes\"></a>")
-    print("<h3>Provided Types</h3>")
-    print("<a href=\"javascript:toggle_node('%s')\"> %s </a>%sProvided Types<br>" % ("ProvTypes", lozenge(), nbsp()))
-    print("<div width=\"100%%\" style=\"display:block\"  margin-bottom:\"2px\" id=\"ProvTypes\">")
-    print("<table>")
-    print("<tr>")
-    print(" <th>Provided Type</th>")
-    print(" <th>Provider</th>")
-    print(" <th>Provider Section</th>")
-    print("</tr>")
-    for ptype in providedtypenames:
+    out.append("</table>")
+    out.append("</div>")
+    out.append("<br>")
+
+
+#
+#
+def print_provided_types(model, out):
+    out.append("<a name=\"ProvidedTypes\"></a>")
+    out.append("<h3>Provided Types</h3>")
+    out.append("<a href=\"javascript:toggle_node('%s')\"> %s </a>%sProvided Types<br>" % ("ProvTypes", lozenge(), nbsp()))
+    out.append("<div width=\"100%%\" style=\"display:block\"  margin-bottom:\"2px\" id=\"ProvTypes\" class=\"toggle-section\">")
+    out.append("<table>")
+    out.append("<tr>")
+    out.append(" <th>Provided Type</th>")
+    out.append(" <th>Provider</th>")
+    out.append(" <th>Provider Section</th>")
+    out.append("</tr>")
+    for ptype in model.providedtypenames:
         anchor = " id=\"PROVIDEDTYPE_%s\"" % ptype
-        types = provided[ptype]
-        addToIndex(ptype, "PROVIDED")
+        types = model.provided[ptype]
         stats.nProvidedTypes += 1
         for type in types:
-            print("<tr%s>" % anchor)
+            out.append("<tr%s>" % anchor)
             anchor = ""
-            print(" <td>%s</td>" % ptype)
-            print(" <td>%s</td>" % noNoneTypeRef(type.get("name")))
-            print(" <td>%s</td>" % type.text)
-            print("</tr>")
-    print("</table>")
-    print("</div>")
-    print("<br>")
+            out.append(" <td>%s</td>" % ptype)
+            out.append(" <td>%s</td>" % noNoneTypeRef(type.name))
+            out.append(" <td>%s</td>" % type.section)
+            out.append("</tr>")
+    out.append("</table>")
+    out.append("</div>")
+    out.append("<br>")
         
 #
 #
-def print_asciiart():
-    print("<a name=\"Diagrams\"></a>")
-    print("<h2>Diagrams</h2>")
-    print("These diagrams may not make sense when taken out of the context of the ")
-    print("<a href=\"http://docs.oasis-open.org/amqp/core/v1.0/os/amqp-core-overview-v1.0-os.html\">")
-    print("AMQP 1.0 Specification</a>. Please refer to the spec to get the complete narrative.<br>")
-    for x in xmlStoreList:
-        x.showPics()
-
-
-#
-#
-def print_type_index():
-    typeNameIndex.sort()
-    print("<a name=\"Indices\"></a>")
-    print("<h2>Indices</h2>")
-    print("<a name=\"TypeIndex\"></a>")
-    print("<h3>Type Index</h3>")
-    print("<a href=\"javascript:toggle_node('%s')\"> %s </a>%sType Index<br>" % ("TypIndex", lozenge(), nbsp()))
-    print("<div width=\"100%%\" style=\"display:block\"  margin-bottom:\"2px\" id=\"TypIndex\">")
-    print("<table>")
-    print("<tr>")
-    print(" <th>Type Name</th>")
-    print(" <th>Section</th>")
-    print("</tr>")
-    for idx in typeNameIndex:
-        sections = typeIndex[idx]
+def print_encoded_sizes(model, out):
+    out.append("<a name=\"EncodedSizes\"></a>")
+    out.append("<h3>Encoded Sizes</h3>")
+    out.append("<a href=\"javascript:toggle_node('%s')\"> %s </a>%sEncoded Sizes<br>" % ("EncSizes", lozenge(), nbsp()))
+    out.append("<div width=\"100%%\" style=\"display:block\"  margin-bottom:\"2px\" id=\"EncSizes\" class=\"toggle-section\">")
+    out.append("<p>Bytes to encode each described type, descriptor included. Max is with every variable width "
+               "value empty: add the length of the variable width fields' contents.</p>")
+    out.append("<table>")
+    out.append("<tr>")
+    out.append(" <th>Described Type</th>")
+    out.append(" <th>Min</th>")
+    out.append(" <th>Max</th>")
+    out.append(" <th>Variable Width Fields</th>")
+    out.append("</tr>")
+    for type in model.typesDescribed:
+        size = model.encodedSizes[type.name]
+        if size.variableFields:
+            variable = ", ".join([field_index_ref(name, type.name) for name in size.variableFields])
+        elif size.variable:
+            variable = "contents of %s" % noNoneTypeRef(type.source)
+        else:
+            variable = "none, fixed width"
+        out.append("<tr>\n <td>%s</td>\n <td>%d</td>\n <td>%d%s</td>\n <td>%s</td>\n</tr>" %
+                   (noNoneTypeRef(type.name), size.min, size.max, " + variable" if size.variable else "", variable))
+        stats.nEncodedSizes += 1
+    out.append("</table>")
+    out.append("</div>")
+    out.append("<br>")
+
+#
+#
+def print_asciiart(model, out):
+    out.append("<a name=\"Diagrams\"></a>")
+    out.append("<h2>Diagrams</h2>")
+    out.append("These diagrams may not make sense when taken out of the context of the ")
+    out.append("<a href=\"http://docs.oasis-open.org/amqp/core/v1.0/os/amqp-core-overview-v1.0-os.html\">")
+    out.append("AMQP 1.0 Specification</a>. Please refer to the spec to get the complete narrative.<br>")
+    for x in model.xmlStoreList:
+        x.showPics(out)
+
+
+#
+#
+def print_type_index(model, out):
+    out.append("<a name=\"Indices\"></a>")
+    out.append("<h2>Indices</h2>")
+    out.append("<a name=\"TypeIndex\"></a>")
+    out.append("<h3>Type Index</h3>")
+    out.append("<a href=\"javascript:toggle_node('%s')\"> %s </a>%sType Index<br>" % ("TypIndex", lozenge(), nbsp()))
+    out.append("<div width=\"100%%\" style=\"display:block\"  margin-bottom:\"2px\" id=\"TypIndex\" class=\"toggle-section\">")
+    out.append("<table>")
+    out.append("<tr>")
+    out.append(" <th>Type Name</th>")
+    out.append(" <th>Section</th>")
+    out.append("</tr>")
+    for idx in model.typeIndex.sortedNames():
+        sections = model.typeIndex[idx]
         for section in sections:
-            print("<tr>")
-            if section == "PROVIDED":
-                name = noNoneProvideRef(idx)
-            else:
-                name = noNoneTypeRef(idx)
-            print(" <td>%s</td>" % name)
-            print(" <td>%s</td>" % section)
-            print("</tr>")
-            addToGrandIndex(idx, name, "type", section, " ")
+            out.append("<tr>\n <td>%s</td>\n <td>%s</td>\n</tr>" % (type_index_ref(idx, section), section))
             stats.nIndexedTypes += 1
-    print("</table>")
-    print("</div>")
-    print("<br>")
+    out.append("</table>")
+    out.append("</div>")
+    out.append("<br>")
         
 
 #
 #
-def print_field_index():
-    fieldNameIndex.sort()
-    print("<a name=\"FieldIndex\"></a>")
-    print("<h3>Field Index</h3>")
-    print("<a href=\"javascript:toggle_node('%s')\"> %s </a>%sField Index<br>" % ("FldIndex", lozenge(), nbsp()))
-    print("<div width=\"100%%\" style=\"display:block\"  margin-bottom:\"2px\" id=\"FldIndex\">")
-    print("<table>")
-    print("<tr>")
-    print(" <th>Field Name</th>")
-    print(" <th>Parent Type</th>")
-    print(" <th>Section</th>")
-    print("</tr>")
-    for idx in fieldNameIndex:
-        parents = fieldIndex[idx]
+def print_field_index(model, out):
+    out.append("<a name=\"FieldIndex\"></a>")
+    out.append("<h3>Field Index</h3>")
+    out.append("<a href=\"javascript:toggle_node('%s')\"> %s </a>%sField Index<br>" % ("FldIndex", lozenge(), nbsp()))
+    out.append("<div width=\"100%%\" style=\"display:block\"  margin-bottom:\"2px\" id=\"FldIndex\" class=\"toggle-section\">")
+    out.append("<table>")
+    out.append("<tr>")
+    out.append(" <th>Field Name</th>")
+    out.append(" <th>Parent Type</th>")
+    out.append(" <th>Section</th>")
+    out.append("</tr>")
+    for idx in model.fieldIndex.sortedNames():
+        parents = model.fieldIndex[idx]
         for parent in parents:
             psect = parent[0]
             ptype = parent[1]
-            print("<tr>")
-            name = "<a href=\"#FIELD_%s_%s\">%s</a>" % (ptype, idx, idx)
-            print(" <td>%s</td>" % name)
-            print(" <td>%s</td>" % ptype)
-            print(" <td>%s</td>" % psect)
-            print("</tr>")
-            addToGrandIndex(idx, name, "field", psect, ptype)
+            out.append("<tr>\n <td>%s</td>\n <td>%s</td>\n <td>%s</td>\n</tr>" %
+                       (field_index_ref(idx, ptype), ptype, psect))
             stats.nIndexedFields += 1
-    print("</table>")
-    print("</div>")
-    print("<br>")
-
-
-#
-#
-def print_enumeration_index():
-    enumNameIndex.sort()
-    print("<a name=\"EnumerationIndex\"></a>")
-    print("<h3>Enumeration Index</h3>")
-    print("<a href=\"javascript:toggle_node('%s')\"> %s </a>%sEnumeration Index<br>" % ("EnuIndex", lozenge(), nbsp()))
-    print("<div width=\"100%%\" style=\"display:block\"  margin-bottom:\"2px\" id=\"EnuIndex\">")
-    print("<table>")
-    print("<tr>")
-    print(" <th>Enum Value</th>")
-    print(" <th>Enumeration</th>")
-    print(" <th>Section</th>")
-    print("</tr>")
-    for idx in enumNameIndex:
-        parents = enumIndex[idx]
+    out.append("</table>")
+    out.append("</div>")
+    out.append("<br>")
+
+
+#
+#
+def print_enumeration_index(model, out):
+    out.append("<a name=\"EnumerationIndex\"></a>")
+    out.append("<h3>Enumeration Index</h3>")
+    out.append("<a href=\"javascript:toggle_node('%s')\"> %s </a>%sEnumeration Index<br>" % ("EnuIndex", lozenge(), nbsp()))
+    out.append("<div width=\"100%%\" style=\"display:block\"  margin-bottom:\"2px\" id=\"EnuIndex\" class=\"toggle-section\">")
+    out.append("<table>")
+    out.append("<tr>")
+    out.append(" <th>Enum Value</th>")
+    out.append(" <th>Enumeration</th>")
+    out.append(" <th>Section</th>")
+    out.append("</tr>")
+    for idx in model.enumIndex.sortedNames():
+        parents = model.enumIndex[idx]
         for parent in parents:
             psect = parent[0]
             ptype = parent[1]
             enum = "<a href=\"#TYPE_%s\">%s</a>" % (ptype, ptype)
-            print("<tr>")
-            print(" <td>%s</td>" % idx)
-            print(" <td>%s</td>" % enum)
-            print(" <td>%s</td>" % psect)
-            print("</tr>")
-            addToGrandIndex(idx, idx, "enum value", psect, enum)
+            out.append("<tr>\n <td>%s</td>\n <td>%s</td>\n <td>%s</td>\n</tr>" % (idx, enum, psect))
             stats.nIndexedEnumerations += 1
-    print("</table>")
-    print("</div>")
-    print("<br>")
-
-
-#
-#
-def print_grand_index():
-    grandNameIndex.sort()
-    print("<a name=\"GrandIndex\"></a>")
-    print("<h3>Grand Index</h3>")
-    print("<a href=\"javascript:toggle_node('%s')\"> %s </a>%sGrand Index<br>" % ("GndIndex", lozenge(), nbsp()))
-    print("<div width=\"100%%\" style=\"display:block\"  margin-bottom:\"2px\" id=\"GndIndex\">")
-    print("<table>")
-    print("<tr>")
-    print(" <th>Name</th>")
-    print(" <th>Category</th>")
-    print(" <th>Parent</th>")
-    print(" <th>Section</th>")
-    print("</tr>")
-    for idx in grandNameIndex:
-        parents = grandIndex[idx]
+    out.append("</table>")
+    out.append("</div>")
+    out.append("<br>")
+
+
+#
+#
+def print_grand_index(model, out):
+    out.append("<a name=\"GrandIndex\"></a>")
+    out.append("<h3>Grand Index</h3>")
+    out.append("<a href=\"javascript:toggle_node('%s')\"> %s </a>%sGrand Index<br>" % ("GndIndex", lozenge(), nbsp()))
+    out.append("<div width=\"100%%\" style=\"display:block\"  margin-bottom:\"2px\" id=\"GndIndex\" class=\"toggle-section\">")
+    out.append("<table>")
+    out.append("<tr>")
+    out.append(" <th>Name</th>")
+    out.append(" <th>Category</th>")
+    out.append(" <th>Parent</th>")
+    out.append(" <th>Section</th>")
+    out.append("</tr>")
+    for idx in model.grandIndex.sortedNames():
+        parents = model.grandIndex[idx]
         for parent in parents:
-            print("<tr>")
-            print(" <td>%s</td>" % parent[0])
-            print(" <td>%s</td>" % parent[1])
-            print(" <td>%s</td>" % parent[2])
-            print(" <td>%s</td>" % parent[3])
-            print("</tr>")
+            out.append("<tr>\n <td>%s</td>\n <td>%s</td>\n <td>%s</td>\n <td>%s</td>\n</tr>" % tuple(parent))
             stats.nIndexedGrand += 1
-    print("</table>")
-    print("</div>")
-    print("<br>")
+    out.append("</table>")
+    out.append("</div>")
+    out.append("<br>")
+
 
+#
+# The cross reference relation, as plain data shared by the page, the
+# export and the lookup tables. model.xref[name] lists what is defined
+# in terms of name, each as a dictionary:
+#   referrer  the type name, or "type.field" for a field
+#   type      the referring type's name
+#   field     the field's name, None unless category is "field"
+#   category  "enum", "restricted" or "described": name is the type's
+#             source. "field": name is the field's type. "provided":
+#             the type provides name.
+#   section   the referring type's section
+# Lists are in category order, as above, then enum, restricted and
+# described type order.
+def compute_xref(model):
+    xref = model.xref
+    def refer(name, type, field, category):
+        referrer = type.name if field is None else "%s.%s" % (type.name, field.name)
+        xref.setdefault(name, []).append({"referrer": referrer, "type": type.name,
+                                          "field": None if field is None else field.name,
+                                          "category": category, "section": type.section})
+    for lname in model.enum_longnames:
+        type = model.enum_typemap[lname]
+        refer(type.source, type, None, "enum")
+    for type in model.typesRestricted:
+        refer(type.source, type, None, "restricted")
+    for code in model.descr_codes:
+        type = model.descr_typemap[model.descr_mapcode[code]]
+        refer(type.source, type, None, "described")
+    for code in model.descr_codes:
+        type = model.descr_typemap[model.descr_mapcode[code]]
+        for field in type.fields:
+            refer(field.type, type, field, "field")
+    for ptype in model.providedtypenames:
+        for type in model.provided[ptype]:
+            refer(ptype, type, None, "provided")
 
 #
 #
-def print_xref_index():
+def compute_xref_index(model):
     #     Create xref name index from type index.
-    xrefNameIndex.append("*")
-    for idx in typeNameIndex:
-        sections = typeIndex[idx]
+    #     Each entry list holds the types defined in terms of type 'name'.
+    #     Provided types are keyed 'name,PROVIDED'.
+    model.xrefIndex.addName("*")
+    for idx in model.typeIndex.names():
+        sections = model.typeIndex[idx]
         for section in sections:
             name = idx
             if section == "PROVIDED":
                 name += ",PROVIDED"
-            if name not in xrefNameIndex:
-                xrefNameIndex.append(name)
+            # primitive type names get reused as encoding names...
+            model.xrefIndex.addName(name)
+
+    for name in sorted(model.xref):
+        for ref in model.xref[name]:
+            category = ref["category"]
+            if category == "field":
+                decname = "<a href=\"#FIELD_%s_%s\">%s</a>" % (ref["type"], ref["field"], ref["field"])
+                refSection = "%s - %s" % (ref["section"], ref["type"])
             else:
-                # primitive type names get reused as encoding names...
-                pass
-        
-    xrefNameIndex.sort()
-    for name in xrefNameIndex:
-        xrefIndex[name] = [] # list of types defined in terms of type 'name'
-
-    # Enum types
-    for lname in enum_longnames:
-        type = enum_typemap[lname]
-        decname = noNoneTypeRef(type.get("name"))
-        source = type.get("source")
-        category = "enum"
-        refSection = type.text
-        xrefIndex[source].append( [decname, category, refSection])
-
-    # Restricted types
-    for type in typesRestricted:
-        decname = noNoneTypeRef(type.get("name"))
-        source = type.get("source")
-        category = "restricted"
-        refSection = type.text
-        xrefIndex[source].append( [decname, category, refSection])
-
-    # Described types
-    for code in descr_codes:
-        name = descr_mapcode[code]
-        descr_key = name.split()
-        section = descr_key[0]
-        descr_typename = descr_key[1]
-        type = descr_typemap[name]
-        decname = noNoneTypeRef(descr_typename)
-        source = type.get("source")
-        category = "described"
-        refSection = section
-        xrefIndex[source].append( [decname, category, refSection])
-
-    # Described fields
-    for code in descr_codes:
-        name = descr_mapcode[code]
-        descr_key = name.split()
-        section = descr_key[0]
-        descr_typename = descr_key[1]
-        type = descr_typemap[name]
-        for child in type:
-            if child.tag == "field":
-                decname = "<a href=\"#FIELD_%s_%s\">%s</a>" % (descr_typename, child.get("name"), child.get("name"))
-                source = child.get("type")
-                category = "field"
-                refSection = "%s - %s" % (section, descr_typename)
-                xrefIndex[source].append( [decname, category, refSection])
-
-    # Provided types
-    for ptype in providedtypenames:
-        types = provided[ptype]
-        for type in types:
-            decname = noNoneTypeRef(type.get("name"))
-            source = "%s,%s" % (ptype, "PROVIDED")
-            category = "provided"
-            refSection = ""
-            xrefIndex[source].append( [decname, category, refSection])
-    print("<a name=\"XrefIndex3\"></a>")
-    print("<h3>Cross Reference Index</h3>")
-    print("<a href=\"javascript:toggle_node('%s')\"> %s </a>%sType Cross Reference<br>" % ("XrefIndex", lozenge(), nbsp()))
-    print("<div width=\"100%%\" style=\"display:block\"  margin-bottom:\"2px\" id=\"XrefIndex\">")
-    print("<table>")
-    print("<tr>")
-    print(" <th>Referenced Type</th>")
-    print(" <th>Referrer</th>")
-    print(" <th>Section</th>")
-    print(" <th>Type</th>")
-    print("</tr>")
-    for idx in xrefNameIndex:
+                decname = noNoneTypeRef(ref["type"])
+                refSection = "" if category == "provided" else ref["section"]
+            source = name + ",PROVIDED" if category == "provided" else name
+            model.xrefIndex[source].append( [decname, category, refSection])
+
+
+#
+# Index data, computed in the order the tables appear on the page
+def compute_indices(model):
+    # Type index
+    for definition in model.definitionsAll:
+        model.typeIndex.add(definition.name, definition.section) # Constants
+    for type in model.typesPrimitive:
+        model.typeIndex.add(type.name, type.section) # Primitive category
+        for enc in type.encodings:
+            model.typeIndex.add(enc.fullName, "types:encodings") # Primitive type
+    for lname in model.enum_longnames:
+        type = model.enum_typemap[lname]
+        model.typeIndex.add(type.name, type.section) # Enum
+    for type in model.typesRestricted:
+        model.typeIndex.add(type.name, type.section) # Restricted
+    for code in model.descr_codes:
+        section, descr_typename = model.descr_mapcode[code].split()
+        model.typeIndex.add(descr_typename, section) # Described
+    model.providedtypenames.sort()
+    for ptype in model.providedtypenames:
+        model.typeIndex.add(ptype, "PROVIDED")
+
+    # Field index
+    for code in model.descr_codes:
+        name = model.descr_mapcode[code]
+        section, descr_typename = name.split()
+        for field in model.descr_typemap[name].fields:
+            model.fieldIndex.add(field.name, [section, descr_typename])
+
+    # Grand index from the type, field and enumeration indices
+    for idx in model.typeIndex.sortedNames():
+        for section in model.typeIndex[idx]:
+            model.grandIndex.add(idx, [type_index_ref(idx, section), "type", section, " "])
+    for idx in model.fieldIndex.sortedNames():
+        for psect, ptype in model.fieldIndex[idx]:
+            model.grandIndex.add(idx, [field_index_ref(idx, ptype), "field", psect, ptype])
+    for idx in model.enumIndex.sortedNames():
+        for psect, ptype in model.enumIndex[idx]:
+            model.grandIndex.add(idx, [idx, "enum value", psect, noNoneTypeRef(ptype)])
+
+    with stats.phase("compute_xref"):
+        compute_xref(model)
+    with stats.phase("compute_xref_index"):
+        compute_xref_index(model)
+    with stats.phase("compute_type_graph"):
+        compute_type_graph(model)
+    with stats.phase("compute_search_index"):
+        compute_search_index(model)
+
+
+#
+# Type dependency graph from the same relations as the xref index, with
+# the field references and requires credited to the field's type.
+def compute_type_graph(model):
+    graph = model.typeGraph
+    for name in model.typesAll:
+        graph.addNode(name)
+    for type in model.typesEnumerated + model.typesRestricted + model.typesDescribed:
+        graph.addEdge(type.name, type.source)
+    for type in model.typesDescribed:
+        for field in type.fields:
+            graph.addEdge(type.name, field.type)
+            for required in (field.requires or "").split(","):
+                required = required.strip()
+                if required:
+                    graph.addEdge(type.name, "%s,PROVIDED" % required)
+                    for provider in model.provided.get(required, []):
+                        graph.addEdge(type.name, provider.name)
+    for ptype in model.providedtypenames:
+        for type in model.provided[ptype]:
+            graph.addEdge(type.name, "%s,PROVIDED" % ptype)
+    graph.close()
+
+
+#
+# Encoded size bounds of every type. Primitive types take the bounds of
+# their encodings. Enumerated and restricted types take those of their
+# source type. A described type is the descriptor, as a ulong, plus the
+# encoding of its source type. For composite types that is a list: the
+# smallest is list0 when no field is mandatory, otherwise a list8 of
+# the fields up to the last mandatory one with the optional ones among
+# them null. The largest is a list32 holding every field. A field of
+# type * may hold any type providing what it requires. A multiple field
+# may hold an array. A value of unknown type, or * with nothing
+# required, may be any primitive value. Each type's bounds are computed
+# once.
+def descriptor_size(code):
+    value = code_value(code)
+    if value == 0:
+        least = 2   # 0x00 ulong0
+    elif value < 256:
+        least = 3   # 0x00 smallulong
+    else:
+        least = 10  # 0x00 ulong
+    return EncodedSize(least, 10)
+
+def encoding_size(enc):
+    width = int(enc.width)
+    if enc.category == "fixed":
+        return EncodedSize(1 + width, 1 + width)
+    if enc.category == "variable":
+        return EncodedSize(1 + width, 1 + width, True)    # size
+    if enc.category == "compound":
+        return EncodedSize(1 + 2 * width, 1 + 2 * width, True)  # size, count
+    return EncodedSize(2 + 2 * width, 2 + 2 * width, True)      # size, count, element constructor
+
+def compute_encoded_sizes(model):
+    sizes = model.encodedSizes
+    for type in model.typesPrimitive:
+        size = None
+        for enc in type.encodings:
+            encSize = encoding_size(enc)
+            size = encSize if size is None else size.union(encSize)
+        sizes[type.name] = size
+    anyValue = None
+    for type in model.typesPrimitive:
+        anyValue = sizes[type.name] if anyValue is None else anyValue.union(sizes[type.name])
+    busy = set()
+
+    def type_size(name):
+        size = sizes.get(name)
+        if size is not None:
+            return size
+        type = model.typesAll.get(name)
+        if type is None or name in busy:
+            return anyValue
+        busy.add(name)
+        if isinstance(type, DescribedType):
+            if type.cls == "composite":
+                body = list_size(type)
+            else:
+                body = type_size(type.source)
+            size = EncodedSize(descriptor_size(type.descriptorCode).min + body.min,
+                               descriptor_size(type.descriptorCode).max + body.max,
+                               body.variable, body.variableFields)
+        else:
+            size = type_size(type.source)
+        busy.discard(name)
+        sizes[name] = size
+        return size
+
+    def field_size(field):
+        if field.type == "*":
+            size = None
+            for required in (field.requires or "").split(","):
+                for provider in model.provided.get(required.strip(), []):
+                    size = type_size(provider.name) if size is None else size.union(type_size(provider.name))
+            if size is None:
+                size = anyValue
+        else:
+            size = type_size(field.type)
+        if field.multiple == "true":
+            size = size.union(sizes["array"])
+        return size
+
+    def list_size(type):
+        fieldSizes = [field_size(field) for field in type.fields]
+        mandatory = [i for i, field in enumerate(type.fields) if field.mandatory == "true"]
+        if mandatory:
+            least = 3  # list8 size count
+            for i in range(mandatory[-1] + 1):
+                least += fieldSizes[i].min if i in mandatory else 1  # null
+        else:
+            least = 1  # list0
+        most = 9 + sum([size.max for size in fieldSizes])  # list32 size count
+        variableFields = [field.name for field, size in zip(type.fields, fieldSizes) if size.variable]
+        return EncodedSize(least, most, len(variableFields) > 0, variableFields)
+
+    for type in model.typesAll.values():
+        type_size(type.name)
+
+
+#
+# Search index for the search box. Entries are the grand index rows as
+# plain text in grand index order:
+#     [name, category, parent type, section, anchor, number of referrers]
+# Keys are the sorted lower case names plus every word of the names
+# split at '-', ':' and '_'. postings[i] lists the entries for keys[i].
+# A prefix query is a binary search into keys.
+def compute_search_index(model):
+    entries = []
+    for idx in model.grandIndex.sortedNames():
+        for section in model.typeIndex[idx] if idx in model.typeIndex else []:
+            if section == "PROVIDED":
+                anchor = "PROVIDEDTYPE_%s" % idx
+                xref = "%s,PROVIDED" % idx
+            else:
+                anchor = "TYPE_%s" % idx
+                xref = idx
+            nrefs = len(model.xrefIndex[xref]) if xref in model.xrefIndex else 0
+            entries.append([idx, "type", "", section, anchor, nrefs])
+        for psect, ptype in model.fieldIndex[idx] if idx in model.fieldIndex else []:
+            entries.append([idx, "field", ptype, psect, "FIELD_%s_%s" % (ptype, idx), 0])
+        for psect, ptype in model.enumIndex[idx] if idx in model.enumIndex else []:
+            entries.append([idx, "enum value", ptype, psect, "TYPE_%s" % ptype, 0])
+
+    postings = {}
+    for i in range(len(entries)):
+        name = entries[i][0].lower()
+        words = set(name.replace(":", "-").replace("_", "-").split("-"))
+        words.add(name)
+        for word in words:
+            if word:
+                ids = postings.setdefault(word, [])
+                if not ids or ids[-1] != i:
+                    ids.append(i)
+    keys = sorted(postings.keys())
+    model.searchIndex = {"entries": entries, "keys": keys, "postings": [postings[k] for k in keys]}
+
+
+#
+#
+def print_xref_index(model, out):
+    out.append("<a name=\"XrefIndex3\"></a>")
+    out.append("<h3>Cross Reference Index</h3>")
+    out.append("<a href=\"javascript:toggle_node('%s')\"> %s </a>%sType Cross Reference<br>" % ("XrefIndex", lozenge(), nbsp()))
+    out.append("<div width=\"100%%\" style=\"display:block\"  margin-bottom:\"2px\" id=\"XrefIndex\" class=\"toggle-section\">")
+    out.append("<table>")
+    out.append("<tr>")
+    out.append(" <th>Referenced Type</th>")
+    out.append(" <th>Referrer</th>")
+    out.append(" <th>Section</th>")
+    out.append(" <th>Type</th>")
+    out.append("</tr>")
+    for idx in model.xrefIndex.sortedNames():
         if ":" not in idx:
             try:
                 idxlist = idx.split(',')
@@ -1096,82 +1981,520 @@ def print_xref_index():
                         typetext = "spec:wildcard"
                         typename = "*"
                     else:
-                        type = typesAll[idx]
-                        typetext = type.text
+                        type = model.typesAll[idx]
+                        typetext = type.section
                         typename = idxlist[0]
                 else:
                     typetext = "provided"
                     typename = "<a href=\"#PROVIDEDTYPE_%s\"> %s </a>" % (idxlist[0], idxlist[0])
-                refs = xrefIndex[idx]
+                refs = model.xrefIndex[idx]
                 if len(refs) == 0:
-                    print("<tr>")
-                    print(" <td>%s:<strong>%s</strong></td>" % (typetext, typename))
-                    print(" <td>%s</td>" % nbsp())
-                    print(" <td>%s</td>" % nbsp())
-                    print(" <td>%s</td>" % nbsp())
-                    print("</tr>")
+                    out.append("<tr>")
+                    out.append(" <td>%s:<strong>%s</strong></td>" % (typetext, typename))
+                    out.append(" <td>%s</td>" % nbsp())
+                    out.append(" <td>%s</td>" % nbsp())
+                    out.append(" <td>%s</td>" % nbsp())
+                    out.append("</tr>")
                 for ref in refs:
-                    print("<tr>")
-                    print(" <td>%s:<strong>%s</strong></td>" % (typetext, typename))
-                    print(" <td>%s</td>" % ref[0])
-                    print(" <td>%s</td>" % ref[2])
-                    print(" <td>%s</td>" % ref[1])
-                    print("</tr>")
+                    out.append("<tr>\n <td>%s:<strong>%s</strong></td>\n <td>%s</td>\n <td>%s</td>\n <td>%s</td>\n</tr>" %
+                               (typetext, typename, ref[0], ref[2], ref[1]))
                     stats.nIndexedXrefs += 1
             except:
                 #log("Can't resolve as type: %s" % idx) # constants can't be resolved
                 pass
-    print("</table>")
-    print("</div>")
-    print("<br>")
+    out.append("</table>")
+    out.append("</div>")
+    out.append("<br>")
+
+
+#
+#
+def print_search_box(out):
+    out.append("<strong>Search:</strong>%s<input type=\"text\" id=\"SearchText\" size=\"40\" autocomplete=\"off\" "
+               "oninput=\"search_run(this.value)\" onkeyup=\"search_run(this.value)\"><br>" % nbsp())
+    out.append("<div id=\"SearchResults\" style=\"display:none\"></div>")
+    out.append("<hr>")
 
+#
+# The index is inert json, parsed on the first search. A split page
+# loads it as a fragment of its own then.
+def print_search_index(model, out):
+    import json
+    text = json.dumps(model.searchIndex, separators=(",", ":"), sort_keys=True)
+    out.append("<script type=\"application/json\" id=\"SearchIndexData\">%s</script>" % text.replace("</", "<\\/"))
+
+def print_search_script(out):
+    out.append("<script type=\"text/javascript\">")
+    out.append('''var search_index = null;
+var search_limit = 50;
+var search_last = null;
+
+// Parse the index, loading it first in a split page. then() is called
+// once it is there, or not at all if it could not be loaded.
+function search_load(then)
+{
+  var data = document.getElementById('SearchIndexData');
+  if(data) {
+    search_index = JSON.parse(data.textContent || data.text);
+    then();
+  } else if(window.load_fragment) {
+    load_fragment('searchindex', function() {
+      if(document.getElementById('SearchIndexData'))
+        search_load(then);
+      else
+        document.getElementById('SearchResults').innerHTML = 'The search index did not load.<br>';
+    });
+  }
+}
+
+// index of the first key not less than text
+function search_lower_bound(keys, text)
+{
+  var lo = 0, hi = keys.length;
+  while(lo < hi) {
+    var mid = (lo + hi) >> 1;
+    if(keys[mid] < text) lo = mid + 1; else hi = mid;
+  }
+  return lo;
+}
+
+function search_escape(text)
+{
+  return String(text).replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;');
+}
+
+function search_run(text)
+{
+  var query = text.toLowerCase().replace(/^\\s+|\\s+$/g, '');
+  if(query == search_last) return;
+  search_last = query;
+  var results = document.getElementById('SearchResults');
+  if(!query) {
+    results.style.display = 'none';
+    return;
+  }
+  if(!search_index) {
+    search_last = null;
+    results.innerHTML = 'Loading the search index...<br>';
+    results.style.display = 'block';
+    search_load(function() { search_run(document.getElementById('SearchText').value); });
+    return;
+  }
+  var keys = search_index.keys, postings = search_index.postings, entries = search_index.entries;
+  var seen = {}, hits = [];
+  for(var i = search_lower_bound(keys, query); i < keys.length && keys[i].lastIndexOf(query, 0) == 0; i++) {
+    var ids = postings[i];
+    for(var j = 0; j < ids.length; j++) {
+      if(!seen[ids[j]]) {
+        seen[ids[j]] = true;
+        hits.push(ids[j]);
+      }
+    }
+  }
+  // names starting with the query first, then grand index order
+  hits.sort(function(a, b) {
+    var ra = entries[a][0].toLowerCase().lastIndexOf(query, 0) == 0 ? 0 : 1;
+    var rb = entries[b][0].toLowerCase().lastIndexOf(query, 0) == 0 ? 0 : 1;
+    return (ra - rb) || (a - b);
+  });
+  var html = [];
+  for(var i = 0; i < hits.length && i < search_limit; i++) {
+    var e = entries[hits[i]];
+    var line = '<a href="#' + e[4] + '" onclick="return search_go(\\'' + e[4] + '\\')">' + search_escape(e[0]) + '</a> ' +
+               search_escape(e[1]);
+    if(e[2]) line += ' of ' + search_escape(e[2]);
+    line += ' - ' + search_escape(e[3]);
+    if(e[5]) line += ' (' + e[5] + ' referrers)';
+    html.push(line);
+  }
+  if(hits.length > search_limit)
+    html.push('... ' + (hits.length - search_limit) + ' more');
+  if(!hits.length)
+    html.push('no match');
+  results.innerHTML = html.join('<br>') + '<br>';
+  results.style.display = 'block';
+}
+
+function search_find(anchor)
+{
+  return document.getElementById(anchor) || document.getElementsByName(anchor)[0];
+}
+
+// Expand the tables holding the anchor and scroll to it
+function search_reveal(anchor)
+{
+  var target = search_find(anchor);
+  if(!target) return;
+  for(var node = target.parentNode; node && node.style; node = node.parentNode) {
+    if(node_is_hidden(node))
+      show_node(node);
+  }
+  window.location.hash = anchor;
+  target.scrollIntoView();
+}
+
+function search_go(anchor)
+{
+  if(!search_find(anchor) && window.load_all_fragments)
+    load_all_fragments(function() { search_reveal(anchor); });
+  else
+    search_reveal(anchor);
+  return false;
+}
+</script>''')
+
+#
+#
+def dependency_ref(name):
+    if name.endswith(",PROVIDED"):
+        return noNoneProvideRef(name.split(",")[0])
+    return noNoneTypeRef(name)
+
+def print_dependency_index(model, out):
+    graph = model.typeGraph
+    out.append("<a name=\"DependencyIndex\"></a>")
+    out.append("<h3>Type Dependency Index</h3>")
+    out.append("<a href=\"javascript:toggle_node('%s')\"> %s </a>%sType Dependencies<br>" % ("DepIndex", lozenge(), nbsp()))
+    out.append("<div width=\"100%%\" style=\"display:block\"  margin-bottom:\"2px\" id=\"DepIndex\" class=\"toggle-section\">")
+    out.append("<table>")
+    out.append("<tr>")
+    out.append(" <th>Type</th>")
+    out.append(" <th>Depends on, directly and transitively</th>")
+    out.append(" <th>Depended on by, directly and transitively</th>")
+    out.append("</tr>")
+    for name in graph.names():
+        depends = graph.dependencies(name)
+        dependents = graph.dependents(name)
+        if not depends and not dependents:
+            continue
+        out.append("<tr>\n <td><strong>%s</strong></td>\n <td>%s</td>\n <td>%s</td>\n</tr>" %
+                   (dependency_ref(name), " ".join([dependency_ref(n) for n in depends]),
+                    " ".join([dependency_ref(n) for n in dependents])))
+        stats.nIndexedDependencies += 1
+    out.append("</table>")
+    out.append("</div>")
+    out.append("<br>")
+
+
+#
+#
+def print_end_body(out):
+    out.append("</body>")
+    out.append("</html>")
+
+#
+# Split page mode. These sections are written as fragments that the
+# page loads when their toggle is first opened. Each entry is the
+# section name, the table of contents anchors in the section and the
+# caption of its placeholder toggle.
+SPLIT_SECTIONS = [
+    ("constants",  ["Constants"],                   "Constants"),
+    ("primitive",  ["Types", "PrimitiveTypes"],     "Primitive Types"),
+    ("enumerated", ["EnumeratedTypes"],             "Enumerated Types"),
+    ("restricted", ["RestrictedTypes"],             "Restricted Types"),
+    ("described",  ["DescribedTypes"],              "Described Types"),
+    ("provided",   ["ProvidedTypes"],               "Provided Types"),
+    ("sizes",      ["EncodedSizes"],                "Encoded Sizes"),
+    ("diagrams",   ["Diagrams"],                    "Diagrams"),
+    ("typeindex",  ["Indices", "TypeIndex"],        "Type Index"),
+    ("fieldindex", ["FieldIndex"],                  "Field Index"),
+    ("enumindex",  ["EnumerationIndex"],            "Enumeration Index"),
+    ("grandindex", ["GrandIndex"],                  "Grand Index"),
+    ("xrefindex",  ["XrefIndex3"],                  "Type Cross Reference"),
+    ("depindex",   ["DependencyIndex"],             "Type Dependencies"),
+    ("searchindex", [],                             None),  # loaded by the first search
+]
+
+def print_fragment_placeholder(out, name, anchors, caption):
+    out.append("<div id=\"frag_%s\">" % name)
+    for anchor in anchors:
+        out.append("<a name=\"%s\"></a>" % anchor)
+    if caption is not None:
+        out.append("<a href=\"javascript:load_fragment('%s')\"> %s </a>%s%s<br>" % (name, lozenge(), nbsp(), caption))
+    out.append("</div>")
+
+def print_fragment_loader(out):
+    out.append("<script type=\"text/javascript\">")
+    out.append("var fragment_names = [%s];" % ", ".join(["'%s'" % name for name, anchors, caption in SPLIT_SECTIONS]))
+    out.append('''
+// Replace the placeholder for fragment 'name' with the fragment itself.
+// then() is called once the fetch is over, whether it worked or not.
+// Calls made while the fetch is in flight wait for it too. A fetch
+// that fails leaves an error in the placeholder; browsers refuse to
+// fetch from a page opened from disk, so the page must be served.
+function load_fragment(name, then)
+{
+  var holder = document.getElementById('frag_' + name);
+  if(!holder) {
+    if(then) then();
+    return;
+  }
+  holder.callbacks = holder.callbacks || [];
+  if(then) holder.callbacks.push(then);
+  if(holder.loading)
+    return;
+  holder.loading = true;
+  var req = new XMLHttpRequest();
+  var done = function() {
+    holder.loading = false;
+    var callbacks = holder.callbacks;
+    holder.callbacks = [];
+    for(var i = 0; i < callbacks.length; i++)
+      callbacks[i]();
+  };
+  var failed = function(why) {
+    var error = document.getElementById('frag_error_' + name);
+    if(!error) {
+      error = document.createElement('div');
+      error.id = 'frag_error_' + name;
+      error.style.color = 'red';
+      holder.appendChild(error);
+    }
+    error.innerHTML = 'Could not load ' + name + '.html: ' + why + '. ' +
+      (location.protocol == 'file:' ? 'Browsers do not load it into a page opened from disk. ' : '') +
+      'Serve it over http: run python -m http.server in its directory, or use spec_serve.py.';
+    done();
+  };
+  req.onload = function() {
+    if(req.status < 200 || req.status >= 300) {
+      failed('status ' + req.status);
+      return;
+    }
+    var div = document.createElement('div');
+    div.innerHTML = req.responseText;
+    holder.parentNode.replaceChild(div, holder);
+    done();
+  };
+  req.onerror = function() { failed('the request failed'); };
+  req.open('GET', name + '.html');
+  req.send();
+}
+
+function load_all_fragments(then)
+{
+  var pending = fragment_names.length;
+  for(var i = 0; i < fragment_names.length; i++) {
+    load_fragment(fragment_names[i], function() {
+      pending -= 1;
+      if(pending == 0 && then) then();
+    });
+  }
+}
+
+// Expanding everything needs every fragment
+var show_loaded_tables = show_all_tables;
+show_all_tables = function() { load_all_fragments(show_loaded_tables); };
+
+// A link to something in a fragment that is not loaded yet loads them all
+function jump_to_hash()
+{
+  var name = window.location.hash.substring(1);
+  if(!name || document.getElementById(name) || document.getElementsByName(name).length)
+    return;
+  load_all_fragments(function() {
+    var node = document.getElementById(name) || document.getElementsByName(name)[0];
+    if(node) node.scrollIntoView();
+  });
+}
+window.onhashchange = jump_to_hash;
+jump_to_hash();
+</script>''')
+
+#
+# The page sections in page order: (section name, phase name, renderer).
+# Each renderer is called as renderer(model, out, classToggles). The
+# sections in SEARCH_SECTIONS are left out with the search box.
+PAGE_SECTIONS = [
+    ("leading",     "print_fixed_leading",     lambda model, out, classToggles: print_fixed_leading(out, classToggles)),
+    ("start",       "print_start_body",        print_start_body),
+    ("title",       None,                      lambda model, out, classToggles:
+                        out.append("<h1>AMQP 1.0 - Interactive Protocol Type Reference</h1>")),
+    ("toc",         "print_toc",               lambda model, out, classToggles: print_toc(out)),
+    ("search",      "print_search_box",        lambda model, out, classToggles: print_search_box(out)),
+    ("constants",   "print_constants",         lambda model, out, classToggles: print_constants(model, out)),
+    ("primitive",   "print_primitive_types",   lambda model, out, classToggles: print_primitive_types(model, out)),
+    ("enumerated",  "print_enumerated_types",  lambda model, out, classToggles: print_enumerated_types(model, out)),
+    ("restricted",  "print_restricted_types",  lambda model, out, classToggles: print_restricted_types(model, out)),
+    ("described",   "print_described_types",   lambda model, out, classToggles: print_described_types(model, out)),
+    ("provided",    "print_provided_types",    lambda model, out, classToggles: print_provided_types(model, out)),
+    ("sizes",       "print_encoded_sizes",     lambda model, out, classToggles: print_encoded_sizes(model, out)),
+    ("diagrams",    "print_asciiart",          lambda model, out, classToggles: print_asciiart(model, out)),
+    ("typeindex",   "print_type_index",        lambda model, out, classToggles: print_type_index(model, out)),
+    ("fieldindex",  "print_field_index",       lambda model, out, classToggles: print_field_index(model, out)),
+    ("enumindex",   "print_enumeration_index", lambda model, out, classToggles: print_enumeration_index(model, out)),
+    ("grandindex",  "print_grand_index",       lambda model, out, classToggles: print_grand_index(model, out)),
+    ("xrefindex",   "print_xref_index",        lambda model, out, classToggles: print_xref_index(model, out)),
+    ("depindex",    "print_dependency_index",  lambda model, out, classToggles: print_dependency_index(model, out)),
+    ("searchindex", "print_search_index",      lambda model, out, classToggles: print_search_index(model, out)),
+    ("searchscript", None,                     lambda model, out, classToggles: print_search_script(out)),
+    ("end",         "print_end_body",          lambda model, out, classToggles: print_end_body(out)),
+]
+SEARCH_SECTIONS = ["search", "searchindex", "searchscript"]
+
+#
+# Render the page, one PageWriter section per renderer. With only, a
+# list of section names, the other sections are not rendered and stay
+# empty.
+def render_page(model, search=True, classToggles=False, only=None):
+    page = PageWriter()
+    for name, phase, renderer in PAGE_SECTIONS:
+        if not search and name in SEARCH_SECTIONS:
+            continue
+        out = page.section(name)
+        if only is not None and name not in only:
+            continue
+        if phase is None:
+            renderer(model, out, classToggles)
+        else:
+            with stats.phase(phase):
+                renderer(model, out, classToggles)
+    return page
+
+#
+# Write the page to output or, in split mode, to the split directory
+def write_page(page, output=None, split=None, changedOnly=False):
+    if split is None:
+        return page.write(output, changedOnly)
+    placeholders, loader = split_parts()
+    return page.writeSplit(split, placeholders, loader, changedOnly)
 
 #
+# The lines that stand in for the split sections in the split page's
+# index.html, and the script that loads them
+def split_parts():
+    placeholders = {}
+    for name, anchors, caption in SPLIT_SECTIONS:
+        placeholders[name] = []
+        print_fragment_placeholder(placeholders[name], name, anchors, caption)
+    loader = []
+    print_fragment_loader(loader)
+    return placeholders, loader
+
 #
-def print_end_body():
-    print ("</body>")
-    print ("</html>")
+# Watch mode. The spec files are polled for changes. A changed file is
+# re-parsed into a new XmlStore and the stores of the other files are
+# kept. The model is merged from the stores and recomputed, which takes
+# a few milliseconds, and the page is rendered again. Only the output
+# files whose text changed are rewritten.
+def spec_file_states(specdir=SPEC_DIR):
+    ''' map[spec file name] = (mtime, size), or None while the file is missing'''
+    states = {}
+    for filename in SPEC_FILES:
+        try:
+            st = os.stat(os.path.join(specdir, filename))
+            states[filename] = (st.st_mtime, st.st_size)
+        except OSError:
+            states[filename] = None
+    return states
+
+def watch(args):
+    states = spec_file_states(args.spec_dir)
+    stores = dict(zip(SPEC_FILES, parse_stores(args.spec_dir, args.jobs)))
+    start = wall_clock()
+    changed = ["start"]
+    while True:
+        stats.reset()
+        model = merge_stores([stores[filename] for filename in SPEC_FILES])
+        page = render_page(model, not args.no_search, args.class_toggles)
+        written = write_page(page, args.output, args.split, True)
+        log("%s: wrote %s in %.0f ms" %
+            (", ".join(changed), ", ".join([os.path.basename(w) for w in written]) or "nothing",
+             (wall_clock() - start) * 1000))
+        changed = []
+        while not changed:
+            time.sleep(args.interval)
+            now = spec_file_states(args.spec_dir)
+            changed = [filename for filename in SPEC_FILES if now[filename] != states[filename]]
+            states = now
+        start = wall_clock()
+        for filename in changed:
+            if states[filename] is None:
+                continue  # being replaced. Keep the last good store.
+            try:
+                stores[filename] = XmlStore(filename, args.spec_dir)
+            except Exception as e:
+                log("Keeping the last good %s: %s: %s" % (filename, type(e).__name__, e))
 
 #
 #
 def main_except(argv):
+    import argparse
+    parser = argparse.ArgumentParser(description="Render the AMQP 1.0 spec xml as a cross referenced web page.")
+    parser.add_argument("-o", "--output", default=None,
+                        help="write the page to this file instead of stdout")
+    parser.add_argument("--split", metavar="DIR", default=None,
+                        help="write a small index.html plus one fragment file per section to DIR. "
+                             "The fragments load when their toggle is opened, which browsers only do "
+                             "when DIR is served over http, say by python -m http.server.")
+    parser.add_argument("--class-toggles", action="store_true",
+                        help="expand and collapse all tables by css class and do not load dojo from the network")
+    parser.add_argument("--no-search", action="store_true",
+                        help="leave the search box and its index out of the page")
+    parser.add_argument("--profile", metavar="FILE", default=None,
+                        help="write the wall time, cpu time and memory of each phase as json to FILE, "
+                             "- for stdout when the page goes to --output or --split")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="with --profile, also measure each phase's python allocations (slower)")
+    parser.add_argument("--spec-dir", default=SPEC_DIR,
+                        help="directory holding the spec xml files [%(default)s]")
+    parser.add_argument("--cache-dir", default=CACHE_DIR,
+                        help="directory for the cached spec model [%(default)s]")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="parse the spec files in this many processes, 0 for one per cpu [%(default)s]")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="build the spec model from the xml and do not use the cache")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and regenerate the page whenever a spec file changes. "
+                             "Needs --output or --split.")
+    parser.add_argument("--interval", type=float, default=0.2,
+                        help="with --watch, seconds between checks of the spec files [%(default)s]")
+    args = parser.parse_args(argv[1:])
+
+    if args.profile == "-" and args.split is None and args.output in [None, "-"]:
+        parser.error("--profile - needs --output or --split, the page is written to stdout")
+
+    if args.watch:
+        if args.split is None and args.output in [None, "-"]:
+            parser.error("--watch needs --output or --split")
+        try:
+            watch(args)
+        except KeyboardInterrupt:
+            pass
+        return
+
+    stats.reset()
+    if args.profile is not None and args.trace_memory and not stats.tracing:
+        if not stats.startTracing():
+            log("This python can't trace memory per phase, profiling without it")
+
     # Compute tables and stuff that may be needed by show/hide functions
-    compute_primitive_types()
-    compute_described_types()
-    compute_enumerated_types()
-    
-    # Print the web page
-    print_fixed_leading()
-    print_start_body()
-
-    print("<h1>AMQP 1.0 - Interactive Protocol Type Reference</h1>")
-
-    print_toc()
-    print_constants()
-    print_primitive_types()
-    print_enumerated_types()
-    print_restricted_types()
-    print_described_types()
-    print_provided_types()
-    print_asciiart()
-    print_type_index()
-    print_field_index()
-    print_enumeration_index()
-    print_grand_index()
-    print_xref_index()
-    print_end_body()
-
-    stats.statCheck("nConstants", 13)
-    stats.statCheck("nPrimitiveEncodings", 39)
-    stats.statCheck("nEnumeratedTypes", 13)
-    stats.statCheck("nRestrictedTypes", 19)
-    stats.statCheck("nDescribedTypes", 40)
-    stats.statCheck("nProvidedTypes", 14)
-    stats.statCheck("nIndexedTypes", 162)
-    stats.statCheck("nIndexedFields", 125)
-    stats.statCheck("nIndexedEnumerations", 54)
-    stats.statCheck("nIndexedGrand", 341)
-    stats.statCheck("nIndexedXrefs", 252)
+    with stats.phase("load_model"):
+        model = load_model(args.spec_dir, None if args.no_cache else args.cache_dir, args.jobs)
+
+    # Render the web page
+    with stats.phase("render_page"):
+        page = render_page(model, not args.no_search, args.class_toggles)
+    with stats.phase("write"):
+        write_page(page, args.output, args.split)
+
+    # The expected counts are those of the stock spec
+    if os.path.abspath(args.spec_dir) == SPEC_DIR:
+        stats.statCheck("nConstants", 13)
+        stats.statCheck("nPrimitiveEncodings", 39)
+        stats.statCheck("nEnumeratedTypes", 13)
+        stats.statCheck("nRestrictedTypes", 19)
+        stats.statCheck("nDescribedTypes", 40)
+        stats.statCheck("nProvidedTypes", 14)
+        stats.statCheck("nIndexedTypes", 162)
+        stats.statCheck("nIndexedFields", 125)
+        stats.statCheck("nIndexedEnumerations", 54)
+        stats.statCheck("nIndexedGrand", 341)
+        stats.statCheck("nIndexedXrefs", 252)
+        stats.statCheck("nIndexedDependencies", 100)
+        stats.statCheck("nEncodedSizes", 40)
+
+    if args.profile is not None:
+        stats.writeProfile(args.profile)
 
 #
 #
@@ -1179,11 +2502,14 @@ def main(argv):
     try:
         main_except(argv)
         return 0
-    except ExitStatus, e:
+    except ExitStatus as e:
         return e.status
-    except Exception, e:
+    except Exception as e:
         print("%s: %s"%(type(e).__name__, e))
         return 1
 
 if __name__ == "__main__":
-    sys.exit(main(sys.argv))
+    # Run from the module imported by name so that classes in the cached
+    # model pickle as webpage.* whether this file is a script or a library.
+    import webpage
+    sys.exit(webpage.main(sys.argv))
@@ -2,8 +2,17 @@
 #include <string.h>
 #include <ctype.h>
 
+#ifdef NO_DATA_C
+// Map the stream from a rewrite-bytes.py --bin file named on the
+// command line instead of compiling it in.
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+#else
 #define ARRAY_NAME rewrite_bytes
 #include "data.c"
+#endif
 
 // Return the big-endian int32 pointed to by *pptr.
 int get_long(char *buf, int offset)
@@ -56,7 +65,30 @@ void print_bytes(char *ptr, int n_bytes)
 
 int main(int argc, char** argv)
 {
+#ifdef NO_DATA_C
+    if (argc != 2) {
+        printf("usage: %s file.bin\n", argv[0]);
+        return 1;
+    }
+    int fd = open(argv[1], O_RDONLY);
+    struct stat st;
+    if (fd < 0 || fstat(fd, &st) < 0) {
+        printf("Can't open %s\n", argv[1]);
+        return 1;
+    }
+    size_t n_bytes = st.st_size;
+    char * stream_bytes = "";
+    if (n_bytes > 0) {
+        stream_bytes = mmap(NULL, n_bytes, PROT_READ, MAP_PRIVATE, fd, 0);
+        if (stream_bytes == MAP_FAILED) {
+            printf("Can't map %s\n", argv[1]);
+            return 1;
+        }
+    }
+#else
     size_t n_bytes = sizeof(ARRAY_NAME);
+    char * stream_bytes = ARRAY_NAME;
+#endif
     //printf("Array ARRAY_NAME is %d bytes\n", n_bytes);
 
 #ifdef WRITE_FILES
@@ -69,18 +101,18 @@ int main(int argc, char** argv)
         printf("Can't open file\n");
         return 1;
     }
-    fwrite(ARRAY_NAME, n_bytes, 1, fptr);
+    fwrite(stream_bytes, n_bytes, 1, fptr);
     fclose(fptr);
 #endif
     
     int expected_seq = 0;
-    char * ptr = ARRAY_NAME;
+    char * ptr = stream_bytes;
     char * pend = ptr + n_bytes;
     int offset = 0;
     while (ptr < pend) {
-        int transfer_size = get_long(ARRAY_NAME, offset);
+        int transfer_size = get_long(stream_bytes, offset);
 #ifdef CHECK_SEQ
-        int seq_no = get_long(ARRAY_NAME, offset + 23);
+        int seq_no = get_long(stream_bytes, offset + 23);
         if (expected_seq == 0) {
             expected_seq = seq_no + 1;
         } else {
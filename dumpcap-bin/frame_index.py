@@ -0,0 +1,480 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Walk the AMQP frames of a stream file written by rewrite-bytes.py
+# --bin or pcap_streams.py, keeping an index of them next to it:
+#
+#    python frame_index.py data.bin                      summary
+#    python frame_index.py data.bin --list               every frame
+#    python frame_index.py data.bin --frame N [--count C]
+#    python frame_index.py data.bin --offset 1318015     the frame holding an offset
+#    python frame_index.py data.bin --range FROM TO      frames starting in [FROM, TO)
+#
+# --dump prints the bytes of each frame listed, as stream_file.py does.
+#
+# The stream need not start on a frame. The walk starts with a sync
+# that skips the "AMQP" protocol headers and the SASL frames that follow
+# a SASL header, then, if the bytes there are not frames (the capture
+# began after the connection opened, or the export was cut), scans for
+# the first offset where CHAIN_FRAMES frames that look right follow one
+# another. A frame looks right when its size is at least 8 and at most
+# MAX_FRAME_SIZE, its doff at least 2 and within the frame, and it is
+# an empty AMQP frame or holds a performative (SASL frame: a SASL frame
+# body). Candidates are the frames ahead of each 0x00 0x53 (a smallulong
+# descriptor, as proton writes them) and the empty frames, found with
+# mmap.find() so the scan runs at memory speed. --start OFFSET
+# turns the sync off and walks from OFFSET.
+#
+# The first run walks the frames and writes data.bin.idx. Later runs map
+# the index instead, so frame N is one read and an offset is a binary
+# search. The index is walked again when the stream file's size or time
+# stamp no longer match the ones recorded in it, or with --rebuild.
+#
+# The index file is a header followed by one fixed size record per
+# frame, all big-endian:
+#
+#   header  magic "AMQPFIDX", version, record size, synced (1 if the
+#           first frame was found by the sync, 0 if given), stream size,
+#           stream mtime (microseconds), first frame offset, end offset
+#   record  offset (8), size (4), doff (1), type (1), channel (2),
+#           descriptor code (8)
+#
+# end offset is where the walk stopped: the stream size unless the last
+# frame is cut short or a frame size makes no sense. The summary then
+# tells where the next frames that look right start. The descriptor code
+# is that of the performative, or of the SASL frame body. Symbolic
+# descriptors are recorded as their code. NO_DESCRIPTOR marks frames
+# with no body (heartbeats) or a body that doesn't start with one.
+
+from __future__ import unicode_literals
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+
+import mmap
+import os
+import struct
+import sys
+import traceback
+
+from stream_file import StreamFile, dump_lines
+
+INDEX_MAGIC = b"AMQPFIDX"
+INDEX_VERSION = 2
+HEADER = struct.Struct(">8sIIIQQQQ")
+RECORD = struct.Struct(">QIBBHQ")
+FRAME_HEADER = struct.Struct(">IBBH")
+
+FRAME_TYPE_AMQP = 0
+FRAME_TYPE_SASL = 1
+FRAME_TYPES = {FRAME_TYPE_AMQP: "amqp", FRAME_TYPE_SASL: "sasl"}
+
+NO_DESCRIPTOR = 0xffffffffffffffff
+
+DESCRIPTORS = {
+    0x10: "open",
+    0x11: "begin",
+    0x12: "attach",
+    0x13: "flow",
+    0x14: "transfer",
+    0x15: "disposition",
+    0x16: "detach",
+    0x17: "end",
+    0x18: "close",
+    0x40: "sasl-mechanisms",
+    0x41: "sasl-init",
+    0x42: "sasl-challenge",
+    0x43: "sasl-response",
+    0x44: "sasl-outcome",
+}
+SYMBOLIC_DESCRIPTORS = dict([(("amqp:%s:list" % name).encode("ascii"), code)
+                             for code, name in DESCRIPTORS.items()])
+
+# records written to the index file at a time
+WRITE_RECORDS = 4096
+
+PROTOCOL_HEADER = b"AMQP"
+PROTOCOL_IDS = {0: "AMQP", 2: "TLS", 3: "SASL"}
+PROTOCOL_ID_SASL = 3
+
+# the sync's idea of a frame that looks right
+MAX_FRAME_SIZE = 64 << 20
+MAX_DOFF = 8
+CHAIN_FRAMES = 4
+PERFORMATIVE_CODES = {FRAME_TYPE_AMQP: (0x10, 0x18), FRAME_TYPE_SASL: (0x40, 0x44)}
+SMALLULONG_DESCRIPTOR = b"\x00\x53"
+EMPTY_FRAME = FRAME_HEADER.pack(8, 2, FRAME_TYPE_AMQP, 0)[:6]
+
+
+class Frame(object):
+    """One index record."""
+    __slots__ = ("offset", "size", "doff", "type", "channel", "descriptor")
+
+    def __init__(self, offset, size, doff, type, channel, descriptor):
+        self.offset = offset
+        self.size = size
+        self.doff = doff
+        self.type = type
+        self.channel = channel
+        self.descriptor = descriptor
+
+    def end(self):
+        return self.offset + self.size
+
+    def body(self):
+        """The offset of the frame body."""
+        return self.offset + 4 * self.doff
+
+    def name(self):
+        if self.descriptor == NO_DESCRIPTOR:
+            return "empty" if self.size == 4 * self.doff else "-"
+        return DESCRIPTORS.get(self.descriptor, "0x%x" % self.descriptor)
+
+
+def descriptor_code(data, offset, end):
+    """Return the descriptor code of the described type at offset, or NO_DESCRIPTOR."""
+    if offset + 2 > end or data[offset:offset + 1] != b"\x00":
+        return NO_DESCRIPTOR
+    constructor = bytearray(data[offset + 1:offset + 2])[0]
+    if constructor == 0x53 and offset + 3 <= end:
+        return bytearray(data[offset + 2:offset + 3])[0]
+    if constructor == 0x80 and offset + 10 <= end:
+        return struct.unpack_from(">Q", data, offset + 2)[0]
+    if constructor == 0x44:
+        return 0
+    if constructor == 0xa3 and offset + 3 <= end:
+        length = bytearray(data[offset + 2:offset + 3])[0]
+        return SYMBOLIC_DESCRIPTORS.get(data[offset + 3:offset + 3 + length], NO_DESCRIPTOR)
+    if constructor == 0xb3 and offset + 6 <= end:
+        length = struct.unpack_from(">I", data, offset + 2)[0]
+        return SYMBOLIC_DESCRIPTORS.get(data[offset + 6:offset + 6 + length], NO_DESCRIPTOR)
+    return NO_DESCRIPTOR
+
+
+def walk_frames(data, offset=0):
+    """Yield a Frame for each frame from offset on.
+
+    The walk stops at the end of the data, at a frame that is cut short
+    or at a frame header that can't be right: a size smaller than the
+    header or a doff smaller than 2 or past the end of the frame.
+    """
+    data_size = len(data)
+    while offset + 8 <= data_size:
+        size, doff, type, channel = FRAME_HEADER.unpack_from(data, offset)
+        if size < 8 or doff < 2 or 4 * doff > size or offset + size > data_size:
+            return
+        end = offset + size
+        yield Frame(offset, size, doff, type, channel, descriptor_code(data, offset + 4 * doff, end))
+        offset = end
+
+
+def plausible_frame(data, offset):
+    """Return the size of the frame at offset if it looks right, else 0."""
+    if offset < 0 or offset + 8 > len(data):
+        return 0
+    size, doff, type, channel = FRAME_HEADER.unpack_from(data, offset)
+    if size < 8 or size > MAX_FRAME_SIZE or doff < 2 or 4 * doff > size or type not in PERFORMATIVE_CODES:
+        return 0
+    if size == 4 * doff:
+        return size if type == FRAME_TYPE_AMQP else 0
+    body = offset + 4 * doff
+    end = min(offset + size, len(data))
+    low, high = PERFORMATIVE_CODES[type]
+    return size if low <= descriptor_code(data, body, end) <= high else 0
+
+
+def frame_chain(data, offset, count=CHAIN_FRAMES):
+    """True if count frames that look right start at offset.
+
+    Fewer will do when they run to the end of the data, the last one
+    perhaps cut short.
+    """
+    for n in range(count):
+        if n > 0 and offset >= len(data):
+            return True
+        size = plausible_frame(data, offset)
+        if size == 0:
+            return False
+        offset += size
+    return True
+
+
+def scan_frames(data, offset):
+    """Return the first offset from offset on where a frame_chain starts, or -1.
+
+    Frame headers are looked for a doff's words ahead of each 0x00 0x53
+    found, and at each empty frame found ahead of that.
+    """
+    found = -1
+    hit = data.find(SMALLULONG_DESCRIPTOR, offset)
+    while hit >= 0 and found < 0:
+        for doff in range(2, MAX_DOFF + 1):
+            start = hit - 4 * doff
+            if start >= offset and data[start + 4:start + 5] == bytearray([doff]) and frame_chain(data, start):
+                found = start
+                break
+        hit = data.find(SMALLULONG_DESCRIPTOR, hit + 1)
+    end = len(data) if found < 0 else found
+    empty = data.find(EMPTY_FRAME, offset, end)
+    while empty >= 0:
+        if frame_chain(data, empty):
+            return empty
+        empty = data.find(EMPTY_FRAME, empty + 1, end)
+    return found
+
+
+def sync(data, offset=0):
+    """Return (offset of the first frame or -1, notes on what was skipped)."""
+    notes = []
+    while data[offset:offset + 4] == PROTOCOL_HEADER and offset + 8 <= len(data):
+        protocol_id, major, minor, revision = bytearray(data[offset + 4:offset + 8])
+        notes.append("%s protocol header %d.%d.%d at offset %d" % (
+            PROTOCOL_IDS.get(protocol_id, "unknown"), major, minor, revision, offset))
+        offset += 8
+        if protocol_id == PROTOCOL_ID_SASL:
+            first = offset
+            frames = []
+            for frame in walk_frames(data, offset):
+                if frame.type != FRAME_TYPE_SASL:
+                    break
+                frames.append(frame.name())
+                offset = frame.end()
+            notes.append("SASL exchange at offset %d: %s" % (first, ", ".join(frames) or "no frames"))
+    if frame_chain(data, offset):
+        return offset, notes
+    found = scan_frames(data, offset)
+    if found < 0:
+        notes.append("no frames found after offset %d" % offset)
+    elif found > offset:
+        notes.append("skipped %d bytes at offset %d that are not frames" % (found - offset, offset))
+    return found, notes
+
+
+def stream_state(path):
+    """The stream file's (size, mtime) as recorded in its index."""
+    st = os.stat(path)
+    return st.st_size, int(st.st_mtime * 1000000)
+
+
+def build_index(stream, index_path, start=None):
+    """Walk the frames of a StreamFile and write them to index_path.
+
+    The walk starts at start or, if start is None, where sync() finds
+    the first frame. The index is written to a temporary file that replaces index_path
+    when it is complete, so a reader never maps half an index.
+    """
+    size, mtime = stream_state(stream.path)
+    synced = start is None
+    if synced:
+        start = sync(stream.data)[0]
+        if start < 0:
+            start = len(stream)
+    temp_path = index_path + ".tmp"
+    end = start
+    with open(temp_path, "wb") as f:
+        f.write(HEADER.pack(INDEX_MAGIC, INDEX_VERSION, RECORD.size, synced, size, mtime, start, 0))
+        records = []
+        for frame in walk_frames(stream.data, start):
+            records.append(RECORD.pack(frame.offset, frame.size, frame.doff, frame.type,
+                                       frame.channel, frame.descriptor))
+            if len(records) == WRITE_RECORDS:
+                f.write(b"".join(records))
+                records = []
+            end = frame.end()
+        f.write(b"".join(records))
+        f.seek(0)
+        f.write(HEADER.pack(INDEX_MAGIC, INDEX_VERSION, RECORD.size, synced, size, mtime, start, end))
+    os.rename(temp_path, index_path)
+
+
+class FrameIndex(object):
+    """A read only, memory mapped frame index."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        if os.fstat(self.file.fileno()).st_size < HEADER.size:
+            self.file.close()
+            raise ValueError("%s is not a frame index" % path)
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, record_size, synced, self.stream_size, self.stream_mtime,
+         self.start, self.end) = HEADER.unpack_from(self.data, 0)
+        self.synced = bool(synced)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION or record_size != RECORD.size:
+            self.close()
+            raise ValueError("%s is not a version %d frame index" % (path, INDEX_VERSION))
+        self.count = (len(self.data) - HEADER.size) // RECORD.size
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, n):
+        if n < 0:
+            n += self.count
+        if n < 0 or n >= self.count:
+            raise IndexError("frame %d of %d" % (n, self.count))
+        return Frame(*RECORD.unpack_from(self.data, HEADER.size + n * RECORD.size))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def frame_offset(self, n):
+        return struct.unpack_from(">Q", self.data, HEADER.size + n * RECORD.size)[0]
+
+    def bisect(self, offset):
+        """Return the number of the first frame that starts at or after offset."""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.frame_offset(mid) < offset:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def find(self, offset):
+        """Return the number of the frame holding the stream offset, or None."""
+        n = self.bisect(offset + 1) - 1
+        if n < 0 or offset >= self[n].end():
+            return None
+        return n
+
+    def range(self, first, last):
+        """Return the frame numbers of the frames starting in [first, last)."""
+        return range(self.bisect(first), self.bisect(last))
+
+    def matches(self, stream_path):
+        return stream_state(stream_path) == (self.stream_size, self.stream_mtime)
+
+
+def open_index(stream, index_path=None, rebuild=False, start=None):
+    """Return the FrameIndex of a StreamFile, walking the frames if needed.
+
+    start is as for build_index(). An index built from another start, or
+    synced when start is given, is built again.
+    """
+    if index_path is None:
+        index_path = stream.path + ".idx"
+    if not rebuild and os.path.exists(index_path):
+        try:
+            index = FrameIndex(index_path)
+        except ValueError:
+            index = None
+        if index is not None:
+            if index.matches(stream.path) and (index.synced if start is None else
+                                               not index.synced and index.start == start):
+                return index
+            index.close()
+    build_index(stream, index_path, start)
+    return FrameIndex(index_path)
+
+
+def format_frame(n, frame):
+    return "frame %d offset=%d size=%d doff=%d type=%s channel=%d %s" % (
+        n, frame.offset, frame.size, frame.doff, FRAME_TYPES.get(frame.type, frame.type),
+        frame.channel, frame.name())
+
+
+def format_summary(stream, index):
+    counts = {}
+    for n in range(len(index)):
+        name = index[n].name()
+        counts[name] = counts.get(name, 0) + 1
+    out = ["%s: %d bytes, %d frames from offset %d to %d" % (stream.path, len(stream), len(index),
+                                                             index.start, index.end)]
+    if index.synced:
+        out.extend(["sync: %s" % note for note in sync(stream.data)[1]])
+    if index.end < len(stream):
+        out.append("frames stop at offset %d, %d bytes short of the end" % (index.end, len(stream) - index.end))
+        found = scan_frames(stream.data, index.end + 1)
+        if found >= 0:
+            out.append("frames look right again from offset %d" % found)
+    for name in sorted(counts):
+        out.append("%10d  %s" % (counts[name], name))
+    return "\n".join(out)
+
+
+def main_except(argv):
+    import argparse
+    parser = argparse.ArgumentParser(description="Walk and index the AMQP frames of a stream file.")
+    parser.add_argument("stream", help="stream file written by rewrite-bytes.py --bin or pcap_streams.py")
+    parser.add_argument("--index", default=None,
+                        help="index file [STREAM.idx]")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="walk the frames again even if the index is up to date")
+    parser.add_argument("--start", type=lambda s: int(s, 0), default=None,
+                        help="walk the frames from this offset instead of syncing with the stream")
+    parser.add_argument("--list", action="store_true",
+                        help="list every frame")
+    parser.add_argument("--frame", type=int, default=None,
+                        help="list frame N, counting from 0")
+    parser.add_argument("--count", type=int, default=1,
+                        help="frames to list with --frame [%(default)s]")
+    parser.add_argument("--offset", type=lambda s: int(s, 0), default=None,
+                        help="list the frame holding this stream offset")
+    parser.add_argument("--range", type=lambda s: int(s, 0), nargs=2, metavar=("FROM", "TO"), default=None,
+                        help="list the frames starting at stream offsets FROM up to TO")
+    parser.add_argument("--dump", action="store_true",
+                        help="dump the bytes of each frame listed")
+    args = parser.parse_args(argv[1:])
+
+    with StreamFile(args.stream) as stream:
+        with open_index(stream, args.index, args.rebuild, args.start) as index:
+            if args.list:
+                numbers = range(len(index))
+            elif args.frame is not None:
+                if args.frame < 0:
+                    args.frame += len(index)
+                numbers = range(args.frame, min(args.frame + args.count, len(index)))
+            elif args.offset is not None:
+                n = index.find(args.offset)
+                if n is None:
+                    raise ValueError("no frame holds offset %d" % args.offset)
+                numbers = [n]
+            elif args.range is not None:
+                numbers = index.range(args.range[0], args.range[1])
+            else:
+                print(format_summary(stream, index))
+                return
+            for n in numbers:
+                frame = index[n]
+                print(format_frame(n, frame))
+                if args.dump:
+                    for line in dump_lines(stream.get_bytes(frame.offset, frame.size), frame.offset):
+                        print(line)
+
+
+def main(argv):
+    try:
+        main_except(argv)
+        return 0
+    except Exception:
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
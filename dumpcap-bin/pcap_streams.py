@@ -0,0 +1,504 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Extract the TCP byte streams from a dumpcap capture, no wireshark
+# needed:
+#
+#    python pcap_streams.py file.pcapng                     list the streams
+#    python pcap_streams.py file.pcapng --port 5672 -o dir  write them
+#
+# Each direction of each TCP connection is a stream. With -o each
+# stream's bytes, reassembled in sequence number order, are written to
+# dir/<n>-<source>.<port>-<destination>.<port>.bin, the same flat
+# format as rewrite-bytes.py --bin writes. Read them with stream_file.py
+# or dumpcap-bin-mmap.
+#
+# pcap and pcapng files are read through mmap in one pass. Link types:
+# Ethernet (with VLAN tags), Linux cooked SLL and SLL2 ("dumpcap -i
+# any"), raw IP, BSD null/loopback. IPv4 and IPv6.
+#
+# Retransmitted bytes are dropped. Segments that arrive out of order are
+# held until the bytes ahead of them arrive. Bytes missing from the
+# capture, seen as a hole that is not filled within --window bytes or
+# by the end of the capture, are written as zeros (or, with --gaps skip,
+# left out) and reported. IPv4 fragments are not reassembled; they are
+# counted and skipped. So are pcapng packet blocks that name an interface
+# no interface description block ahead of them describes.
+
+from __future__ import unicode_literals
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+
+import heapq
+import mmap
+import os
+import socket
+import struct
+import sys
+import traceback
+
+# link types
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LOOP = 108
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+LINKTYPE_IPV6 = 229
+LINKTYPE_LINUX_SLL2 = 276
+LINKTYPE_DLT_RAW = (12, 14)  # DLT_RAW as some systems write it
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_IPV6 = 0x86dd
+ETHERTYPE_VLAN = (0x8100, 0x88a8, 0x9100)
+
+# IPv6 extension headers that may come ahead of TCP
+IPV6_EXTENSIONS = (0, 43, 60)
+IPV6_FRAGMENT = 44
+IPV6_AH = 51
+
+PCAPNG_SHB = 0x0A0D0D0A
+PCAPNG_IDB = 1
+PCAPNG_PB = 2
+PCAPNG_SPB = 3
+PCAPNG_EPB = 6
+PCAPNG_BOM = 0x1A2B3C4D
+
+TCP_SYN = 0x02
+
+U16 = struct.Struct(">H")
+TCP_HEADER = struct.Struct(">HHIIBB")   # ports, seq, ack, data offset, flags
+
+
+class CaptureError(Exception):
+    pass
+
+
+class Capture(object):
+    """A pcap or pcapng file, memory mapped."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        if os.fstat(self.file.fileno()).st_size < 24:
+            self.file.close()
+            raise CaptureError("%s is too short to be a capture" % path)
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.linktypes = set()
+        self.unknownInterfaces = 0  # packet blocks naming no interface described so far
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def packets(self):
+        """Yield (link type, offset, captured length) for each packet."""
+        magic = self.data[0:4]
+        if magic == b"\x0a\x0d\x0d\x0a":
+            return self.pcapng_packets()
+        for endian in "<>":
+            number = struct.unpack(endian + "I", magic)[0]
+            if number in (0xa1b2c3d4, 0xa1b23c4d):
+                return self.pcap_packets(endian, 16)
+            if number == 0xa1b2cd34:
+                return self.pcap_packets(endian, 24)  # modified pcap
+        raise CaptureError("%s is not a pcap or pcapng file" % self.path)
+
+    def pcap_packets(self, endian, recordSize):
+        data = self.data
+        linktype = struct.unpack_from(endian + "I", data, 20)[0] & 0x0fffffff
+        self.linktypes.add(linktype)
+        record = struct.Struct(endian + "IIII")
+        off = 24
+        end = len(data)
+        while off + recordSize <= end:
+            caplen = record.unpack_from(data, off)[2]
+            off += recordSize
+            if off + caplen > end:
+                break  # truncated at the end of the file
+            yield linktype, off, caplen
+            off += caplen
+
+    def pcapng_packets(self):
+        data = self.data
+        end = len(data)
+        off = 0
+        endian = "<"
+        interfaces = []  # (link type, snap length) by interface id
+        while off + 12 <= end:
+            btype = struct.unpack_from(endian + "I", data, off)[0]
+            if btype == PCAPNG_SHB:
+                bom = struct.unpack_from("<I", data, off + 8)[0]
+                endian = "<" if bom == PCAPNG_BOM else ">"
+                interfaces = []
+            blen = struct.unpack_from(endian + "I", data, off + 4)[0]
+            if blen < 12 or off + blen > end:
+                break  # truncated at the end of the file
+            if btype == PCAPNG_EPB:
+                iface, caplen = struct.unpack_from(endian + "I8xI", data, off + 8)
+                if iface < len(interfaces):
+                    yield interfaces[iface][0], off + 28, min(caplen, blen - 32)
+                else:
+                    self.unknownInterfaces += 1
+            elif btype == PCAPNG_SPB:
+                origlen = struct.unpack_from(endian + "I", data, off + 8)[0]
+                if interfaces:
+                    yield interfaces[0][0], off + 12, min(origlen, interfaces[0][1] or origlen, blen - 16)
+                else:
+                    self.unknownInterfaces += 1
+            elif btype == PCAPNG_PB:
+                iface, caplen = struct.unpack_from(endian + "H10xI", data, off + 8)
+                if iface < len(interfaces):
+                    yield interfaces[iface][0], off + 28, min(caplen, blen - 32)
+                else:
+                    self.unknownInterfaces += 1
+            elif btype == PCAPNG_IDB:
+                linktype, snaplen = struct.unpack_from(endian + "H2xI", data, off + 8)
+                interfaces.append((linktype, snaplen))
+                self.linktypes.add(linktype)
+            off += blen
+
+
+def ip_offset(data, linktype, off, end):
+    """Return the offset of the IP header in a packet, or -1."""
+    if end - off < 20:
+        return -1
+    if linktype == LINKTYPE_ETHERNET:
+        ethertype = U16.unpack_from(data, off + 12)[0]
+        off += 14
+        while ethertype in ETHERTYPE_VLAN and off + 4 <= end:
+            ethertype = U16.unpack_from(data, off + 2)[0]
+            off += 4
+        return off if ethertype in (ETHERTYPE_IPV4, ETHERTYPE_IPV6) else -1
+    if linktype == LINKTYPE_LINUX_SLL:
+        ethertype = U16.unpack_from(data, off + 14)[0]
+        return off + 16 if ethertype in (ETHERTYPE_IPV4, ETHERTYPE_IPV6) else -1
+    if linktype == LINKTYPE_LINUX_SLL2:
+        ethertype = U16.unpack_from(data, off)[0]
+        return off + 20 if ethertype in (ETHERTYPE_IPV4, ETHERTYPE_IPV6) else -1
+    if linktype in (LINKTYPE_RAW, LINKTYPE_IPV4, LINKTYPE_IPV6) or linktype in LINKTYPE_DLT_RAW:
+        return off
+    if linktype in (LINKTYPE_NULL, LINKTYPE_LOOP):
+        # the address family, in the byte order of the capturing host
+        # for NULL, big-endian for LOOP. 2 is IPv4, 24, 28 and 30 IPv6.
+        family = struct.unpack_from("<I" if linktype == LINKTYPE_NULL else ">I", data, off)[0]
+        if family > 0xffff:
+            family = struct.unpack_from(">I", data, off)[0]
+        return off + 4 if family in (2, 24, 28, 30) else -1
+    return -1
+
+
+class Segment(object):
+    """A TCP segment: its direction, sequence number and payload."""
+    __slots__ = ("key", "seq", "flags", "payload", "truncated")
+
+
+def tcp_segment(data, off, end, stats):
+    """Return the TCP Segment in the IP packet at off, or None."""
+    if off + 20 > end:
+        return None
+    version = bytearray(data[off:off + 1])[0] >> 4
+    if version == 4:
+        ihl = (bytearray(data[off:off + 1])[0] & 0x0f) * 4
+        total, frag = struct.unpack_from(">H2xH", data, off + 2)
+        if bytearray(data[off + 9:off + 10])[0] != 6:
+            return None
+        if frag & 0x3fff:
+            stats["ip fragments"] += 1
+            return None
+        src = data[off + 12:off + 16]
+        dst = data[off + 16:off + 20]
+        ipend = off + total if total else end  # 0 with TCP segmentation offload
+        off += ihl
+    elif version == 6:
+        if off + 40 > end:
+            return None
+        plen = U16.unpack_from(data, off + 4)[0]
+        nxt = bytearray(data[off + 6:off + 7])[0]
+        src = data[off + 8:off + 24]
+        dst = data[off + 24:off + 40]
+        ipend = off + 40 + plen
+        off += 40
+        while nxt in IPV6_EXTENSIONS or nxt == IPV6_AH:
+            if off + 8 > end:
+                return None
+            hdr = bytearray(data[off:off + 2])
+            nxt = hdr[0]
+            off += (hdr[1] + 2) * 4 if nxt == IPV6_AH else (hdr[1] + 1) * 8
+        if nxt == IPV6_FRAGMENT:
+            stats["ip fragments"] += 1
+            return None
+        if nxt != 6:
+            return None
+    else:
+        return None
+    if off + 20 > end:
+        return None
+    sport, dport, seq, ack, doff, flags = TCP_HEADER.unpack_from(data, off)
+    payoff = off + (doff >> 4) * 4
+    segment = Segment()
+    segment.key = (src, sport, dst, dport)
+    segment.seq = seq
+    segment.flags = flags
+    segment.truncated = max(0, ipend - max(end, payoff))
+    segment.payload = data[payoff:min(ipend, end)] if payoff < min(ipend, end) else b""
+    return segment
+
+
+def address_text(address):
+    if len(address) == 4:
+        return socket.inet_ntop(socket.AF_INET, address)
+    return socket.inet_ntop(socket.AF_INET6, address)
+
+
+class TcpStream(object):
+    """One direction of one TCP connection, reassembled by sequence number."""
+
+    def __init__(self, index, key, isn):
+        self.index = index
+        self.key = key
+        self.isn = isn          # sequence number ahead of the first byte
+        self.next = 0           # stream offset of the next byte to write
+        self.held = []          # heap of (stream offset, payload) out of order
+        self.heldBytes = 0
+        self.pending = []       # payloads in order, not yet written. An int is that many zeros.
+        self.pendingBytes = 0
+        self.written = 0        # bytes given to the file, gaps included
+        self.packets = 0
+        self.retransmitted = 0
+        self.gaps = []          # (stream offset, length) of missing bytes
+        self.path = None
+
+    def name(self):
+        src, sport, dst, dport = self.key
+        return "%s.%d-%s.%d" % (address_text(src), sport, address_text(dst), dport)
+
+    def offset(self, seq):
+        """The stream offset of 32 bit sequence number seq, the one
+        nearest to the next offset expected."""
+        rel = (seq - self.isn - 1) & 0xffffffff
+        return self.next + ((rel - self.next + 0x80000000) & 0xffffffff) - 0x80000000
+
+    def add(self, seq, payload, window, gaps):
+        self.packets += 1
+        if not payload:
+            return
+        start = self.offset(seq)
+        end = start + len(payload)
+        if end <= self.next:
+            self.retransmitted += len(payload)
+            return
+        if start > self.next:
+            heapq.heappush(self.held, (start, payload))
+            self.heldBytes += len(payload)
+            if self.heldBytes > window:
+                self.skipGap(gaps)
+            return
+        self.append(payload[self.next - start:])
+        self.release()
+
+    def append(self, payload):
+        self.pending.append(payload)
+        self.pendingBytes += len(payload)
+        self.next += len(payload)
+
+    def release(self):
+        """Append the held segments that now follow on."""
+        while self.held and self.held[0][0] <= self.next:
+            start, payload = heapq.heappop(self.held)
+            self.heldBytes -= len(payload)
+            if start + len(payload) > self.next:
+                self.append(payload[self.next - start:])
+            else:
+                self.retransmitted += len(payload)
+
+    def skipGap(self, gaps):
+        """Give up on the bytes missing ahead of the first held segment."""
+        start = self.held[0][0]
+        self.gaps.append((self.next, start - self.next))
+        if gaps == "fill":
+            self.pending.append(start - self.next)
+            self.pendingBytes += start - self.next
+        self.next = start
+        self.release()
+
+    def finish(self, gaps):
+        while self.held:
+            self.skipGap(gaps)
+
+    def flush(self, outdir):
+        if outdir is None:
+            self.written += self.pendingBytes
+        else:
+            if self.path is None:
+                self.path = os.path.join(outdir, "%d-%s.bin" % (self.index, self.name().replace(":", "_")))
+                mode = "wb"
+            else:
+                mode = "ab"
+            with open(self.path, mode) as f:
+                for payload in self.pending:
+                    if isinstance(payload, int):
+                        write_zeros(f, payload)
+                    else:
+                        f.write(payload)
+                self.written += self.pendingBytes
+        self.pending = []
+        self.pendingBytes = 0
+
+
+def write_zeros(f, count):
+    zeros = b"\0" * min(count, 1 << 20)
+    while count > 0:
+        f.write(zeros[:count])
+        count -= len(zeros)
+
+
+class Reassembler(object):
+    """The TCP streams of a capture."""
+
+    def __init__(self, ports=None, outdir=None, window=16 << 20, gaps="fill", maxPending=64 << 20):
+        self.ports = ports
+        self.outdir = outdir
+        self.window = window
+        self.gaps = gaps
+        self.maxPending = maxPending
+        self.pendingBytes = 0
+        self.current = {}   # map[(src, sport, dst, dport)] = TcpStream
+        self.streams = []   # every TcpStream in the order first seen
+        self.stats = {"packets": 0, "tcp segments": 0, "ip fragments": 0, "truncated bytes": 0,
+                      "unknown interface blocks": 0}
+
+    def read(self, capture):
+        data = capture.data
+        for linktype, off, caplen in capture.packets():
+            self.stats["packets"] += 1
+            end = off + caplen
+            ipoff = ip_offset(data, linktype, off, end)
+            if ipoff < 0:
+                continue
+            segment = tcp_segment(data, ipoff, end, self.stats)
+            if segment is None:
+                continue
+            if self.ports and segment.key[1] not in self.ports and segment.key[3] not in self.ports:
+                continue
+            self.add(segment)
+        self.stats["unknown interface blocks"] += capture.unknownInterfaces
+        self.finish()
+
+    def add(self, segment):
+        self.stats["tcp segments"] += 1
+        self.stats["truncated bytes"] += segment.truncated
+        stream = self.current.get(segment.key)
+        if segment.flags & TCP_SYN:
+            if stream is not None and stream.isn == segment.seq:
+                stream.packets += 1  # a retransmitted SYN
+                return
+            if stream is not None:
+                self.finishStream(stream)  # the port pair is used again
+            stream = self.newStream(segment.key, segment.seq)
+            stream.packets += 1
+            return
+        if stream is None:
+            # the connection was open before the capture started
+            stream = self.newStream(segment.key, (segment.seq - 1) & 0xffffffff)
+        before = stream.pendingBytes
+        stream.add(segment.seq, segment.payload, self.window, self.gaps)
+        self.pendingBytes += stream.pendingBytes - before
+        if self.pendingBytes > self.maxPending:
+            self.flushAll()
+        elif stream.pendingBytes > (1 << 20):
+            self.flush(stream)
+
+    def newStream(self, key, isn):
+        stream = TcpStream(len(self.streams), key, isn)
+        self.streams.append(stream)
+        self.current[key] = stream
+        return stream
+
+    def flush(self, stream):
+        self.pendingBytes -= stream.pendingBytes
+        stream.flush(self.outdir)
+
+    def flushAll(self):
+        for stream in self.current.values():
+            self.flush(stream)
+
+    def finishStream(self, stream):
+        before = stream.pendingBytes
+        stream.finish(self.gaps)
+        self.pendingBytes += stream.pendingBytes - before
+        self.flush(stream)
+
+    def finish(self):
+        for stream in self.current.values():
+            self.finishStream(stream)
+
+
+def format_streams(reassembler):
+    out = ["%4s  %-50s %8s %12s %10s %10s  %s" % ("n", "stream", "packets", "bytes", "retrans", "missing", "file")]
+    for stream in reassembler.streams:
+        out.append("%4d  %-50s %8d %12d %10d %10d  %s" %
+                   (stream.index, stream.name(), stream.packets, stream.written, stream.retransmitted,
+                    sum([length for start, length in stream.gaps]), stream.path or ""))
+        for start, length in stream.gaps:
+            out.append("      missing %d bytes at stream offset %d" % (length, start))
+    out.append(", ".join(["%s %d" % (name, value) for name, value in sorted(reassembler.stats.items())]))
+    return "\n".join(out)
+
+
+def main_except(argv):
+    import argparse
+    parser = argparse.ArgumentParser(description="Extract the reassembled TCP streams of a pcap or pcapng capture.")
+    parser.add_argument("capture", help="pcap or pcapng file")
+    parser.add_argument("-o", "--outdir", default=None,
+                        help="write each stream to a .bin file in this directory")
+    parser.add_argument("-p", "--port", type=int, action="append", default=None,
+                        help="only streams to or from this port. May be repeated.")
+    parser.add_argument("--gaps", choices=["fill", "skip"], default="fill",
+                        help="write bytes missing from the capture as zeros or leave them out [%(default)s]")
+    parser.add_argument("--window", type=int, default=16 << 20,
+                        help="out of order bytes held per stream before a hole is taken as missing [%(default)s]")
+    args = parser.parse_args(argv[1:])
+
+    if args.outdir is not None and not os.path.isdir(args.outdir):
+        os.makedirs(args.outdir)
+    reassembler = Reassembler(set(args.port) if args.port else None, args.outdir, args.window, args.gaps)
+    with Capture(args.capture) as capture:
+        reassembler.read(capture)
+    print(format_streams(reassembler))
+
+
+def main(argv):
+    try:
+        main_except(argv)
+        return 0
+    except Exception:
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -22,47 +22,100 @@ from __future__ import division
 from __future__ import absolute_import
 from __future__ import print_function
 
+import binascii
+import io
 import os
+import re
 import sys
 import traceback
 
+# Characters of input read per chunk
+CHUNK_SIZE = 1 << 22
+
+# A "0x" that is not followed by exactly two hex digits
+TOKEN_ERROR = re.compile(b"0x(?![0-9A-Fa-f]{2}(?![0-9A-Fa-f]))")
+
+# The characters between the bytes of a data line
+SEPARATORS = b", };\t\n\r\v\f"
+
+# Byte value -> its character in the ascii comment column
+ASCII_TABLE = bytes(bytearray([v if 32 <= v <= 126 else ord('.') for v in range(256)]))
+
 
 def usage(argv):
-    print("%s infile outfile\n" % str(argv[0]))
+    print("%s [--bin] infile outfile\n" % str(argv[0]))
+    print("Writes outfile as C source for char rewrite_bytes[] or, with --bin or")
+    print("when outfile ends with .bin, as the raw bytes. See stream_file.py.\n")
+
+
+def data_lines(fi, chunk_size=CHUNK_SIZE):
+    """Yield the lines of fi that hold data bytes, the ones that start
+    with "0x", as one list per chunk read."""
+    rest = ""
+    while True:
+        chunk = fi.read(chunk_size)
+        if not chunk:
+            break
+        lines = (rest + chunk).split("\n")
+        rest = lines.pop()
+        yield [line for line in lines if line.startswith("0x")]
+    if rest.startswith("0x"):
+        yield [rest]
+
+
+def hex_digits(lines):
+    """Return the two hex digits after each "0x" in lines, all joined."""
+    text = "\n".join(lines).encode("ascii", "replace")
+    if TOKEN_ERROR.search(text) is None:
+        # Each "0x" is followed by exactly two hex digits. Deleting the
+        # "0x"s and the separators leaves the digits.
+        digits = text.replace(b"0x", b"").translate(None, SEPARATORS)
+        if len(digits) == 2 * text.count(b"0x"):
+            return digits
+    # Something else is on the lines. Take the digits one by one.
+    return "".join([p[:2] for line in lines for p in line.split("0x")[1:]]).encode("ascii")
+
+
+def decode_lines(lines):
+    """Return the bytes of a list of data lines, decoded in one go."""
+    return binascii.unhexlify(hex_digits(lines))
+
 
+def rewrite_lines(lines, offset):
+    """Return the rewritten text of a list of data lines and the offset
+    of the byte after them."""
+    data = decode_lines(lines)
+    asci = data.translate(ASCII_TABLE).decode("ascii")
+    out = []
+    pos = 0
+    for line in lines:
+        n0x = line.count("0x")
+        out.append("%s%s /* off: %d  %s%s */\n " % (line.strip().replace(" };", ","), ((8 - n0x) * 6) * ' ',
+                                                   offset + pos, asci[pos:pos + n0x], (8 - n0x) * ' '))
+        pos += n0x
+    return "".join(out), offset + pos
 
-def find_nth(haystack, needle, n):
-    start = haystack.find(needle)
-    while start >= 0 and n > 1:
-        start = haystack.find(needle, start+len(needle))
-        n -= 1
-    return start
 
 def main_except(argv):
-    if len(argv) != 3:
+    args = [arg for arg in argv[1:] if arg != "--bin"]
+    if len(args) != 2:
         usage(argv)
         raise ValueError("%s expects exactly two arguments." % str(argv[0]))
-    fni = str(argv[1])
-    fno = str(argv[2])
+    fni = str(args[0])
+    fno = str(args[1])
+    if "--bin" in argv[1:] or fno.endswith(".bin"):
+        with io.open(fni, 'r') as fi:
+            with io.open(fno, "wb") as fo:
+                for lines in data_lines(fi):
+                    fo.write(decode_lines(lines))
+        return
     offset = 0
-    with open(fni, 'r') as fi:
-        with open(fno, "w") as fo:
+    with io.open(fni, 'r') as fi:
+        with io.open(fno, "w") as fo:
             fo.write("char rewrite_bytes[] = {")
-            for line in fi:
-                if line.startswith("0x"):
-                    n0x = line.count("0x")
-                    asci = ""
-                    for i in range(1, n0x+1):
-                        st = find_nth(line, "0x", i)
-                        val = int(line[st:st+4], 16)
-                        if val < 32 or val > 126:
-                            asci += '.'
-                        else:
-                            asci += chr(val)
-                    pad = ((8 - n0x) * 6) * ' '
-                    pad2 = (8 - n0x) * ' '
-                    fo.write( line.strip().replace(" };", ",") + pad + " /* off: " + str(offset) + "  " + asci + pad2 + " */\n " )
-                    offset += line.count("0x")
+            for lines in data_lines(fi):
+                text, offset = rewrite_lines(lines, offset)
+                fo.write(text)
             fo.write("};")
 
 
@@ -0,0 +1,124 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Read a stream file written by rewrite-bytes.py --bin.
+#
+#    python stream_file.py data.bin                  print the stream size
+#    python stream_file.py data.bin OFFSET [COUNT]   dump COUNT bytes at OFFSET
+#
+# As a module:
+#
+#    with StreamFile("data.bin") as stream:
+#        frame_size = stream.get_long(0)
+#
+# The file is memory mapped, not read. Opening it takes the same time
+# whatever its size and only the pages that are looked at are loaded.
+
+from __future__ import unicode_literals
+from __future__ import division
+from __future__ import absolute_import
+from __future__ import print_function
+
+import mmap
+import os
+import struct
+import sys
+import traceback
+
+LONG = struct.Struct(">I")
+
+
+class StreamFile(object):
+    """A read only, memory mapped stream file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        if os.fstat(self.file.fileno()).st_size == 0:
+            self.data = b""  # an empty file can't be mapped
+        else:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if not isinstance(self.data, bytes):
+            self.data.close()
+        self.file.close()
+
+    def get_byte(self, offset):
+        """Return the byte at offset as an int."""
+        return bytearray(self.data[offset:offset + 1])[0]
+
+    def get_long(self, offset):
+        """Return the big-endian uint32 at offset."""
+        return LONG.unpack_from(self.data, offset)[0]
+
+    def get_bytes(self, offset, count):
+        """Return count bytes at offset, fewer at the end of the stream."""
+        return self.data[offset:offset + count]
+
+
+def dump_lines(data, offset):
+    """Return data, found at offset, as lines of rewrite-bytes.py C source."""
+    lines = []
+    for i in range(0, len(data), 8):
+        row = bytearray(data[i:i + 8])
+        asci = "".join([chr(v) if 32 <= v <= 126 else "." for v in row])
+        hexes = ", ".join(["0x%02x" % v for v in row]) + ","
+        lines.append("%-47s /* off: %d  %-8s */" % (hexes, offset + i, asci))
+    return lines
+
+
+def usage(argv):
+    print("%s file.bin [offset [count]]\n" % str(argv[0]))
+
+
+def main_except(argv):
+    if len(argv) < 2 or len(argv) > 4:
+        usage(argv)
+        raise ValueError("%s expects one to three arguments." % str(argv[0]))
+    with StreamFile(str(argv[1])) as stream:
+        if len(argv) == 2:
+            print("%s: %d bytes" % (stream.path, len(stream)))
+            return
+        offset = int(argv[2], 0)
+        count = int(argv[3], 0) if len(argv) == 4 else 64
+        for line in dump_lines(stream.get_bytes(offset, count), offset):
+            print(line)
+
+
+def main(argv):
+    try:
+        main_except(argv)
+        return 0
+    except Exception:
+        traceback.print_exc()
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))